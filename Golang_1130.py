@@ -1,1037 +1,863 @@
 import ply.lex as lex
 import ply.yacc as yacc
 import sys
-
-# keywords
-reserved = {
-    'var': 'KVAR',
-    'int': 'KINT',
-    'bool': 'KBOOL',
-    'string': 'KSTRING',
-    'for': 'KFOR',
-    'break': 'KBREAK',
-    'default': 'KDEFAULT',
-    'case': 'KCASE',
-    'else': 'KELSE',
-    'package': 'KPACKAGE',
-    'switch': 'KSWITCH',
-    'const': 'KCONST',
-    'if': 'KIF',
-    'func': 'KFUNC',
-    'continue': 'KCONTINUE',
-    'import': 'KIMPORT',
-    'Println': 'KPRINT',
-    'fmt': 'KFMT',
-    'main': 'KMAIN'
-}
-
-# tokens
-tokens = (
-             'NLD',  # newline
-             'LOR', 'LAND',  # logical
-             'LE', 'LT', 'GE', 'GT', 'EQ', 'NE',  # relational
-             'MOE', 'DEF', 'PE', 'ME', 'TE', 'DE',  # assign
-             'PP', 'MM',  # increase
-
-             'ID', 'INT', 'BOOL', 'STRING'  # identifier
-         ) + tuple(reserved.values())
-
-t_LOR = r'\|\|'
-t_LAND = r'&&'
-
-t_LE = r'<='
-t_LT = r'<'
-t_GE = r'>'
-t_GT = r'>='
-t_EQ = r'=='
-t_NE = r'!='
-
-t_PE = r'\+='
-t_ME = r'-='
-t_TE = r'\*='
-t_DE = r'/='
-t_MOE = r'%='
-
-t_PP = r'\+\+'
-t_MM = r'--'
-
-t_DEF = r':='
-
-t_STRING = r'"[^"]*"'  # accept all string but '"'
-
-
-def t_BOOL(t):
-    r'false|true'
-    t.value = True if t.value == 'true' else False
-    return t
-
-
-def t_ID(t):
-    r'[a-zA-Z_][a-zA-Z0-9_]*'
-    t.type = reserved.get(t.value, 'ID')  # keyword check
-    return t
-
-
-def t_INT(t):
-    r'[\d]+'
-    t.value = int(t.value)
-    return t
-
-
-def t_NLD(t):
-    r'[\t\s]*[\n]+[\t\s]*'
-    t.lexer.lineno += t.value.count('\n')
-    return t
-
-
-literals = [
-    '=', '+', '-', '*', '/', '%',  # arithmetic(except '=')
-    '(', ')',  # parenthesis
-    '!',  # logical
-    '{', '}', ',', ':', '.', ';'
-]
-
-# Ignored characters
-t_ignore = ' \t'
-
-
-# # Ignored token with an action associated with it
-# def t_ignore_newline(t):
-#     r'\n+'
-#     t.lexer.lineno += t.value.count('\n')
-
-
-# Error handler for illegal characters
-def t_error(t):
-    print(f'Illegal character {t.value[0]!r}')
-    t.lexer.skip(1)
-
-
-lex.lex()
-
-# lexer.input("1+2+345")
-# while True:
-#     token = lexer.token()
-#     if not token:
-#         break
-#     print(token)
-
-
-# Parsing rules
-
-precedence = (
-    ('nonassoc', 'PE', 'ME', 'TE', 'DE', 'MOE', 'DEF'),
-    ('left', 'LAND', 'LOR'),
-    ('right', '!'),
-
-    ['nonassoc', 'LE', 'LT', 'GE', 'GT'],  # do not allow expanding
-    ('left', '+', '-'),
-    ('left', '*', '/'),
-    ('right', 'UMINUS')
-)
-
-names = {}
-global_names = {}
-constants = set()
-global_constants = set()
-
-start = 'start'
-
-is_fmt = False
-in_loop = 0
-in_switch = 0
-is_error = False
-
-print_list = []
-error_list = []
-
-# def p_test(p):
-#     """
-#     test : KPACKAGE KMAIN NLD global_statement import_statement NL
-#     """
-
-
-def p_start(p):  # import statement 추가
-    """
-    start : KPACKAGE KMAIN NLD import_statement NLD main_statement
-    """
-    p[0] = ("start", p[4], p[6])
-    print_list.append(f"Code accepted: {p[0]}")
-
-
-def p_import_statement(p):
-    """
-    import_statement : KIMPORT STRING
-    """
-    global is_fmt
-    if p[2] == '"fmt"':
-        is_fmt = True
-        print_list.append(f"module <{p[2]}> imported")
-
-    p[0] = ("import", p[2])
-
-
-def p_import_statement_empty(p):
-    """
-    import_statement : empty
-    """
-    p[0] = ("import", None)
-
-
-def p_statement(p):
-    """
-    statement : print_statement statement
-              | if_statement statement
-              | switch_statement statement
-              | for_statement statement
-              | assign_statement statement
-              | break_statement statement
-              | continue_statement statement
-    """
-    p[0] = (p[1], ) + p[2]
-
-
-def p_statement_empty(p):
-    """
-    statement : empty
-    """
-    p[0] = tuple()
-
-
-def p_main_statement(p):
-    """
-    main_statement : global_statement KFUNC KMAIN '(' ')' '{' NL statement '}' NL
-    """
-    p[0] = (p[1], ("main", p[8]))
-
-
-# def p_main_statement_with_global(p):
-#     """
-#     main_statement : global_statement KFUNC KMAIN '(' ')' '{' NL statement NL '}' NLD global_statement
-#     """
-#     p[0] = (p[1], ("main", p[8]), p[12])
-
-
-def p_NL(p):
-    """
-    NL : NLD
-       | empty
-    """
-
-
-def p_global_statement(p):
-    """
-    global_statement : global_assign_statement NLD global_statement
-    """
-    p[0] = (p[1], ) + p[3]
-
-
-def p_global_statement_empty(p):
-    """global_statement : empty"""
-    p[0] = tuple()
-
-
-def p_global_assign_statement(p):
-    """
-    global_assign_statement : global_var_assign_statement
-                            | global_const_assign_statement
-    """
-    p[0] = p[1]
-
-
-def p_global_assign_statement_default(p):  # add zero value handling / redeclare
-    """global_var_assign_statement : KVAR ID type assign_expr"""
-    # redeclared check
-    if p[2] in global_names:
-        error_list.append(f"Error: {p[2]} redeclared in the scope")
-        return
-
-    t = type(p[4])
-    if p[3] == 'bool':
-        if p[4] is not None:
-            if t != bool:
-                error_list.append("TypeError: non bool type assigned to bool")
-            else:
-                global_names[p[2]] = p[4]  # Accepted
-
-        else:
-            global_names[p[2]] = False  # zero accepted
-
-    elif p[3] == 'int':
-        if p[4] is not None:
-            if t != int:
-                error_list.append("TypeError: non int type assigned to int")
-            elif -(1 << 63) <= p[4] < (1 << 63):
-                global_names[p[2]] = p[4]  # Accepted
-            else:
-                error_list.append(f"Overflow Error: can not use {p[4]} for int32")
-
-        else:
-            global_names[p[2]] = 0  # zero accepted
-
-    elif p[3] == 'string':
-        if p[4] is not None:
-            if t != str:
-                error_list.append("TypeError: non string type assigned to string")
-            else:
-                global_names[p[2]] = p[4]  # Accepted
-
-        else:
-            global_names[p[2]] = ""  # zero accepted
-
-    p[0] = ("global_var_assign", p[2], type(global_names[p[2]]), p[4])
-
-
-def p_global_assign_const_statement(p):
-    """global_const_assign_statement : KCONST ID type assign_expr"""
-    # redeclared check
-    if p[2] in global_names:
-        print(f"Error: {p[2]} redeclared in the scope")
-        return
-
-    t = type(p[4])
-    if p[3] == 'bool':
-        if p[4] is not None:
-            if t != bool:
-                print("TypeError: non bool type assigned to bool")
-            else:
-                global_names[p[2]] = p[4]  # Accepted
-
-        else:
-            global_names[p[2]] = False  # zero accepted
-
-    elif p[3] == 'int':
-        if p[4] is not None:
-            if t != int:
-                print("TypeError: non int type assigned to int")
-            elif -(1 << 63) <= p[4] < (1 << 63):
-                global_names[p[2]] = p[4]  # Accepted
-            else:
-                error_list.append(f"Overflow Error: can not use {p[4]} for int32")
-
-        else:
-            global_names[p[2]] = 0  # zero accepted
-
-    elif p[3] == 'string':
-        if p[4] is not None:
-            if t != str:
-                print("TypeError: non string type assigned to string")
-            else:
-                global_names[p[2]] = p[4]  # Accepted
-
-        else:
-            global_names[p[2]] = ""  # zero accepted
-
-    global_constants.add(p[2])
-    p[0] = ("global_const_assign", p[2], type(global_names[p[2]]), p[4])
-
-
-def p_if_statement(p):
-    """
-    if_statement : KIF condition '{' NL statement '}' else_statement NLD
-    """
-    p[0] = (("if", p[2], p[5]), ) + p[7]
-    print_list.append(f"If accepted: {p[0]}")
-
-
-def p_else_statement_elif(p):
-    """
-    else_statement : KELSE KIF condition '{' NL statement '}' else_statement
-    """
-    p[0] = (("else if", p[3], p[6]), ) + p[8]
-
-
-def p_else_statement_else(p):
-    """else_statement : KELSE '{' NL statement '}'"""
-    p[0] = (("else", p[4]), )
-
-
-def p_else_statement_empty(p):
-    """else_statement : empty"""
-    p[0] = tuple()
-
-
-def p_switch_statement_cond(p):
-    """
-    switch_statement : SWITCH '{' NL case_statement '}' NLD
-    """
-    p[0] = ("switch_condition", p[4])
-    print_list.append(f"Switch accepted: {p[0]}")
-
-    global in_switch
-    in_switch -= 1
-
-
-def p_switch_statement_var(p):
-    """
-    switch_statement : SWITCH expr_cond '{' NL case_var_statement '}' NLD
-    """
-    p[0] = ("switch_default", p[2], p[5])
-    print_list.append(f"Switch accepted: {p[0]}")
-
-    global in_switch
-    in_switch -= 1
-
-
-def p_SWITCH(p):
-    """
-    SWITCH : KSWITCH
-    """
-    global in_switch
-    in_switch += 1
-
-
-def p_case_statement(p):
-    """
-    case_statement : KCASE condition ':' NL statement case_statement
-    """
-    p[0] = (("case", p[2], p[5]),) + p[6]
-
-
-def p_case_statement_default(p):
-    """case_statement : KDEFAULT ':' NL statement case_without_default_statement"""
-    p[0] = (("default", p[4]),) + p[5]
-
-
-def p_case_statement_empty(p):
-    """case_statement : empty"""
-    p[0] = tuple()
-
-
-def p_case_without_default_statement(p):
-    """
-    case_without_default_statement : KCASE condition ':' NL statement case_without_default_statement
-    """
-    p[0] = (("case", p[2], p[5]),) + p[6]
-
-
-def p_case_without_default_statement_empty(p):
-    """case_without_default_statement : empty"""
-    p[0] = tuple()
-
-
-def p_case_var_statement(p):
-    """
-    case_var_statement : KCASE var_statement ':' NL statement case_var_statement
-    """
-    p[0] = (("case", p[2], p[5]),) + p[6]
-
-
-def p_case_var_statement_default(p):
-    """case_var_statement : KDEFAULT ':' NL statement case_var_without_default_statement"""
-    p[0] = (("default", p[4]), ) + p[5]
-
-
-def p_case_var_statement_empty(p):
-    """case_var_statement : empty"""
-    p[0] = tuple()
-
-
-def p_case_var_without_default_statement(p):
-    """
-    case_var_without_default_statement : KCASE var_statement ':' NL statement case_var_without_default_statement
-    """
-    p[0] = (("case", p[2], p[5]), ) + p[6]
-
-
-def p_case_var_without_default_statement_empty(p):
-    """case_var_without_default_statement : empty"""
-    p[0] = tuple()
-
-
-def p_var_statement(p):
-    """
-    var_statement : expr_cond comma_var
-    """
-    p[0] = (p[1], *p[2][::-1])
-
-
-def p_comma_var(p):
-    """
-    comma_var : ',' expr_cond comma_var
-    """
-    p[0] = p[3] + (p[2], )
-
-
-def p_var_empty(p):
-    """comma_var : empty"""
-    p[0] = tuple()
-
-
-def p_for_statement(p):
-    """
-    for_statement : FOR single_line_statement_1 ';' condition ';' single_line_statement_2 '{' NL statement '}' NLD
-    """
-    p[0] = ("for_default", (p[2], p[4], p[6]), p[9])
-    global in_loop
-    in_loop -= 1
-    print_list.append(f"For accepted: {p[0]}")
-
-
-def p_FOR(p):
-    """
-    FOR : KFOR
-    """
-    global in_loop
-    in_loop += 1
-
-
-def p_for_statement_condition(p):
-    """
-    for_statement : FOR condition '{' NL statement '}' NLD
-    """
-    p[0] = ("for_condition", p[2], p[5])
-    global in_loop
-    in_loop -= 1
-    print_list.append(f"For accepted: {p[0]}")
-
-
-def p_for_statement_infinite(p):
-    """
-    for_statement : FOR '{' NL statement '}' NLD
-    """
-    p[0] = ("for_infinite", p[4])
-    global in_loop
-    in_loop -= 1
-    print_list.append(f"For accepted: {p[0]}")
-
-
-def p_single_line_statement_1(p):
-    """
-    single_line_statement_1 : single_line_statement_2
-                            | def_statement
-    """
-    p[0] = p[1]
-
-
-def p_single_line_statement_2(p):
-    """
-    single_line_statement_2 : reassign_statement
-                            | increase_statement
-                            | print_statement
-                            | empty
-    """
-    p[0] = p[1]
-
-
-def p_break_statement(p):
-    """
-    break_statement : KBREAK NLD
-    """
-    if not in_loop and not in_switch:
-        error_list.append(f"Error: {p[1]} is not in loop of break")
-
-    p[0] = ('break', )
-
-
-def p_continue_statement(p):
-    """
-    continue_statement : KCONTINUE NLD
-    """
-    if not in_loop:
-        error_list.append(f"Error: {p[1]} is not in loop")
-
-    p[0] = ('continue', )
-
-
-def p_assign_statement(p):
-    """
-    assign_statement : var_assign_statement NLD
-                     | const_assign_statement NLD
-                     | def_statement NLD
-                     | increase_statement NLD
-                     | reassign_statement NLD
-    """
-    p[0] = p[1]
-
-
-def p_increase_statement(p):
-    """
-    increase_statement : ID PP
-                       | ID MM
-    """
-    # name check
-    if p[1] not in names and p[1] not in global_names:
-        error_list.append("Error: Undefined identifier '%s'" % p[1])
-        return
-
-    # const check
-    if p[1] in constants:
-        error_list.append(f"Error: cannot assign to constant {p[1]}")
-        return
-
-    # type check
-    if type(names[p[1]]) != int:
-        error_list.append(f"Error: cannot add non-int type {type(names[p[1]])}")
-        return
-
-    if p[1] in names:
-        if p[2] == '++':
-            names[p[1]] += 1
-            p[0] = ("increase", p[1])
-        else:
-            names[p[1]] -= 1
-            p[0] = ("decrease", p[1])
-    else:
-        if p[2] == '++':
-            global_names[p[1]] += 1
-            p[0] = ("increase", p[1])
+import hashlib
+import os
+import threading
+import glob
+import json
+import argparse
+import multiprocessing
+
+from go_ast import *
+from go_diagnostics import Diagnostic, ILLEGAL_CHARACTER, SYNTAX, IMPORT, PLACEMENT, IO, report
+from go_eval import Evaluator, LoopBudget
+from go_vm import VM, compile_program
+from go_closure import compile_closures
+from go_cache import ResultCache
+from go_fold import fold_constants
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+class ParseContext:
+    """state of a single parse, a new one is made by GoParser.parse()"""
+
+    def __init__(self, lines=None):
+        self.is_error = False
+        self.diagnostics = []
+        self.lines = lines  # LineIndex the lexer made of the source, locates the diagnostics
+        self.positions = None  # id(node) -> (lineno, lexpos) for the nodes of an interned program
+
+
+def block(chain):
+    """tuple of the statements in a chain of (statement, rest) pairs, statement lists are built as chains
+    to make adding a statement in front cheap"""
+    statements = []
+    while chain is not None:
+        statement, chain = chain
+        statements.append(statement)
+    return tuple(statements)
+
+
+def placement_errors(statements, is_fmt, in_loop=False, in_switch=False):
+    """diagnostics for break and continue outside of loops and for Println without importing fmt"""
+    for stmt in statements:
+        if type(stmt) == Print:
+            if not is_fmt:
+                yield Diagnostic(stmt.lexpos, IMPORT, "ImportError: 'fmt' is not imported")
+        elif type(stmt) == Break:
+            if not in_loop and not in_switch:
+                yield Diagnostic(stmt.lexpos, PLACEMENT, "Error: break is not in loop of break")
+        elif type(stmt) == Continue:
+            if not in_loop:
+                yield Diagnostic(stmt.lexpos, PLACEMENT, "Error: continue is not in loop")
+        elif type(stmt) == If:
+            yield from placement_errors(stmt.body, is_fmt, in_loop, in_switch)
+            yield from placement_errors(stmt.orelse, is_fmt, in_loop, in_switch)
+        elif type(stmt) == Switch:
+            for case in stmt.cases:
+                yield from placement_errors(case.body, is_fmt, in_loop, True)
+        elif type(stmt) == For:
+            header = tuple(s for s in (stmt.init, stmt.post) if s is not None)
+            yield from placement_errors(header + stmt.body, is_fmt, True, in_switch)
+
+
+class GoParser:
+    """
+    Parser for the Go subset, with the token and grammar rules defined as methods.
+
+    The lexer and the parsing tables are built once for the class and shared read-only
+    by all instances, each instance only clones them.  An instance parses one program
+    at a time, use one instance per thread to parse in parallel.
+
+    Given an Interner, parse() returns trees interned in it, parsers can share an Interner
+    to share the common subtrees of all the programs they parse.  The positions of the nodes
+    of an interned tree are in self.context.positions.  Given a ResultCache,
+    check() returns the cached result for a source it has checked before.
+    """
+    _lock = threading.Lock()
+    _lexer = None
+    _parser = None
+    _signature = None
+
+    def __init__(self, interner=None, cache=None):
+        cls = type(self)
+        with cls._lock:
+            if cls._parser is None:
+                cls._lexer, cls._parser = self.build()
+                cls._signature = self.signature()
+
+        self.context = ParseContext()
+        self.incremental = None  # (source, ParseLog) of the last reparse()
+        self.interner = interner
+        self.cache = cache
+        self.lexer = cls._lexer.clone(self)
+        self.parser = cls._parser.clone(self)
+
+    def build(self):
+        lexer = lex.lex(module=self, linestarts=True)  # the lexer keeps lineno, NLD doesn't count lines
+
+        # use the tables generated ahead of time by `python Golang_1130.py --build-tables` if they are up to date
+        # (their signature is checked against the rule docstrings, the grammar is not reflected on again),
+        # otherwise build them (they are cached next to this file and rebuilt only when the grammar changes)
+        try:
+            import go_parsetab
+            parser = go_parsetab.parser(self, check=True)
+        except (ImportError, yacc.VersionError):
+            parser = yacc.yacc(module=self, picklefile=os.path.join(here, "parsetab.p"))
+        parser.set_compact_tables()  # integer-indexed action/goto tables for the parse loop
+        return lexer, parser
+
+    def signature(self):
+        """hash of the grammar and of the code that checks and runs programs, check() results depend on nothing else"""
+        grammar = yacc.grammar_signature({k: getattr(self, k) for k in dir(self)})
+        digest = hashlib.sha256(yacc.table_signature(grammar).encode('utf-8'))
+        for module in (__name__, 'go_ast', 'go_diagnostics', 'go_eval', 'go_types', 'go_fold', 'go_vm', 'go_closure'):
+            with open(sys.modules[module].__file__, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def parse(self, source, debug=False, profile=False):
+        """
+        parse source, returns the Program or None, the errors are in self.context.  The parser recovers
+        from a syntax error at the next statement, so every statement with an error is reported.
+        With profile, the reductions and time of every grammar rule are counted in self.parser.profile.
+        """
+        self.lexer.lineno = 1
+        self.lexer.input(source)
+        self.context = ParseContext(self.lexer.lexlines)
+        program = self.parser.parse(lexer=self.lexer, debug=debug, profile=profile)
+        if program is not None:
+            self.context.diagnostics.extend(placement_errors(program.body, 'fmt' in program.imports))
+            if self.interner is not None:
+                self.context.positions = {}
+                program = self.interner.intern(program, self.context.positions)
+        return program
+
+    def reparse(self, source):
+        """
+        parse source like parse(), for a source that is an edited version of the one given to the last
+        reparse() call: only the tokens around the edit are made again and the subtrees of the last
+        parse outside of it are reused.  The returned tree shares the unchanged nodes with the last one,
+        the nodes after the edit are moved to their new line numbers in place, so trees it keeps for reuse
+        are never interned.
+        """
+        self.context = ParseContext()
+        if self.incremental is None:
+            self.lexer.lineno = 1
+            self.lexer.input(source)
+            self.context.lines = self.lexer.lexlines
+            log = self.parser.parseincremental(list(self.lexer))
         else:
-            names[p[1]] += 1
-            p[0] = ("decrease", p[1])
-
-
-def p_assign_statement_default(p):  # add zero value handling / redeclare
-    """var_assign_statement : KVAR ID type assign_expr"""
-    # redeclared check
-    if p[2] in names:
-        error_list.append(f"Error: {p[2]} redeclared in the scope")
-        return
-
-    t = type(p[4])
-    if p[3] == 'bool':
-        if p[4] is not None:
-            if t != bool:
-                error_list.append("TypeError: non bool type assigned to bool")
-                return
-            else:
-                names[p[2]] = p[4]  # Accepted
-
+            old_source, old_log = self.incremental
+            self.incremental = None  # relex() moves the old tokens
+            tokens, first, oldstop, newstop, lines = self.lexer.relex(old_log.tokens, old_source, source)
+            self.context.lines = self.lexer.lexlines
+            log = self.parser.parseincremental(tokens, old_log, (first, oldstop, newstop))
+            offset = len(source) - len(old_source)
+            if log is not None and (lines or offset):
+                for sym in log.moved:
+                    move_lines(sym.value, lines, offset)
+
+        # errors are recovered from and reported by a full parse
+        if log is None or self.context.diagnostics or self.context.is_error:
+            return self.parse(source)
+
+        self.incremental = (source, log)
+        program = log.result
+        self.context.diagnostics.extend(placement_errors(program.body, 'fmt' in program.imports))
+        return program
+
+    def check(self, source, backend='vm', debug=False, budget=None, profile_loops=False):
+        """
+        parse and run source, returns accepted, print_list, error_list and diagnostics, the errors with
+        their line, column and code as dicts (see go_diagnostics).  Without a budget loops run until
+        they end, given a LoopBudget they are stopped when they run out of it.  With profile_loops the
+        profile of the loops of the budget is returned in loops, the result is not cached then.
+        """
+        if self.cache is None or debug or profile_loops:
+            return self.run_check(source, backend, debug, budget, profile_loops)[1]
+
+        # the limits of the budget decide where loops stop, so they are part of the key
+        limits = None if budget is None else (budget.max_iterations, budget.max_time)
+        key = self.cache.key(self._signature, backend, source, limits)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[1]
+        program, result = self.run_check(source, backend, debug, budget)
+        self.cache.put(key, program, result)
+        return result
+
+    def run_check(self, source, backend, debug, budget=None, profile_loops=False):
+        if profile_loops and budget is None:
+            budget = LoopBudget()
+        program = self.parse(source, debug=debug)
+        if self.context.diagnostics or self.context.is_error or program is None:
+            result = {'accepted': False, 'print_list': [], **report(self.context.diagnostics, self.context.lines)}
+            if profile_loops:
+                result['loops'] = []
+            return program, result
+
+        positions = self.context.positions
+        program = fold_constants(program, positions)
+        if backend == 'vm':
+            runner = VM()
+            runner.run(compile_program(program, positions), budget)
+        elif backend == 'closure':
+            runner = compile_closures(program, positions)
+            runner.run(budget)
         else:
-            names[p[2]] = False  # zero accepted
-
-    elif p[3] == 'int':
-        if p[4] is not None:
-            if t != int:
-                error_list.append("TypeError: non int type assigned to int")
-                return
-            else:
-                if -(1 << 63) <= p[4] < (1 << 63):
-                    names[p[2]] = p[4]  # Accepted
-                else:
-                    error_list.append(f"Overflow Error: can not use {p[4]} for int32")
-                    return
-
-        else:
-            names[p[2]] = 0  # zero accepted
-
-    elif p[3] == 'string':
-        if p[4] is not None:
-            if t != str:
-                error_list.append("TypeError: non string type assigned to string")
-                return
-            else:
-                names[p[2]] = p[4]  # Accepted
-
-        else:
-            names[p[2]] = ""  # zero accepted
-
-    p[0] = ("var_assign", p[2], type(names[p[2]]), p[4])
-
-
-def p_assign_expr(p):
-    """
-    assign_expr : "=" expr_cond
-                | empty
-    """
-    if p[1] == '=':
+            runner = Evaluator()
+            runner.run(program, budget, positions)
+        result = {'accepted': True, 'print_list': runner.print_list, **report(runner.diagnostics, self.context.lines)}
+        if profile_loops:
+            result['loops'] = budget.report()
+        return program, result
+
+    # keywords
+    reserved = {
+        'var': 'KVAR',
+        'int': 'KINT',
+        'bool': 'KBOOL',
+        'string': 'KSTRING',
+        'for': 'KFOR',
+        'break': 'KBREAK',
+        'default': 'KDEFAULT',
+        'case': 'KCASE',
+        'else': 'KELSE',
+        'package': 'KPACKAGE',
+        'switch': 'KSWITCH',
+        'const': 'KCONST',
+        'if': 'KIF',
+        'func': 'KFUNC',
+        'continue': 'KCONTINUE',
+        'import': 'KIMPORT',
+        'Println': 'KPRINT',
+        'fmt': 'KFMT',
+        'main': 'KMAIN'
+    }
+
+    # tokens
+    tokens = (
+                 'NLD',  # newline
+                 'LOR', 'LAND',  # logical
+                 'LE', 'LT', 'GE', 'GT', 'EQ', 'NE',  # relational
+                 'MOE', 'DEF', 'PE', 'ME', 'TE', 'DE',  # assign
+                 'PP', 'MM',  # increase
+
+                 'ID', 'INT', 'BOOL', 'STRING'  # identifier
+             ) + tuple(reserved.values())
+
+    t_LOR = r'\|\|'
+    t_LAND = r'&&'
+
+    t_LE = r'<='
+    t_LT = r'<'
+    t_GE = r'>'
+    t_GT = r'>='
+    t_EQ = r'=='
+    t_NE = r'!='
+
+    t_PE = r'\+='
+    t_ME = r'-='
+    t_TE = r'\*='
+    t_DE = r'/='
+    t_MOE = r'%='
+
+    t_PP = r'\+\+'
+    t_MM = r'--'
+
+    t_DEF = r':='
+
+    t_STRING = r'"[^"]*"'  # accept all string but '"'
+
+    def t_BOOL(self, t):
+        r'false|true'
+        t.value = True if t.value == 'true' else False
+        return t
+
+    def t_ID(self, t):
+        r'[a-zA-Z_][a-zA-Z0-9_]*'
+        t.type = self.reserved.get(t.value, 'ID')  # keyword check
+        return t
+
+    def t_INT(self, t):
+        r'[\d]+'
+        t.value = int(t.value)
+        return t
+
+    def t_NLD(self, t):
+        r'[\t\s]*[\n]+[\t\s]*'
+        return t
+
+    literals = [
+        '=', '+', '-', '*', '/', '%',  # arithmetic(except '=')
+        '(', ')',  # parenthesis
+        '!',  # logical
+        '{', '}', ',', ':', '.', ';'
+    ]
+
+    # Ignored characters
+    t_ignore = ' \t'
+
+    # # Ignored token with an action associated with it
+    # def t_ignore_newline(self, t):
+    #     r'\n+'
+    #     t.lexer.lineno += t.value.count('\n')
+
+    # Error handler for illegal characters
+    def t_error(self, t):
+        self.context.diagnostics.append(Diagnostic(t.lexpos, ILLEGAL_CHARACTER, f'Illegal character {t.value[0]!r}'))
+        t.lexer.skip(1)
+
+    # lexer.input("1+2+345")
+    # while True:
+    #     token = lexer.token()
+    #     if not token:
+    #         break
+    #     print(token)
+
+    # Parsing rules
+
+    precedence = (
+        ('nonassoc', 'PE', 'ME', 'TE', 'DE', 'MOE', 'DEF'),
+        ('left', 'LAND', 'LOR'),
+        ('right', '!'),
+
+        ['nonassoc', 'LE', 'LT', 'GE', 'GT'],  # do not allow expanding
+        ('left', '+', '-'),
+        ('left', '*', '/'),
+        ('right', 'UMINUS')
+    )
+
+    start = 'start'
+
+    # def p_test(self, p):
+    #     """
+    #     test : KPACKAGE KMAIN NLD global_statement import_statement NL
+    #     """
+
+    def p_start(self, p):  # import statement 추가
+        """
+        start : KPACKAGE KMAIN NLD import_statement NLD main_statement
+        """
+        imports = () if p[4] is None else (p[4], )
+        p[0] = Program(imports, *p[6], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_import_statement(self, p):
+        """
+        import_statement : KIMPORT STRING
+        """
+        p[0] = p[2][1:-1]
+
+    def p_import_statement_empty(self, p):
+        """
+        import_statement : empty
+        """
+        p[0] = None
+
+    def p_statement(self, p):
+        """
+        statement : print_statement statement
+                  | if_statement statement
+                  | switch_statement statement
+                  | for_statement statement
+                  | assign_statement statement
+                  | break_statement statement
+                  | continue_statement statement
+        """
+        p[0] = (p[1], p[2])  # made into a tuple by block()
+
+    def p_statement_empty(self, p):
+        """
+        statement : empty
+        """
+        p[0] = None
+
+    # error recovery: a statement with a syntax error is skipped up to the end of its line, or up to the
+    # '}' of its block, and parsing goes on with the next statement.  A broken header of an if or for
+    # statement is skipped up to its '{', the block after it is still parsed for its own errors.
+    def p_statement_error(self, p):
+        """
+        statement : error NLD statement
+        """
+        p[0] = p[3]
+
+    def p_statement_error_header(self, p):
+        """
+        statement : error '{' NL statement '}' else_statement NLD statement
+        """
+        p[0] = p[8]
+
+    def p_statement_error_block(self, p):
+        """
+        statement : error
+        """
+        p[0] = None
+
+    def p_main_statement(self, p):
+        """
+        main_statement : global_statement KFUNC KMAIN '(' ')' '{' NL statement '}' NL
+        """
+        p[0] = (block(p[1]), block(p[8]))
+
+    # def p_main_statement_with_global(self, p):
+    #     """
+    #     main_statement : global_statement KFUNC KMAIN '(' ')' '{' NL statement NL '}' NLD global_statement
+    #     """
+    #     p[0] = (p[1], ("main", p[8]), p[12])
+
+    def p_NL(self, p):
+        """
+        NL : NLD
+           | empty
+        """
+
+    def p_global_statement(self, p):
+        """
+        global_statement : global_assign_statement NLD global_statement
+        """
+        p[0] = (p[1], p[3])
+
+    def p_global_statement_empty(self, p):
+        """global_statement : empty"""
+        p[0] = None
+
+    def p_global_statement_error(self, p):
+        """global_statement : error NLD global_statement"""
+        p[0] = p[3]
+
+    def p_global_assign_statement(self, p):
+        """
+        global_assign_statement : global_var_assign_statement
+                                | global_const_assign_statement
+        """
+        p[0] = p[1]
+
+    def p_global_assign_statement_default(self, p):  # type, zero value and redeclare checks are done by the evaluator
+        """global_var_assign_statement : KVAR ID type assign_expr"""
+        p[0] = VarDecl(p[2], p[3], p[4], False, lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_global_assign_const_statement(self, p):
+        """global_const_assign_statement : KCONST ID type assign_expr"""
+        p[0] = VarDecl(p[2], p[3], p[4], True, lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_if_statement(self, p):
+        """
+        if_statement : KIF condition '{' NL statement '}' else_statement NLD
+        """
+        p[0] = If(p[2], block(p[5]), p[7], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_else_statement_elif(self, p):
+        """
+        else_statement : KELSE KIF condition '{' NL statement '}' else_statement
+        """
+        p[0] = (If(p[3], block(p[6]), p[8], lineno=p.lineno(2), lexpos=p.lexpos(2)), )
+
+    def p_else_statement_else(self, p):
+        """else_statement : KELSE '{' NL statement '}'"""
+        p[0] = block(p[4])
+
+    def p_else_statement_empty(self, p):
+        """else_statement : empty"""
+        p[0] = tuple()
+
+    def p_switch_statement_cond(self, p):
+        """
+        switch_statement : KSWITCH '{' NL case_statement '}' NLD
+        """
+        p[0] = Switch(None, p[4], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_switch_statement_var(self, p):
+        """
+        switch_statement : KSWITCH expr_cond '{' NL case_var_statement '}' NLD
+        """
+        p[0] = Switch(p[2], p[5], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_case_statement(self, p):
+        """
+        case_statement : KCASE condition ':' NL statement case_statement
+        """
+        p[0] = (Case((p[2], ), block(p[5]), lineno=p.lineno(1), lexpos=p.lexpos(1)),) + p[6]
+
+    def p_case_statement_default(self, p):
+        """case_statement : KDEFAULT ':' NL statement case_without_default_statement"""
+        p[0] = (Case(None, block(p[4]), lineno=p.lineno(1), lexpos=p.lexpos(1)),) + p[5]
+
+    def p_case_statement_empty(self, p):
+        """case_statement : empty"""
+        p[0] = tuple()
+
+    def p_case_without_default_statement(self, p):
+        """
+        case_without_default_statement : KCASE condition ':' NL statement case_without_default_statement
+        """
+        p[0] = (Case((p[2], ), block(p[5]), lineno=p.lineno(1), lexpos=p.lexpos(1)),) + p[6]
+
+    def p_case_without_default_statement_empty(self, p):
+        """case_without_default_statement : empty"""
+        p[0] = tuple()
+
+    def p_case_var_statement(self, p):
+        """
+        case_var_statement : KCASE var_statement ':' NL statement case_var_statement
+        """
+        p[0] = (Case(p[2], block(p[5]), lineno=p.lineno(1), lexpos=p.lexpos(1)),) + p[6]
+
+    def p_case_var_statement_default(self, p):
+        """case_var_statement : KDEFAULT ':' NL statement case_var_without_default_statement"""
+        p[0] = (Case(None, block(p[4]), lineno=p.lineno(1), lexpos=p.lexpos(1)), ) + p[5]
+
+    def p_case_var_statement_empty(self, p):
+        """case_var_statement : empty"""
+        p[0] = tuple()
+
+    def p_case_var_without_default_statement(self, p):
+        """
+        case_var_without_default_statement : KCASE var_statement ':' NL statement case_var_without_default_statement
+        """
+        p[0] = (Case(p[2], block(p[5]), lineno=p.lineno(1), lexpos=p.lexpos(1)), ) + p[6]
+
+    def p_case_var_without_default_statement_empty(self, p):
+        """case_var_without_default_statement : empty"""
+        p[0] = tuple()
+
+    def p_var_statement(self, p):
+        """
+        var_statement : expr_cond comma_var
+        """
+        p[0] = (p[1], *p[2][::-1])
+
+    def p_comma_var(self, p):
+        """
+        comma_var : ',' expr_cond comma_var
+        """
+        p[0] = p[3] + (p[2], )
+
+    def p_var_empty(self, p):
+        """comma_var : empty"""
+        p[0] = tuple()
+
+    def p_for_statement(self, p):
+        """
+        for_statement : KFOR single_line_statement_1 ';' condition ';' single_line_statement_2 '{' NL statement '}' NLD
+        """
+        p[0] = For(p[2], p[4], p[6], block(p[9]), lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_for_statement_condition(self, p):
+        """
+        for_statement : KFOR condition '{' NL statement '}' NLD
+        """
+        p[0] = For(None, p[2], None, block(p[5]), lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_for_statement_infinite(self, p):
+        """
+        for_statement : KFOR '{' NL statement '}' NLD
+        """
+        p[0] = For(None, None, None, block(p[4]), lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_single_line_statement_1(self, p):
+        """
+        single_line_statement_1 : single_line_statement_2
+                                | def_statement
+        """
+        p[0] = p[1]
+
+    def p_single_line_statement_2(self, p):
+        """
+        single_line_statement_2 : reassign_statement
+                                | increase_statement
+                                | print_statement
+                                | empty
+        """
+        p[0] = p[1]
+
+    def p_break_statement(self, p):
+        """
+        break_statement : KBREAK NLD
+        """
+        p[0] = Break(lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_continue_statement(self, p):
+        """
+        continue_statement : KCONTINUE NLD
+        """
+        p[0] = Continue(lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_assign_statement(self, p):
+        """
+        assign_statement : var_assign_statement NLD
+                         | const_assign_statement NLD
+                         | def_statement NLD
+                         | increase_statement NLD
+                         | reassign_statement NLD
+        """
+        p[0] = p[1]
+
+    def p_increase_statement(self, p):
+        """
+        increase_statement : ID PP
+                           | ID MM
+        """
+        p[0] = IncDec(p[1], p[2], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_assign_statement_default(self, p):  # type, zero value and redeclare checks are done by the evaluator
+        """var_assign_statement : KVAR ID type assign_expr"""
+        p[0] = VarDecl(p[2], p[3], p[4], False, lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_assign_expr(self, p):
+        """
+        assign_expr : "=" expr_cond
+                    | empty
+        """
+        if p[1] == '=':
+            p[0] = p[2]
+
+    def p_type(self, p):
+        """
+        type : KINT
+             | KBOOL
+             | KSTRING
+             | empty
+        """
+        p[0] = p[1]
+
+    def p_expr_cond(self, p):
+        """
+        expr_cond : expression
+                  | condition
+        """
+        p[0] = p[1]
+
+    def p_assign_const_statement(self, p):
+        """const_assign_statement : KCONST ID type assign_expr"""
+        p[0] = VarDecl(p[2], p[3], p[4], True, lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_def_statement(self, p):
+        """def_statement : ID DEF expr_cond"""
+        p[0] = ShortVarDecl(p[1], p[3], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_statement_reassign(self, p):
+        """reassign_statement : ID "=" expr_cond"""
+        p[0] = Assign(p[1], p[3], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_statement_reassign_op(self, p):
+        """reassign_statement : ID assign_oper expression"""
+        p[0] = AugAssign(p[1], p[2], p[3], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_assign_oper(self, p):
+        """
+        assign_oper : PE
+                    | ME
+                    | TE
+                    | DE
+                    | MOE
+        """
+        p[0] = p[1]
+
+    def p_empty(self, p):
+        """empty :"""
+        p[0] = None
+        pass
+
+    def p_expression_binop(self, p):
+        """expression : expression oper expression"""
+        p[0] = BinOp(p[2], p[1], p[3], lineno=p[1].lineno, lexpos=p[1].lexpos)
+
+    def p_oper(self, p):
+        """
+        oper : '+'
+             | '-'
+             | '*'
+             | '/'
+             | '%'
+        """
+        p[0] = p[1]
+
+    def p_expression_uminus(self, p):
+        """expression : '-' expression %prec UMINUS"""
+        p[0] = UnaryOp('-', p[2], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_expression_group(self, p):
+        """expression : '(' expression ')'"""
         p[0] = p[2]
 
+    def p_expression_int(self, p):
+        """
+        expression : INT
+        """
+        p[0] = Literal(p[1], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_expression_string(self, p):
+        """
+        expression : STRING
+        """
+        p[0] = Literal(p[1][1:-1], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_expression_id(self, p):
+        """expression : ID"""
+        p[0] = Name(p[1], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_condition_binop(self, p):
+        """
+        condition : condition LAND condition
+                  | condition LOR condition
+        """
+        p[0] = BoolOp(p[2], p[1], p[3], lineno=p[1].lineno, lexpos=p[1].lexpos)
+
+    def p_condition_group(self, p):
+        """condition : '(' condition ')'"""
+        p[0] = p[2]
 
-def p_type(p):
-    """
-    type : KINT
-         | KBOOL
-         | KSTRING
-         | empty
-    """
-    p[0] = p[1]
-
-
-def p_expr_cond(p):
-    """
-    expr_cond : expression
-              | condition
-    """
-    p[0] = p[1]
-
-
-def p_assign_const_statement(p):
-    """const_assign_statement : KCONST ID type assign_expr"""
-    # redeclared check
-    if p[2] in names:
-        error_list.append(f"Error: {p[2]} redeclared in the scope")
-        return
-
-    t = type(p[4])
-    if p[3] == 'bool':
-        if p[4] is not None:
-            if t != bool:
-                error_list.append("TypeError: non bool type assigned to bool")
-                return
-            else:
-                names[p[2]] = p[4]  # Accepted
-
+    def p_condition_unot(self, p):
+        """condition : '!' condition"""
+        p[0] = UnaryOp('!', p[2], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_condition_bool(self, p):
+        """condition : BOOL"""
+        p[0] = Literal(p[1], lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_condition_relop(self, p):
+        """
+        condition : expression rel_op expression
+                  | condition EQ condition
+                  | condition NE condition
+        """
+        p[0] = Compare(p[2], p[1], p[3], lineno=p[1].lineno, lexpos=p[1].lexpos)
+
+    def p_rel_op(self, p):
+        """
+        rel_op : LT
+               | LE
+               | GT
+               | GE
+               | EQ
+               | NE
+        """
+        p[0] = p[1]
+
+    def p_print_statement(self, p):
+        """print_statement : KFMT '.' KPRINT '(' expr_cond args ')' NLD"""
+        p[0] = Print((p[5], *p[6][::-1]), lineno=p.lineno(1), lexpos=p.lexpos(1))
+
+    def p_args(self, p):
+        """
+        args : ',' expr_cond args
+        """
+        p[0] = p[3] + (p[2], )
+
+    def p_args_empty(self, p):
+        """args : empty"""
+        p[0] = tuple()
+
+    def p_error(self, p):
+        # errors within three tokens of the last one are not reported, they are most likely caused by it
+        self.context.is_error = True
+        if p:
+            self.context.diagnostics.append(Diagnostic(p.lexpos, SYNTAX, "SyntaxError: Syntax error at '%s'" % p.value))
         else:
-            names[p[2]] = False  # zero accepted
+            self.context.diagnostics.append(Diagnostic(self.lexer.lexlen, SYNTAX, "Syntax error at EOF"))
 
-    elif p[3] == 'int':
-        if p[4] is not None:
-            if t != int:
-                error_list.append("TypeError: non int type assigned to int")
-                return
-            else:
-                names[p[2]] = p[4]  # Accepted
 
-        else:
-            names[p[2]] = 0  # zero accepted
+backends = ('vm', 'closure', 'eval')
+source_suffixes = ('.go', '.txt')
 
-    elif p[3] == 'string':
-        if p[4] is not None:
-            if t != str:
-                error_list.append("TypeError: non string type assigned to string")
-                return
-            else:
-                names[p[2]] = p[4]  # Accepted
 
+def find_sources(paths):
+    """files named by paths, directories are searched for Go sources and globs are expanded"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(source_suffixes) and os.path.isfile(os.path.join(path, name)):
+                    yield os.path.join(path, name)
+        elif glob.has_magic(path):
+            yield from sorted(glob.glob(path, recursive=True))
         else:
-            names[p[2]] = ""  # zero accepted
-
-    constants.add(p[2])
-    p[0] = ("constant_assign", p[2], type(names[p[2]]), p[4])
-
-
-def p_def_statement(p):
-    """def_statement : ID DEF expr_cond"""
-    # redeclared check
-    if p[1] in names:
-        error_list.append(f"Error: {p[1]} redeclared in the scope")
-        return
-
-    names[p[1]] = p[3]
-    p[0] = ("def", p[1], type(names[p[1]]), p[3])
-
-
-def p_statement_reassign(p):
-    """reassign_statement : ID "=" expr_cond"""
-    # name check
-    if p[1] not in names and p[1] not in global_names:
-        error_list.append("Error: Undefined identifier '%s'" % p[1])
-        return
-
-    # const check
-    if p[1] in constants:
-        error_list.append(f"Error: cannot assign to constant {p[1]}")
-        return
-
-    # global const check
-    if p[1] not in names and p[1] in global_constants:
-        error_list.append(f"Error: cannot assign to global constant {p[1]}")
-        return
-
-    # type check
-    if p[1] in names and not isinstance(names[p[1]], type(p[3])):
-        error_list.append(f"TypeError: type mismatch {names[p[1]]} and {p[3]}")
-        return
-    elif p[1] in global_names and not isinstance(global_names[p[1]], type(p[3])):
-        error_list.append(f"TypeError: type mismatch {global_names[p[1]]} and {p[3]}")
-        return
-
-    if p[1] in names:
-        names[p[1]] = p[3]
-        p[0] = ("reassign", p[1], type(names[p[1]]), p[3])
-    else:
-        global_names[p[1]] = p[3]
-        p[0] = ("reassign_global", p[1], type(global_names[p[1]]), p[3])
-
-
-def p_statement_reassign_op(p):
-    """reassign_statement : ID assign_oper expression"""
-    # name check
-    if p[1] not in names and p[1] not in global_names:
-        error_list.append("Undefined identifier '%s'" % p[1])
-        return
-
-    # const check
-    if p[1] in constants or (p[1] not in names and p[1] in global_constants):
-        error_list.append(f"Error: cannot assign to constant {p[1]}")
-        return
-
-    # type check
-    if p[1] in names and not isinstance(names[p[1]], type(p[3])):
-        error_list.append(f"TypeError: type mismatch {names[p[1]]}({type(names[p[1]])}) and {p[3]}({type(p[3])})")
-        return
-
-    # global variable type check
-    if p[1] not in names and not isinstance(global_names[p[1]], type(p[3])):
-        error_list.append(
-            f"TypeError: type mismatch {global_names[p[1]]}({type(global_names[p[1]])}) and {p[3]}({type(p[3])})")
-        return
-
-    # string check
-    if p[1] in names and type(names[p[1]]) == str and p[2] != '+=':
-        error_list.append(f"Invalid operation: {p[2]} is not defined on string")
-        return
-
-    if p[1] in global_names and type(global_names[p[1]]) == str and p[2] != '+=':
-        error_list.append(f"Invalid operation: {p[2]} is not defined on string")
-        return
-
-    if p[2] == '+=':
-        if p[1] in names:
-            names[p[1]] += p[3]
-        else:
-            global_names[p[1]] += p[3]
-    elif p[2] == '-=':
-        if p[1] in names:
-            names[p[1]] -= p[3]
-        else:
-            global_names[p[1]] -= p[3]
-    elif p[2] == '*=':
-        if p[1] in names:
-            names[p[1]] *= p[3]
-        else:
-            global_names[p[1]] *= p[3]
-    elif p[2] == '/=':
-        if p[3] == 0:  # zero division check
-            error_list.append("ZeroDivisionError: division by zero")
-            return
-        if p[1] in names:
-            names[p[1]] //= p[3]
-        else:
-            global_names[p[1]] //= p[3]
-    elif p[2] == '%=':
-        if p[3] == 0:  # zero division check
-            error_list.append("ZeroDivisionError: division by zero")
-            return
-        if p[1] in names:
-            names[p[1]] %= p[3]
-        else:
-            global_names[p[1]] %= p[3]
-
-    if p[1] in names:
-        p[0] = ("reassign_op", p[1], type(names[p[1]]), names[p[1]])
-    else:
-        p[0] = ("reassign_op_global", p[1], type(global_names[p[1]]), global_names[p[1]])
-
-
-def p_assign_oper(p):
-    """
-    assign_oper : PE
-                | ME
-                | TE
-                | DE
-                | MOE
-    """
-    p[0] = p[1]
-
-
-def p_empty(p):
-    """empty :"""
-    p[0] = None
-    pass
-
-
-def p_expression_binop(p):
-    """expression : expression oper expression"""
-
-    # type check
-    if not isinstance(p[1], type(p[3])):
-        error_list.append(f"TypeError: type mismatch {p[1]} and {p[3]}")
-        p[0] = 0
-        return
-
-    # string check
-    if type(p[1]) == str and p[2] != '+':
-        error_list.append(f"Error: Invalid operation {p[2]} is not defined on string")
-        return
-
-    if p[2] == '+':
-        p[0] = p[1] + p[3]
-    elif p[2] == '-':
-        p[0] = p[1] - p[3]
-    elif p[2] == '*':
-        p[0] = p[1] * p[3]
-    elif p[2] == '/':
-        if p[3] == 0:  # zero division check
-            error_list.append("ZeroDivisionError: division by zero")
-            p[0] = 0
-            return
-        p[0] = p[1] // p[3]
-    elif p[2] == '%':
-        if p[3] == 0:  # zero division check
-            error_list.append("ZeroDivisionError: division by zero")
-            p[0] = 0
-            return
-        p[0] = p[1] % p[3]
-
-
-def p_oper(p):
-    """
-    oper : '+'
-         | '-'
-         | '*'
-         | '/'
-         | '%'
-    """
-    p[0] = p[1]
+            yield path
 
 
-def p_expression_uminus(p):
-    """expression : '-' expression %prec UMINUS"""
-    p[0] = -p[2]
+# batch checking: every worker process builds its own GoParser once and reuses it for all its files
 
+worker_parser = None
 
-def p_expression_group(p):
-    """expression : '(' expression ')'"""
-    p[0] = p[2]
 
+def init_worker(cache_dir=None):
+    global worker_parser
+    worker_parser = GoParser(cache=None if cache_dir is None else ResultCache(directory=cache_dir))
 
-def p_expression_int(p):
-    """
-    expression : INT
-    """
-    p[0] = p[1]
 
-
-def p_expression_string(p):
-    """
-    expression : STRING
-    """
-    p[0] = p[1].replace('"', '')  #
-
-
-def p_expression_id(p):
-    """expression : ID"""
+def check_file(job):
+    path, backend, limits, profile = job
+    budget = None if limits is None else LoopBudget(*limits)
     try:
-        p[0] = global_names[p[1]]
-    except KeyError:
-        try:
-            p[0] = names[p[1]]
-        except LookupError:
-            error_list.append("Error: Undefined identifier '%s'" % p[1])
-            p[0] = 0
-
-
-def p_condition_binop(p):
-    """
-    condition : condition LAND condition
-              | condition LOR condition
-    """
-
-    if p[2] == '&&':
-        p[0] = p[1] and p[3]
-    elif p[2] == '||':
-        p[0] = p[1] or p[3]
-
-
-def p_condition_group(p):
-    """condition : '(' condition ')'"""
-    p[0] = p[2]
-
-
-def p_condition_unot(p):
-    """condition : '!' condition"""
-    p[0] = not p[2]
-
-
-def p_condition_bool(p):
-    """condition : BOOL"""
-    p[0] = p[1]
-
-
-def p_condition_relop(p):
-    """
-    condition : expression rel_op expression
-              | condition EQ condition
-              | condition NE condition
-    """
-
-    # type check
-    if not isinstance(p[1], type(p[3])):
-        error_list.append(f"TypeError: type mismatch {p[1]} and {p[3]}")
-        p[0] = False
-        return
-
-    if p[2] == '<':
-        p[0] = p[1] < p[3]
-    elif p[2] == '<=':
-        p[0] = p[1] <= p[3]
-    elif p[2] == '>':
-        p[0] = p[1] > p[3]
-    elif p[2] == '>=':
-        p[0] = p[1] >= p[3]
-    elif p[2] == '==':
-        p[0] = p[1] == p[3]
-    elif p[2] == '!=':
-        p[0] = p[1] != p[3]
-
-
-def p_rel_op(p):
-    """
-    rel_op : LT
-           | LE
-           | GT
-           | GE
-           | EQ
-           | NE
-    """
-    p[0] = p[1]
-
-
-def p_print_statement(p):
-    """print_statement : KFMT '.' KPRINT '(' expr_cond args ')' NLD"""
-    if not is_fmt:
-        error_list.append("ImportError: 'fmt' is not imported")
-        return
-
-    p[0] = ("print", p[5], *p[6][::-1])
-
-
-def p_args(p):
-    """
-    args : ',' expr_cond args
-    """
-    p[0] = p[3] + (p[2], )
-
-
-def p_args_empty(p):
-    """args : empty"""
-    p[0] = tuple()
-
-
-def p_error(p):
-    global is_error
-    is_error = True
-    if p:
-        print("SyntaxError: Syntax error at '%s'" % p.value)
-        parser.errok()
+        with open(path, encoding='utf-8') as f:
+            result = worker_parser.check(f.read(), backend, budget=budget, profile_loops=profile)
+    except OSError as e:
+        result = {'accepted': False, 'print_list': [], **report([Diagnostic(None, IO, f"IOError: {e.strerror}")])}
+    return {'file': path, **result}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Parse and run Go programs, one JSON line per file")
+    arg_parser.add_argument('paths', nargs='*', help="Go files, directories or glob patterns")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    arg_parser.add_argument('-b', '--backend', choices=backends, default='vm', help="how programs are run")
+    arg_parser.add_argument('--cache', metavar='DIR', help="keep results in DIR and reuse them for unchanged files")
+    arg_parser.add_argument('--max-iterations', type=int,
+                            help="stop a program after this many loop iterations (default: no limit)")
+    arg_parser.add_argument('--max-time', type=float,
+                            help="stop a program after this many seconds in loops (default: no limit)")
+    arg_parser.add_argument('--profile-loops', action='store_true',
+                            help="report the iterations and time of every loop, results are not cached")
+    arg_parser.add_argument('--debug', action='store_true', help="log the parser stack to parse_log.txt")
+    arg_parser.add_argument('--build-tables', action='store_true', help="generate go_parsetab.py and exit")
+    args = arg_parser.parse_args(argv)
+
+    # generate go_parsetab.py
+    if args.build_tables:
+        yacc.yacc(module=GoParser(), tabmodule="go_parsetab", outputdir=here)
+        return 0
+
+    limits = None
+    if args.max_iterations is not None or args.max_time is not None:
+        limits = (args.max_iterations, args.max_time)
+    jobs = [(path, args.backend, limits, args.profile_loops) for path in find_sources(args.paths)]
+    if not jobs:
+        arg_parser.error("no Go files given")
+
+    if args.debug:
+        # debugging process(stack view), single process only
+        import logging
+
+        logging.basicConfig(
+            level=logging.INFO,
+            filename="parse_log.txt"
+        )
+        debug = logging.getLogger()
+        go_parser = GoParser()
+        for path, backend, limits, profile in jobs:
+            budget = None if limits is None else LoopBudget(*limits)
+            with open(path, encoding='utf-8') as f:
+                result = go_parser.check(f.read(), backend, debug=debug, budget=budget, profile_loops=profile)
+            print(json.dumps({'file': path, **result}), flush=True)
+        return 0
+
+    if args.jobs <= 1 or len(jobs) == 1:
+        init_worker(args.cache)
+        results = map(check_file, jobs)
+        for result in results:
+            print(json.dumps(result), flush=True)
     else:
-        print("Syntax error at EOF")
-
-
-parser = yacc.yacc()
-
-# debugging process(stack view)
-
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    filename="parse_log.txt"
-)
-
-# file execution for debug
-with open("examples//invalid_switch.txt") as f:
-    parser.parse(f.read(), debug=logging.getLogger())
-
+        with multiprocessing.Pool(min(args.jobs, len(jobs)), initializer=init_worker,
+                                  initargs=(args.cache, )) as pool:
+            for result in pool.imap(check_file, jobs):
+                print(json.dumps(result), flush=True)
+    return 0
 
-if error_list or is_error:
-    print(*error_list, sep='\n')
-else:
-    print(*print_list, sep='\n')
 
-input()
+if __name__ == "__main__":
+    sys.exit(main())
 
 
 # # file execution
@@ -49,6 +49,9 @@ else:
 # -----------------------------------------------------------------------------
 # Default preprocessor lexer definitions.   These tokens are enough to get
 # a basic preprocessor working.   Other modules may import these if they want
+#
+# The rules don't count newlines, the lexer keeps lineno from its line index
+# (lex.lex(linestarts=True), Preprocessor turns it on in a clone of a lexer without it).
 # -----------------------------------------------------------------------------
 
 tokens = (
@@ -62,7 +65,6 @@ literals = "+-*/%|&~^<>=!?()[]{}.,;:\\\'\""
 # Whitespace
 def t_CPP_WS(t):
     r'\s+'
-    t.lexer.lineno += t.value.count("\n")
     return t
 
 
@@ -88,14 +90,12 @@ t_CPP_FLOAT = r'((\d+)(\.\d+)(e(\+|-)?(\d+))? | (\d+)e(\+|-)?(\d+))([lL]|[fF])?'
 # String literal
 def t_CPP_STRING(t):
     r'\"([^\\\n]|(\\(.|\n)))*?\"'
-    t.lexer.lineno += t.value.count("\n")
     return t
 
 
 # Character constant 'c' or L'c'
 def t_CPP_CHAR(t):
     r'(L)?\'([^\\\n]|(\\(.|\n)))*?\''
-    t.lexer.lineno += t.value.count("\n")
     return t
 
 
@@ -103,7 +103,6 @@ def t_CPP_CHAR(t):
 def t_CPP_COMMENT1(t):
     r'(/\*(.|\n)*?\*/)'
     ncr = t.value.count("\n")
-    t.lexer.lineno += ncr
     # replace with one space or a number of '\n'
     t.type = 'CPP_WS';
     t.value = '\n' * ncr if ncr else ' '
@@ -204,6 +203,10 @@ class Preprocessor(object):
     def __init__(self, lexer=None):
         if lexer is None:
             lexer = lex.lexer
+        if not lexer.lexlinestarts:
+            # the token rules don't count lines, the clone keeps lineno from its line index
+            lexer = lexer.clone()
+            lexer.lexlinestarts = True
         self.lexer = lexer
         self.macros = {}
         self.path = []
@@ -979,7 +982,7 @@ class Preprocessor(object):
 if __name__ == '__main__':
     import ply.lex as lex
 
-    lexer = lex.lex()
+    lexer = lex.lex(linestarts=True)
 
     # Run a preprocessor
     import sys
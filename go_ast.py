@@ -0,0 +1,212 @@
+# AST node classes built by the grammar actions in Golang_1130.py
+#
+# Every node keeps the line number and the lex position of the token that starts it, so
+# that errors found while checking or running a program can point back to the source.  The
+# nodes of interned trees are shared by programs that have them in different places, their
+# positions are kept in a table of each program instead (see Interner and position()).
+# Child statement lists are always tuples.
+
+import threading
+from collections import OrderedDict
+
+
+class Node:
+    __slots__ = ('lineno', 'lexpos')
+    _fields = ()
+
+    def __init__(self, *args, lineno=0, lexpos=0):
+        for name, value in zip(self._fields, args):
+            setattr(self, name, value)
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        args = ', '.join(repr(getattr(self, name)) for name in self._fields)
+        return f"{type(self).__name__}({args})"
+
+
+# program
+
+class Program(Node):
+    # imports: import paths, globals: global declarations, body: statements of main
+    __slots__ = _fields = ('imports', 'globals', 'body')
+
+
+# statements
+
+class VarDecl(Node):
+    # var/const name type = value (type and value may be None)
+    __slots__ = _fields = ('name', 'type', 'value', 'const')
+
+
+class ShortVarDecl(Node):
+    # name := value
+    __slots__ = _fields = ('name', 'value')
+
+
+class Assign(Node):
+    # name = value
+    __slots__ = _fields = ('name', 'value')
+
+
+class AugAssign(Node):
+    # name op value, op is one of += -= *= /= %=
+    __slots__ = _fields = ('name', 'op', 'value')
+
+
+class IncDec(Node):
+    # name++ / name--
+    __slots__ = _fields = ('name', 'op')
+
+
+class Print(Node):
+    # fmt.Println(args...)
+    __slots__ = _fields = ('args', )
+
+
+class If(Node):
+    # orelse holds the else statements, an else if is a single nested If
+    __slots__ = _fields = ('cond', 'body', 'orelse')
+
+
+class Switch(Node):
+    # tag is None for a switch on conditions
+    __slots__ = _fields = ('tag', 'cases')
+
+
+class Case(Node):
+    # values is None for default, otherwise the case values (or the single condition)
+    __slots__ = _fields = ('values', 'body')
+
+
+class For(Node):
+    # init, cond and post are None when missing, for {} has none of them
+    __slots__ = _fields = ('init', 'cond', 'post', 'body')
+
+
+class Break(Node):
+    __slots__ = _fields = ()
+
+
+class Continue(Node):
+    __slots__ = _fields = ()
+
+
+# expressions
+
+class BinOp(Node):
+    # arithmetic: + - * / %
+    __slots__ = _fields = ('op', 'left', 'right')
+
+
+class Compare(Node):
+    # relational: < <= > >= == !=
+    __slots__ = _fields = ('op', 'left', 'right')
+
+
+class BoolOp(Node):
+    # logical: && ||
+    __slots__ = _fields = ('op', 'left', 'right')
+
+
+class UnaryOp(Node):
+    # - and !
+    __slots__ = _fields = ('op', 'operand')
+
+
+class Literal(Node):
+    __slots__ = _fields = ('value', )
+
+
+class Name(Node):
+    __slots__ = _fields = ('id', )
+
+
+def position(node, positions=None):
+    """(lineno, lexpos) of node, looked up in positions for the nodes of an interned tree"""
+    if positions:
+        where = positions.get(id(node))
+        if where is not None:
+            return where
+    return node.lineno, node.lexpos
+
+
+def move_lines(tree, delta, offset=0):
+    """adds delta to the line numbers and offset to the lex positions of tree, a node or a tuple of nodes,
+    and of everything below it"""
+    if isinstance(tree, tuple):
+        for item in tree:
+            move_lines(item, delta, offset)
+    elif isinstance(tree, Node):
+        tree.lineno += delta
+        tree.lexpos += offset
+        for name in tree._fields:
+            move_lines(getattr(tree, name), delta, offset)
+
+
+class Interner:
+    """
+    Hash-consing of trees: intern() returns a tree equal to the one given, made of the nodes and tuples
+    already interned for an earlier tree wherever a subtree was seen before, so programs that differ
+    only slightly share most of their nodes.  Positions are not part of a subtree: the same statement
+    on another line, or after an edit that moved it, is still shared.  A shared node has no position of
+    its own (lineno and lexpos are 0), intern() puts the position it has in the tree given into a table
+    of that tree, found by id(node) (see position()).  A subtree seen more than once in the same tree is
+    shared with a different node each time, so every node of an interned tree has a single position.
+    At most maxsize subtrees are kept, the least recently used are dropped first.  Interned trees are
+    shared, they must not be modified.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.table)
+
+    def intern(self, tree, positions=None):
+        """tree made of interned subtrees, the positions of its nodes are added to the dict positions"""
+        with self.lock:
+            return self._intern(tree, {} if positions is None else positions, {})
+
+    @staticmethod
+    def key(item):
+        # interned subtrees are told apart by identity, values by type and value (1, 1.0 and True are equal)
+        if isinstance(item, (tuple, Node)):
+            return id(item)
+        return type(item), item
+
+    def _intern(self, tree, positions, seen):
+        # seen: key -> times it was met in this tree, the nth time is interned as a subtree of its own
+        if isinstance(tree, tuple):
+            items = tuple(self._intern(item, positions, seen) for item in tree)
+            key = (tuple, ) + tuple(map(self.key, items))
+        elif isinstance(tree, Node):
+            items = tuple(self._intern(getattr(tree, name), positions, seen) for name in tree._fields)
+            key = (type(tree), ) + tuple(map(self.key, items))
+            count = seen.get(key, 0)
+            seen[key] = count + 1
+            if count:
+                key += (count, )
+        else:
+            return tree
+
+        table = self.table
+        entry = table.get(key)
+        if entry is not None:
+            self.hits += 1
+            table.move_to_end(key)
+            shared = entry[0]
+        else:
+            self.misses += 1
+            shared = items if isinstance(tree, tuple) else type(tree)(*items)
+            # the children are kept with the entry so that their ids in the key are not reused
+            table[key] = (shared, items)
+            if len(table) > self.maxsize:
+                table.popitem(last=False)
+        if not isinstance(tree, tuple):
+            positions[id(shared)] = (tree.lineno, tree.lexpos)
+        return shared
@@ -0,0 +1,255 @@
+# Benchmarks for the Go front end
+#
+# The corpora are synthetic programs of a given shape and size for the grammar of Golang_1130.py:
+# deeply nested blocks, long expression chains, many globals and big switches.  They are made
+# from a seed, so the same arguments always give the same programs and the results can be
+# compared across commits.  Every program is timed in three phases: lexing only, parsing (lexing
+# included) and a full check (parsing, folding and running it on a backend).  The results are
+# printed as one JSON line per program and phase, with tokens/s, reductions/s and the peak memory
+# of the phase.  The counts of reductions, shifts and token fetches come from a profiled parse
+# (ply.yacc.ParseProfile), which can also report the grammar rules that take the most time.
+#
+#     python go_bench.py                          all corpora at their default size
+#     python go_bench.py nesting switch --size 200 --repeat 10
+#     python go_bench.py expressions --phases parse --rules 5
+#     python go_bench.py --write corpus/          also keep the programs, to check them with Golang_1130.py
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from Golang_1130 import GoParser, backends
+
+
+def program(globals_, body):
+    """source of a program with the given global declarations and body of main, both lists of lines"""
+    lines = ['package main', '', 'import "fmt"', '']
+    if globals_:
+        lines.extend(globals_)
+        lines.append('')
+    lines.append('func main() {')
+    lines.extend('    ' + line for line in body)
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def nesting(size, rng):
+    """if, for and switch blocks nested size deep"""
+    body = ['x := 0']
+    indent = ''
+    for depth in range(size):
+        kind = rng.choice(('if', 'for', 'switch'))
+        if kind == 'if':
+            body.append(f'{indent}if x >= {-rng.randint(0, 9)} {{')
+        elif kind == 'for':
+            body.append(f'{indent}for i{depth} := 0; i{depth} < 1; i{depth}++ {{')
+        else:
+            body.append(f'{indent}switch {{')
+            body.append(f'{indent}case x >= 0:')
+        body.append(f'{indent}    x += {rng.randint(1, 9)}')
+        indent += '    '
+    body.append(f'{indent}fmt.Println(x)')
+    while indent:
+        indent = indent[:-4]
+        body.append(f'{indent}}}')
+    return program([], body)
+
+
+def expressions(size, rng):
+    """arithmetic and boolean expressions of size operands each"""
+    body = ['a := 3', 'b := 5', 'c := 7']
+
+    def operand():
+        kind = rng.randrange(4)
+        if kind == 0:
+            return str(rng.randint(1, 9))
+        if kind == 1:
+            return f'({rng.choice("abc")} * {rng.randint(1, 9)})'
+        return rng.choice('abc')
+
+    for n in range(10):
+        terms = [operand()]
+        for i in range(size - 1):
+            terms.append(rng.choice('+-'))
+            terms.append(operand())
+        body.append(f'x{n} := ' + ' '.join(terms))
+    for n in range(5):
+        terms = [f'{operand()} {rng.choice(("<", "<=", ">", ">=", "==", "!="))} {operand()}' for i in range(size)]
+        body.append(f'y{n} := ' + ' '.join(f'{term} {rng.choice(("&&", "||"))}' for term in terms[:-1]) + ' '
+                    + terms[-1])
+    body.append('fmt.Println(' + ', '.join(f'x{n}' for n in range(10)) + ')')
+    body.append('fmt.Println(' + ', '.join(f'y{n}' for n in range(5)) + ')')
+    return program([], body)
+
+
+def many_globals(size, rng):
+    """size global variables and constants, all of them used by main"""
+    globals_ = []
+    for n in range(size):
+        kind = rng.randrange(3)
+        if kind == 0:
+            globals_.append(f'const g{n} int = {rng.randint(0, 1000)}')
+        elif kind == 1:
+            globals_.append(f'var g{n} int = {rng.randint(0, 1000)}')
+        else:
+            globals_.append(f'var g{n} int')
+    body = ['x := 0']
+    for start in range(0, size, 20):
+        body.append('x += ' + ' + '.join(f'g{n}' for n in range(start, min(start + 20, size))))
+    body.append('fmt.Println(x)')
+    return program(globals_, body)
+
+
+def big_switch(size, rng):
+    """switches of size cases on constant values, run once for every case"""
+    body = ['x := 0', f'for i := 0; i < {size + 1}; i++ {{', '    switch i {']
+    values = list(range(size))
+    rng.shuffle(values)
+    for value in values:
+        body.append(f'    case {value}:')
+        body.append(f'        x += {rng.randint(1, 9)}')
+    body.append('    default:')
+    body.append('        x -= 1')
+    body.append('    }')
+    body.append('    switch {')
+    for value in values[:size // 4]:
+        body.append(f'    case i == {value}:')
+        body.append(f'        x *= 1')
+    body.append('    }')
+    body.append('}')
+    body.append('fmt.Println(x)')
+    return program([], body)
+
+
+# name -> (generator, default size)
+corpora = {
+    'nesting': (nesting, 100),
+    'expressions': (expressions, 200),
+    'globals': (many_globals, 1000),
+    'switch': (big_switch, 500),
+}
+
+
+def generate(name, size=None, seed=0):
+    """source of the program of corpus name, size defaults to the one of the corpus"""
+    generator, default = corpora[name]
+    return generator(default if size is None else size, random.Random(f'{name}:{seed}'))
+
+
+class Benchmark:
+    """times the phases of a program with one GoParser, the best of repeat runs is taken"""
+
+    def __init__(self, repeat=5, backend='vm', rules=0):
+        self.repeat = repeat
+        self.backend = backend
+        self.rules = rules  # number of grammar rules taking the most time reported for the parse phase
+        self.go_parser = GoParser()
+
+    def lex(self, source):
+        lexer = self.go_parser.lexer
+        lexer.lineno = 1
+        lexer.input(source)
+        return sum(1 for tok in lexer)
+
+    def parse(self, source):
+        return self.go_parser.parse(source)
+
+    def check(self, source):
+        return self.go_parser.check(source, self.backend)
+
+    def profile(self, source):
+        """ply.yacc.ParseProfile of parsing source: reductions per rule, shifts and token fetches"""
+        self.go_parser.parse(source, profile=True)
+        return self.go_parser.parser.profile
+
+    def measure(self, phase, source):
+        """(best time, peak memory) of a phase, memory is traced in a run of its own"""
+        run = getattr(self, phase)
+        best = float('inf')
+        for i in range(self.repeat):
+            start = time.perf_counter()
+            run(source)
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            run(source)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return best, peak
+
+    def run(self, name, size=None, seed=0, phases=('lex', 'parse', 'check')):
+        """one result dict for each phase of the program of corpus name"""
+        source = generate(name, size, seed)
+        tokens = self.lex(source)
+        profile = self.profile(source)
+        result = self.check(source)
+        if result['error_list']:
+            raise RuntimeError(f"{name} corpus does not check: {result['error_list'][0]}")
+
+        for phase in phases:
+            seconds, peak = self.measure(phase, source)
+            reductions = profile.reductions
+            row = {
+                'corpus': name,
+                'size': corpora[name][1] if size is None else size,
+                'seed': seed,
+                'phase': phase,
+                'backend': self.backend if phase == 'check' else None,
+                'bytes': len(source),
+                'lines': source.count('\n'),
+                'tokens': tokens,
+                'reductions': reductions,
+                'shifts': profile.shifts,
+                'fetches': profile.fetches,
+                'seconds': seconds,
+                'tokens_per_second': tokens / seconds,
+                'reductions_per_second': reductions / seconds if phase != 'lex' else None,
+                'peak_memory': peak,
+                'python': platform.python_version(),
+                'signature': self.go_parser._signature,
+            }
+            if phase == 'parse' and self.rules:
+                row['rules'] = [list(rule) for rule in profile.rules()[:self.rules]]
+            yield row
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark lexing, parsing and checking of synthetic Go "
+                                                     "programs, one JSON line per program and phase")
+    arg_parser.add_argument('corpora', nargs='*', metavar='CORPUS',
+                            help=f"programs to run: {', '.join(corpora)} (default: all)")
+    arg_parser.add_argument('--size', type=int, help="size of the programs, the default depends on the corpus")
+    arg_parser.add_argument('--seed', type=int, default=0, help="seed the programs are made from")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="runs of each phase, the best one is reported")
+    arg_parser.add_argument('-b', '--backend', choices=backends, default='vm', help="backend of the check phase")
+    arg_parser.add_argument('--phases', nargs='+', choices=('lex', 'parse', 'check'), default=('lex', 'parse', 'check'),
+                            help="phases to time")
+    arg_parser.add_argument('--rules', type=int, default=0, metavar='N',
+                            help="report the N grammar rules taking the most time in the parse phase")
+    arg_parser.add_argument('--write', metavar='DIR', help="also write the programs to DIR")
+    args = arg_parser.parse_args(argv)
+    unknown = [name for name in args.corpora if name not in corpora]
+    if unknown:
+        arg_parser.error(f"unknown corpus {unknown[0]!r}")
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))  # the backends recurse into nested blocks
+    benchmark = Benchmark(args.repeat, args.backend, args.rules)
+    for name in args.corpora or corpora:
+        if args.write:
+            os.makedirs(args.write, exist_ok=True)
+            with open(os.path.join(args.write, f'{name}_{args.seed}.go'), 'w', encoding='utf-8') as f:
+                f.write(generate(name, args.size, args.seed))
+        for result in benchmark.run(name, args.size, args.seed, args.phases):
+            print(json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Cache of the results of GoParser.check()
+#
+# An entry holds the parse tree, print_list, error_list and diagnostics of one check.  It is found by a
+# hash of the source together with the signature of the checker (the grammar and the code
+# that checks and runs programs), the backend and the limits of the loop budget, so a changed
+# file or a changed checker never sees an old result.  Entries are kept in memory with an LRU bound and, if a
+# directory is given, also written there as pickles to be shared between processes and
+# runs.  Pickles are only safe to load from a directory nobody else can write to.
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, maxsize=1000, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(signature, backend, source, limits=None):
+        digest = hashlib.sha256(f"{signature}:{backend}:{limits}:".encode('utf-8'))
+        digest.update(source.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """(program, result) cached under key or None, the result is a copy the caller may change"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.directory is not None:
+            entry = self.read(key)
+            if entry is not None:
+                self.remember(key, entry)
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        program, result = entry
+        return program, self.copy(result)
+
+    def put(self, key, program, result):
+        entry = (program, self.copy(result))
+        self.remember(key, entry)
+        if self.directory is not None:
+            self.write(key, entry)
+
+    @staticmethod
+    def copy(result):
+        # the lists of a result are changed by callers, the diagnostics they hold are not
+        return {**result, 'print_list': list(result['print_list']), 'error_list': list(result['error_list']),
+                'diagnostics': list(result['diagnostics'])}
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    # on-disk store, a file that can't be read or written is a miss
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def read(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def write(self, key, entry):
+        # written to a temporary name and moved into place, other processes never read half a file
+        filename = self.path(key)
+        tmpname = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmpname, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        except (OSError, pickle.PicklingError, RecursionError):
+            pass
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
@@ -0,0 +1,558 @@
+# Closure compiling backend for the AST built by Golang_1130.py
+#
+# compile_closures() turns every statement and expression node into a Python closure that
+# is bound to its already compiled children, its resolved variable slots and the function
+# for its operator.  Running the program is a call of the closure of the main block, no
+# node types or operator strings are looked at any more.
+#
+# Expression closures take the frame (a list with one entry per slot) and return a value.
+# Statement closures return None, or BREAK / CONTINUE to leave the enclosing loop or switch.
+# Errors are handled like in the other backends: an error found at compile time becomes a
+# closure that raises it where the evaluator would find it, and an error skips the rest of
+# its statement.  Where the static types from go_types prove that a type check
+# can't fail, the closure is made without it.
+
+import operator
+import time
+
+from go_ast import *
+from go_diagnostics import Diagnostic, RUNTIME
+from go_eval import GoError, SymbolTable, BudgetExceeded, LoopBudget, format_value, declare_value, binary_op, \
+    compare_op, compare_functions, unary_op, check_assign, constant_cases
+from go_types import check_types
+
+BREAK = 1
+CONTINUE = 2
+
+
+def undefined(name):
+    return GoError(f"Error: Undefined identifier '{name}'")
+
+
+def failure(error):
+    """closure raising an error found at compile time"""
+    message = str(error)
+
+    def fail(frame):
+        raise GoError(message)
+
+    return fail
+
+
+# operators, the int cases are handled inline and everything else goes to the checked versions
+
+def op_add(left, right):
+    if type(left) == type(right) and type(left) != bool:
+        return left + right
+    return binary_op('+', left, right)
+
+
+def op_sub(left, right):
+    if type(left) == int and type(right) == int:
+        return left - right
+    return binary_op('-', left, right)
+
+
+def op_mul(left, right):
+    if type(left) == int and type(right) == int:
+        return left * right
+    return binary_op('*', left, right)
+
+
+def op_div(left, right):
+    if type(left) == int and type(right) == int and right:
+        return left // right
+    return binary_op('/', left, right)
+
+
+def op_mod(left, right):
+    if type(left) == int and type(right) == int and right:
+        return left % right
+    return binary_op('%', left, right)
+
+
+def int_div(left, right):
+    if right:
+        return left // right
+    return binary_op('/', left, right)
+
+
+def int_mod(left, right):
+    if right:
+        return left % right
+    return binary_op('%', left, right)
+
+
+binary_functions = {'+': op_add, '-': op_sub, '*': op_mul, '/': op_div, '%': op_mod}
+# for operands of known types, the type checks are left out
+int_functions = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': int_div, '%': int_mod}
+
+
+class ClosureProgram:
+    """compiled program, run() can be called any number of times"""
+
+    def __init__(self, main, nslots):
+        self.main = main
+        self.nslots = nslots
+        self.print_list = []
+        self.diagnostics = []
+        self.budget = None
+
+    def run(self, budget=None):
+        self.print_list = []
+        self.diagnostics = []
+        self.budget = LoopBudget() if budget is None else budget
+        self.budget.start()
+        try:
+            self.main([None] * self.nslots)
+        except BudgetExceeded as e:
+            self.diagnostics.append(e.diagnostic())
+
+
+class ClosureCompiler(SymbolTable):
+    def __init__(self, positions=None):
+        SymbolTable.__init__(self)
+        self.positions = positions  # id(node) -> (lineno, lexpos) for an interned program, see go_ast.position()
+        self.program = None
+        self.types = {}
+
+        self.statements = {
+            VarDecl: self.compile_var_decl,
+            ShortVarDecl: self.compile_short_var_decl,
+            Assign: self.compile_assign,
+            AugAssign: self.compile_aug_assign,
+            IncDec: self.compile_inc_dec,
+            Print: self.compile_print,
+            If: self.compile_if,
+            Switch: self.compile_switch,
+            For: self.compile_for,
+            Break: self.compile_break,
+            Continue: self.compile_continue,
+        }
+        self.expressions = {
+            BinOp: self.compile_bin_op,
+            Compare: self.compile_compare,
+            BoolOp: self.compile_bool_op,
+            UnaryOp: self.compile_unary_op,
+            Literal: self.compile_literal,
+            Name: self.compile_name,
+        }
+
+    def compile(self, program):
+        self.program = ClosureProgram(None, 0)
+        self.types = check_types(program)
+        self.enter_scope()
+        global_block = self.compile_block(program.globals, new_scope=False)
+        main_block = self.compile_block(program.body)
+
+        def main(frame):
+            global_block(frame)
+            main_block(frame)
+
+        self.program.main = main
+        self.program.nslots = len(self.symbols)
+        return self.program
+
+    # statements
+
+    def compile_block(self, statements, new_scope=True):
+        if new_scope:
+            self.enter_scope()
+        compiled = []
+        positions = []  # lex position of each compiled statement, for its errors
+        for stmt in statements:
+            try:
+                compiled.append(self.statements[type(stmt)](stmt))
+            except GoError as e:
+                compiled.append(failure(e))
+            positions.append(position(stmt, self.positions)[1])
+        if new_scope:
+            self.leave_scope()
+
+        compiled = tuple(compiled)
+        program = self.program
+
+        def block(frame):
+            for i, stmt in enumerate(compiled):
+                try:
+                    signal = stmt(frame)
+                except GoError as e:
+                    program.diagnostics.append(Diagnostic(positions[i], RUNTIME, str(e)))
+                    continue
+                if signal:
+                    return signal
+
+        return block
+
+    def declaration(self, slot, value):
+        # a failing declaration leaves its variable undefined
+        def declare(frame):
+            try:
+                frame[slot] = value(frame)
+            except GoError:
+                frame[slot] = None
+                raise
+
+        return declare
+
+    def declared_value(self, typ, node):
+        expr = self.compile_expr(node)
+        static = self.types.get(node)
+        if static is not None and static != 'int' and typ in (None, static):
+            return expr  # only ints need the overflow check
+
+        def value(frame):
+            return declare_value('', typ, expr(frame))
+
+        return value
+
+    def compile_var_decl(self, node):
+        self.check_redeclared(node.name)
+        typ = node.type
+        if node.value is None:
+            try:
+                zero = declare_value(node.name, typ, None)
+            except GoError:
+                self.declare(node.name, None, node.const)
+                raise
+
+            def value(frame):
+                return zero
+        else:
+            value = self.declared_value(typ, node.value)
+
+        symbol = self.declare(node.name, typ or self.types.get(node.value), node.const)
+        return self.declaration(symbol.slot, value)
+
+    def compile_short_var_decl(self, node):
+        self.check_redeclared(node.name)
+        value = self.declared_value(None, node.value)
+        return self.declaration(self.declare(node.name, self.types.get(node.value)).slot, value)
+
+    def compile_assign(self, node):
+        symbol = self.resolve_assign(node.name)
+        slot = symbol.slot
+        name = node.name
+        value = self.compile_expr(node.value)
+
+        if symbol.type is not None and symbol.type == self.types.get(node.value):
+            def assign_typed(frame):
+                new = value(frame)
+                if frame[slot] is None:
+                    raise undefined(name)
+                frame[slot] = new
+
+            return assign_typed
+
+        def assign(frame):
+            new = value(frame)
+            old = frame[slot]
+            if old is None:
+                raise undefined(name)
+            if type(old) != type(new):
+                check_assign(old, new)
+            frame[slot] = new
+
+        return assign
+
+    def compile_aug_assign(self, node):
+        symbol = self.resolve_assign(node.name)
+        slot = symbol.slot
+        name = node.name
+        op = node.op
+        value = self.compile_expr(node.value)
+
+        if symbol.type == 'int' and self.types.get(node.value) == 'int':
+            function = int_functions[op[0]]
+
+            def aug_assign_int(frame):
+                old = frame[slot]
+                if old is None:
+                    raise undefined(name)
+                frame[slot] = function(old, value(frame))
+
+            return aug_assign_int
+
+        function = binary_functions[op[0]]
+
+        def aug_assign(frame):
+            old = frame[slot]
+            if old is None:
+                raise undefined(name)
+            new = value(frame)
+            check_assign(old, new, op)
+            frame[slot] = function(old, new)
+
+        return aug_assign
+
+    def compile_inc_dec(self, node):
+        symbol = self.resolve_assign(node.name)
+        slot = symbol.slot
+        name = node.name
+        step = 1 if node.op == '++' else -1
+
+        if symbol.type == 'int':
+            def inc_dec_int(frame):
+                old = frame[slot]
+                if old is None:
+                    raise undefined(name)
+                frame[slot] = old + step
+
+            return inc_dec_int
+
+        def inc_dec(frame):
+            old = frame[slot]
+            if type(old) != int:
+                if old is None:
+                    raise undefined(name)
+                raise GoError(f"Error: cannot add non-int type {type(old)}")
+            frame[slot] = old + step
+
+        return inc_dec
+
+    def compile_print(self, node):
+        args = tuple(self.compile_expr(arg) for arg in node.args)
+        program = self.program
+
+        def print_(frame):
+            program.print_list.append(' '.join(format_value(arg(frame)) for arg in args))
+
+        return print_
+
+    def compile_if(self, node):
+        cond = self.compile_expr(node.cond)
+        body = self.compile_block(node.body)
+        if not node.orelse:
+            def if_(frame):
+                if cond(frame):
+                    return body(frame)
+
+            return if_
+
+        orelse = self.compile_block(node.orelse)
+
+        def if_else(frame):
+            if cond(frame):
+                return body(frame)
+            return orelse(frame)
+
+        return if_else
+
+    def compile_switch(self, node):
+        tag = None if node.tag is None else self.compile_expr(node.tag)
+        cases = []
+        bodies = []
+        default = None
+        for case in node.cases:
+            if case.values is None:
+                default = self.compile_block(case.body)
+                bodies.append(default)
+            else:
+                values = tuple(self.compile_expr(value) for value in case.values)
+                cases.append((values, self.compile_block(case.body)))
+                bodies.append(cases[-1][1])
+        cases = tuple(cases)
+
+        def run_case(body, frame):
+            signal = body(frame)
+            if signal != BREAK:  # break leaves the switch
+                return signal
+
+        if tag is None:
+            def switch(frame):
+                for (cond, ), body in cases:
+                    if cond(frame):
+                        return run_case(body, frame)
+                if default is not None:
+                    return run_case(default, frame)
+        else:
+            def compare_cases(value, frame):
+                for values, body in cases:
+                    for case_value in values:
+                        if compare_op('==', value, case_value(frame)):
+                            return run_case(body, frame)
+                if default is not None:
+                    return run_case(default, frame)
+
+            def switch(frame):
+                return compare_cases(tag(frame), frame)
+
+            table = constant_cases(node)
+            if table is not None:
+                # constant case values, the case is looked up instead of compared with each value
+                label_type, indexes = table
+                targets = {value: bodies[index] for value, index in indexes.items()}
+
+                def switch_table(frame):
+                    value = tag(frame)
+                    if type(value) != label_type:
+                        return compare_cases(value, frame)  # reports the type mismatch
+                    body = targets.get(value, default)
+                    if body is not None:
+                        return run_case(body, frame)
+
+                return switch_table
+
+        return switch
+
+    def compile_for(self, node):
+        # an error in init, cond or post stops the whole loop
+        self.enter_scope()
+        try:
+            init = None if node.init is None else self.compile_clause(node.init)
+            cond = None if node.cond is None else self.compile_expr(node.cond)
+            body = self.compile_block(node.body)
+            post = None if node.post is None else self.compile_clause(node.post)
+        finally:
+            self.leave_scope()
+
+        program = self.program
+        lineno, lexpos = position(node, self.positions)
+
+        def for_(frame):
+            budget = program.budget
+            stats = budget.enter(lineno)
+            start = time.perf_counter()
+            granted = left = 0
+            try:
+                if init is not None:
+                    init(frame)
+                while cond is None or cond(frame):
+                    if not left:
+                        left = budget.grant(lineno, lexpos)
+                        granted += left
+                    left -= 1
+                    if body(frame) == BREAK:
+                        break
+                    if post is not None:
+                        post(frame)
+            finally:
+                budget.leave(stats, granted - left, left, start)
+
+        return for_
+
+    def compile_clause(self, stmt):
+        # init or post of a loop, an error in it stops the loop
+        try:
+            return self.statements[type(stmt)](stmt)
+        except GoError as e:
+            return failure(e)
+
+    def compile_break(self, node):
+        return lambda frame: BREAK
+
+    def compile_continue(self, node):
+        return lambda frame: CONTINUE
+
+    # expressions
+
+    def compile_expr(self, node):
+        return self.expressions[type(node)](node)
+
+    def compile_bin_op(self, node):
+        if self.types.get(node) == 'int':
+            function = int_functions[node.op]
+        elif self.types.get(node) == 'string':
+            function = operator.add
+        else:
+            function = binary_functions[node.op]
+        left = self.compile_expr(node.left)
+
+        if type(node.right) == Literal:
+            right_value = node.right.value
+
+            def bin_op_const(frame):
+                return function(left(frame), right_value)
+
+            return bin_op_const
+
+        right = self.compile_expr(node.right)
+
+        def bin_op(frame):
+            return function(left(frame), right(frame))
+
+        return bin_op
+
+    def compile_compare(self, node):
+        op = node.op
+        left = self.compile_expr(node.left)
+        right = self.compile_expr(node.right)
+
+        function = compare_functions.get(op)
+        if function is None:
+            raise GoError(f"Error: unknown operator {op}")
+
+        left_type = self.types.get(node.left)
+        if left_type is not None and left_type == self.types.get(node.right):
+            def compare_typed(frame):
+                return function(left(frame), right(frame))
+
+            return compare_typed
+
+        def compare(frame):
+            l, r = left(frame), right(frame)
+            if type(l) != type(r):
+                compare_op(op, l, r)
+            return function(l, r)
+
+        return compare
+
+    def compile_bool_op(self, node):
+        left = self.compile_expr(node.left)
+        right = self.compile_expr(node.right)
+
+        if node.op == '&&':
+            def bool_op(frame):
+                return left(frame) and right(frame)
+        else:
+            def bool_op(frame):
+                return left(frame) or right(frame)
+
+        return bool_op
+
+    def compile_unary_op(self, node):
+        op = node.op
+        operand = self.compile_expr(node.operand)
+
+        if self.types.get(node) == 'int':
+            def neg(frame):
+                return -operand(frame)
+
+            return neg
+        elif self.types.get(node) == 'bool':
+            def not_(frame):
+                return not operand(frame)
+
+            return not_
+
+        def unary(frame):
+            return unary_op(op, operand(frame))
+
+        return unary
+
+    def compile_literal(self, node):
+        value = node.value
+
+        def literal(frame):
+            return value
+
+        return literal
+
+    def compile_name(self, node):
+        try:
+            slot = self.resolve(node.id).slot
+        except GoError as e:
+            return failure(e)
+        name = node.id
+
+        def load(frame):
+            value = frame[slot]
+            if value is None:
+                raise undefined(name)
+            return value
+
+        return load
+
+
+def compile_closures(program, positions=None):
+    return ClosureCompiler(positions).compile(program)
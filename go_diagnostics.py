@@ -0,0 +1,53 @@
+# Diagnostics for Go programs
+#
+# Every error found in a program, by the lexer, the parser, the compilers or while running it,
+# is reported as a Diagnostic: where it was found, a code for the kind of error and the message.
+# The place is kept as the lex position of the token or statement, it is only turned into a line
+# and a column when the result is reported, with a LineIndex of the source that is built then.
+# Errors outside of the program text have neither, budget errors only know the line of their loop.
+
+# codes
+ILLEGAL_CHARACTER = 'illegal-character'
+SYNTAX = 'syntax'
+IMPORT = 'import'  # fmt.Println without importing fmt
+PLACEMENT = 'placement'  # break or continue outside of a loop
+RUNTIME = 'runtime'  # errors of the checks done by the backends, at compile or run time
+BUDGET = 'budget'  # a loop ran out of its LoopBudget
+IO = 'io'
+
+
+class Diagnostic:
+    __slots__ = ('lexpos', 'line', 'column', 'code', 'message')
+
+    def __init__(self, lexpos, code, message, line=None):
+        self.lexpos = lexpos
+        self.line = line
+        self.column = None
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return f"Diagnostic({self.lexpos!r}, {self.code!r}, {self.message!r}, line={self.line!r})"
+
+    def __str__(self):
+        if self.line is None:
+            return self.message
+        if self.column is None:
+            return f"{self.line}: {self.message}"
+        return f"{self.line}:{self.column}: {self.message}"
+
+    def locate(self, lines):
+        """fill in line and column from lexpos, lines is a ply.lex.LineIndex of the source"""
+        if self.lexpos is not None:
+            self.line, self.column = lines.position(self.lexpos)
+
+    def as_dict(self):
+        return {'line': self.line, 'column': self.column, 'code': self.code, 'message': self.message}
+
+
+def report(diagnostics, lines=None):
+    """the error_list and diagnostics entries of a check result, located with the LineIndex lines"""
+    if lines is not None:
+        for diagnostic in diagnostics:
+            diagnostic.locate(lines)
+    return {'error_list': [d.message for d in diagnostics], 'diagnostics': [d.as_dict() for d in diagnostics]}
@@ -0,0 +1,545 @@
+# Evaluator for the AST built by Golang_1130.py
+#
+# The parser only builds the tree, the program is executed here by walking it.  A parsed
+# program can therefore be run any number of times.  Errors found while running a statement
+# are added to diagnostics with the line of the statement and the statement is skipped,
+# fmt.Println output goes to print_list.
+#
+# The evaluator looks names up in a chain of Scope dicts at run time, it is left without the
+# slots the compiling backends resolve with SymbolTable on purpose: it is the plain
+# definition of what a program does, and the vm and closure backends are checked against
+# it.  Resolving its names with the same SymbolTable would make a scoping bug in it a bug of
+# every backend at once, and go undetected.  Programs that have to run fast use those backends.
+
+import operator
+import time
+
+from go_ast import *
+from go_diagnostics import Diagnostic, RUNTIME, BUDGET
+
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+zero_values = {'int': 0, 'bool': False, 'string': ""}
+type_names = {int: 'int', bool: 'bool', str: 'string'}
+
+
+class GoError(Exception):
+    pass
+
+
+class BreakLoop(Exception):
+    pass
+
+
+class ContinueLoop(Exception):
+    pass
+
+
+def format_value(value):
+    if type(value) == bool:
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def declare_value(name, typ, value):
+    """value of a newly declared variable, typ and value may be None"""
+    if value is None:
+        if typ is None:
+            raise GoError(f"Error: missing type or value for {name}")
+        return zero_values[typ]  # zero accepted
+
+    if typ is not None and type_names.get(type(value)) != typ:
+        raise GoError(f"TypeError: non {typ} type assigned to {typ}")
+
+    if type(value) == int and not INT_MIN <= value <= INT_MAX:
+        raise GoError(f"Overflow Error: can not use {value} for int32")
+
+    return value
+
+
+def binary_op(op, left, right):
+    """arithmetic operators (+ - * / %) with the go type checks"""
+    if type(left) != type(right):
+        raise GoError(f"TypeError: type mismatch {left} and {right}")
+
+    if type(left) == str:
+        if op != '+':
+            raise GoError(f"Error: Invalid operation {op} is not defined on string")
+    elif type(left) == bool:
+        raise GoError(f"Error: Invalid operation {op} is not defined on bool")
+
+    if op == '+':
+        return left + right
+    elif op == '-':
+        return left - right
+    elif op == '*':
+        return left * right
+    elif op == '/':
+        if right == 0:  # zero division check
+            raise GoError("ZeroDivisionError: division by zero")
+        return left // right
+    elif op == '%':
+        if right == 0:  # zero division check
+            raise GoError("ZeroDivisionError: division by zero")
+        return left % right
+    raise GoError(f"Error: unknown operator {op}")
+
+
+compare_functions = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq,
+                     '!=': operator.ne}
+
+
+def compare_op(op, left, right):
+    """relational operators (< <= > >= == !=)"""
+    if type(left) != type(right):
+        raise GoError(f"TypeError: type mismatch {left} and {right}")
+
+    function = compare_functions.get(op)
+    if function is None:
+        raise GoError(f"Error: unknown operator {op}")
+    return function(left, right)
+
+
+def unary_op(op, operand):
+    if op == '-':
+        if type(operand) != int:
+            raise GoError(f"Error: Invalid operation {op} is not defined on {type_names[type(operand)]}")
+        return -operand
+    elif op == '!':
+        if type(operand) != bool:
+            raise GoError(f"Error: Invalid operation {op} is not defined on {type_names[type(operand)]}")
+        return not operand
+    raise GoError(f"Error: unknown operator {op}")
+
+
+def check_assign(old, value, op='='):
+    """checks for name = value and name op= value"""
+    if type(old) != type(value):
+        raise GoError(f"TypeError: type mismatch {old}({type(old)}) and {value}({type(value)})")
+
+    if op != '=' and type(old) == str and op != '+=':
+        raise GoError(f"Invalid operation: {op} is not defined on string")
+
+
+def constant_cases(node):
+    """
+    for a switch with a tag whose case values are all literals of one type: that type and a dict from
+    each value to the index of its case in node.cases (the first one for a repeated value), otherwise None.
+    A tag of that type selects its case with one lookup, any other tag is compared case by case.
+    """
+    if node.tag is None:
+        return None
+    label_type = None
+    cases = {}
+    for index, case in enumerate(node.cases):
+        for value in case.values or ():
+            if type(value) != Literal or label_type not in (None, type(value.value)):
+                return None
+            label_type = type(value.value)
+            cases.setdefault(value.value, index)
+    if label_type is None:
+        return None
+    return label_type, cases
+
+
+class BudgetExceeded(Exception):
+    # not a GoError, running out of the budget ends the program instead of a statement
+    def __init__(self, lineno, message, lexpos=None):
+        Exception.__init__(self, message)
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def diagnostic(self):
+        return Diagnostic(self.lexpos, BUDGET, str(self), line=self.lineno)
+
+
+class LoopStats:
+    # profile of one for statement: how often it was started, its iterations and the seconds spent in it
+    __slots__ = ('lineno', 'runs', 'iterations', 'time')
+
+    def __init__(self, lineno):
+        self.lineno = lineno
+        self.runs = 0
+        self.iterations = 0
+        self.time = 0.0
+
+
+class LoopBudget:
+    """
+    iteration and time limits for the loops of a run, and the profile of its loops.  Loops take
+    iterations from the budget in grants of at most `interval`, the time limit is checked with
+    every grant, so a loop is stopped within `interval` iterations of running out of time.
+    The backends run without a budget by default, their loops are not limited then.
+    """
+
+    def __init__(self, max_iterations=None, max_time=None, interval=1024):
+        self.max_iterations = max_iterations
+        self.max_time = max_time
+        self.interval = interval
+        self.loops = {}  # lineno -> LoopStats
+        self.used = 0  # iterations granted and not given back
+        self.deadline = None
+
+    def start(self):
+        self.loops = {}
+        self.used = 0
+        self.deadline = None if self.max_time is None else time.perf_counter() + self.max_time
+
+    def enter(self, lineno):
+        stats = self.loops.get(lineno)
+        if stats is None:
+            stats = self.loops[lineno] = LoopStats(lineno)
+        stats.runs += 1
+        return stats
+
+    def grant(self, lineno, lexpos=None):
+        """number of iterations the loop at lineno (and lexpos) may run before it asks again"""
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise BudgetExceeded(lineno, f"Error: loop at line {lineno} exceeded the time budget of {self.max_time}s",
+                                 lexpos)
+        granted = self.interval
+        if self.max_iterations is not None:
+            granted = min(granted, self.max_iterations - self.used)
+            if granted <= 0:
+                raise BudgetExceeded(lineno, f"Error: loop at line {lineno} exceeded the budget of "
+                                     f"{self.max_iterations} iterations", lexpos)
+        self.used += granted
+        return granted
+
+    def leave(self, stats, iterations, left, start):
+        """end of a run of a loop that ran iterations and did not use left of its grants"""
+        self.used -= left
+        stats.iterations += iterations
+        stats.time += time.perf_counter() - start
+
+    def report(self):
+        """profile of the loops, the one the most time was spent in first"""
+        return [{'line': stats.lineno, 'runs': stats.runs, 'iterations': stats.iterations, 'time': stats.time}
+                for stats in sorted(self.loops.values(), key=lambda stats: -stats.time)]
+
+
+class Scope:
+    # one block of the program, names are looked up from the innermost block outwards.  The value of a
+    # name whose declaration failed is None: it stays declared in its block, but undefined
+    __slots__ = ('values', 'consts', 'parent')
+
+    def __init__(self, parent=None):
+        self.values = {}
+        self.consts = set()
+        self.parent = parent
+
+    def find(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.values:
+                return scope
+            scope = scope.parent
+        raise GoError(f"Error: Undefined identifier '{name}'")
+
+    def lookup(self, name):
+        value = self.find(name).values[name]
+        if value is None:
+            raise GoError(f"Error: Undefined identifier '{name}'")
+        return value
+
+    def assign(self, name):
+        """scope in which name can be assigned"""
+        scope = self.find(name)
+        if name in scope.consts:
+            raise GoError(f"Error: cannot assign to constant {name}")
+        return scope
+
+
+class Symbol:
+    # a declared variable, resolved once at compile time: type is None when it is only known at run
+    # time, slot is the index of its value in the frame and depth the number of blocks around it
+    __slots__ = ('name', 'type', 'const', 'slot', 'depth')
+
+    def __init__(self, name, type, const, slot, depth):
+        self.name = name
+        self.type = type
+        self.const = const
+        self.slot = slot
+        self.depth = depth
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.type!r}, {self.const!r}, {self.slot!r})"
+
+
+class SymbolTable:
+    """
+    compile time scopes for the compiling backends, every declared variable gets a Symbol with its own slot.
+    visible holds the symbols of each name from the outermost to the innermost block, so a name is resolved
+    with one lookup however deeply the blocks are nested.
+    """
+
+    def __init__(self):
+        self.symbols = []  # symbol of each slot
+        self.scopes = []  # names declared in each open block, innermost last
+        self.visible = {}  # name -> symbols of the open blocks that declare it
+
+    def enter_scope(self):
+        self.scopes.append([])
+
+    def leave_scope(self):
+        for name in self.scopes.pop():
+            self.visible[name].pop()
+
+    def check_redeclared(self, name):
+        # a name can be declared once per block, declaring it again in an inner block shadows it
+        shadowed = self.visible.get(name)
+        if shadowed and shadowed[-1].depth == len(self.scopes):
+            raise GoError(f"Error: {name} redeclared in the scope")
+
+    def declare(self, name, typ=None, const=False):
+        """
+        symbol of a new variable in the innermost block.  A declaration is checked with check_redeclared()
+        before its value, and if the value fails to compile the name is declared all the same: it is
+        undefined in the rest of the block, like in every backend when a declaration fails at run time.
+        """
+        self.check_redeclared(name)
+        shadowed = self.visible.setdefault(name, [])
+        symbol = Symbol(name, typ, const, len(self.symbols), len(self.scopes))
+        self.symbols.append(symbol)
+        shadowed.append(symbol)
+        self.scopes[-1].append(name)
+        return symbol
+
+    def temp(self, name):
+        """symbol that can't be named in the program"""
+        symbol = Symbol(f' {name}', None, False, len(self.symbols), len(self.scopes))
+        self.symbols.append(symbol)
+        return symbol
+
+    def resolve(self, name):
+        symbols = self.visible.get(name)
+        if not symbols:
+            raise GoError(f"Error: Undefined identifier '{name}'")
+        return symbols[-1]
+
+    def lookup(self, name):
+        """symbol of name, None if it is undefined"""
+        symbols = self.visible.get(name)
+        return symbols[-1] if symbols else None
+
+    def resolve_assign(self, name):
+        symbol = self.resolve(name)
+        if symbol.const:
+            raise GoError(f"Error: cannot assign to constant {name}")
+        return symbol
+
+
+class Evaluator:
+    def __init__(self):
+        self.print_list = []
+        self.diagnostics = []
+        self.budget = None
+        self.tables = {}  # switch node -> its table, see switch_table()
+
+        self.statements = {
+            VarDecl: self.exec_var_decl,
+            ShortVarDecl: self.exec_short_var_decl,
+            Assign: self.exec_assign,
+            AugAssign: self.exec_aug_assign,
+            IncDec: self.exec_inc_dec,
+            Print: self.exec_print,
+            If: self.exec_if,
+            Switch: self.exec_switch,
+            For: self.exec_for,
+            Break: self.exec_break,
+            Continue: self.exec_continue,
+        }
+        self.expressions = {
+            BinOp: self.eval_bin_op,
+            Compare: self.eval_compare,
+            BoolOp: self.eval_bool_op,
+            UnaryOp: self.eval_unary_op,
+            Literal: self.eval_literal,
+            Name: self.eval_name,
+        }
+
+    def run(self, program, budget=None, positions=None):
+        self.print_list = []
+        self.diagnostics = []
+        self.positions = positions  # positions of the nodes of an interned program (see go_ast.Interner)
+        self.budget = LoopBudget() if budget is None else budget
+        self.budget.start()
+
+        global_scope = Scope()
+        try:
+            self.exec_block(program.globals, global_scope)
+            try:
+                self.exec_block(program.body, Scope(global_scope))
+            except (BreakLoop, ContinueLoop):  # already reported by the parser
+                pass
+        except BudgetExceeded as e:
+            self.diagnostics.append(e.diagnostic())
+
+    # statements
+
+    def exec_block(self, statements, scope):
+        for stmt in statements:
+            try:
+                self.statements[type(stmt)](stmt, scope)
+            except GoError as e:
+                self.diagnostics.append(Diagnostic(position(stmt, self.positions)[1], RUNTIME, str(e)))
+
+    def exec_var_decl(self, node, scope):
+        # redeclared check
+        if node.name in scope.values:
+            raise GoError(f"Error: {node.name} redeclared in the scope")
+
+        if node.const:
+            scope.consts.add(node.name)
+        try:
+            value = None if node.value is None else self.eval(node.value, scope)
+            scope.values[node.name] = declare_value(node.name, node.type, value)
+        except GoError:
+            scope.values[node.name] = None  # a failing declaration leaves its variable undefined
+            raise
+
+    def exec_short_var_decl(self, node, scope):
+        # redeclared check
+        if node.name in scope.values:
+            raise GoError(f"Error: {node.name} redeclared in the scope")
+
+        try:
+            scope.values[node.name] = declare_value(node.name, None, self.eval(node.value, scope))
+        except GoError:
+            scope.values[node.name] = None
+            raise
+
+    def exec_assign(self, node, scope):
+        target = scope.assign(node.name)
+        value = self.eval(node.value, scope)
+        old = target.values[node.name]
+        if old is None:
+            raise GoError(f"Error: Undefined identifier '{node.name}'")
+        check_assign(old, value)
+        target.values[node.name] = value
+
+    def exec_aug_assign(self, node, scope):
+        target = scope.assign(node.name)
+        old = scope.lookup(node.name)
+        value = self.eval(node.value, scope)
+        check_assign(old, value, node.op)
+        target.values[node.name] = binary_op(node.op[0], old, value)
+
+    def exec_inc_dec(self, node, scope):
+        target = scope.assign(node.name)
+        old = scope.lookup(node.name)
+        if type(old) != int:
+            raise GoError(f"Error: cannot add non-int type {type(old)}")
+        target.values[node.name] = old + 1 if node.op == '++' else old - 1
+
+    def exec_print(self, node, scope):
+        self.print_list.append(' '.join(format_value(self.eval(arg, scope)) for arg in node.args))
+
+    def exec_if(self, node, scope):
+        if self.eval(node.cond, scope):
+            self.exec_block(node.body, Scope(scope))
+        elif node.orelse:
+            self.exec_block(node.orelse, Scope(scope))
+
+    def switch_table(self, node):
+        """(type of the case values, value -> body, default body) of a switch on constants, None for the others"""
+        if node in self.tables:
+            return self.tables[node]
+        table = constant_cases(node)
+        if table is not None:
+            label_type, indexes = table
+            default = next((case.body for case in node.cases if case.values is None), None)
+            table = (label_type, {value: node.cases[index].body for value, index in indexes.items()}, default)
+        self.tables[node] = table
+        return table
+
+    def exec_switch(self, node, scope):
+        tag = None if node.tag is None else self.eval(node.tag, scope)
+
+        # constant case values are looked up in a table, a tag of another type is compared case by case
+        table = None if node.tag is None else self.switch_table(node)
+        if table is not None and type(tag) == table[0]:
+            body = table[1].get(tag, table[2])
+        else:
+            body = self.select_case(node, tag, scope)
+
+        if body is not None:
+            try:
+                self.exec_block(body, Scope(scope))
+            except BreakLoop:  # break leaves the switch
+                pass
+
+    def select_case(self, node, tag, scope):
+        default = None
+        for case in node.cases:
+            if case.values is None:
+                default = case
+            elif node.tag is None:
+                if self.eval(case.values[0], scope):
+                    return case.body
+            elif any(compare_op('==', tag, self.eval(value, scope)) for value in case.values):
+                return case.body
+        return None if default is None else default.body
+
+    def exec_for(self, node, scope):
+        budget = self.budget
+        lineno, lexpos = position(node, self.positions)
+        stats = budget.enter(lineno)
+        start = time.perf_counter()
+        granted = left = 0
+        try:
+            loop_scope = Scope(scope)
+            if node.init is not None:
+                self.statements[type(node.init)](node.init, loop_scope)
+
+            while node.cond is None or self.eval(node.cond, loop_scope):
+                if not left:
+                    left = budget.grant(lineno, lexpos)
+                    granted += left
+                left -= 1
+
+                try:
+                    self.exec_block(node.body, Scope(loop_scope))
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    pass
+
+                if node.post is not None:
+                    self.statements[type(node.post)](node.post, loop_scope)
+        finally:
+            budget.leave(stats, granted - left, left, start)
+
+    def exec_break(self, node, scope):
+        raise BreakLoop
+
+    def exec_continue(self, node, scope):
+        raise ContinueLoop
+
+    # expressions
+
+    def eval(self, node, scope):
+        return self.expressions[type(node)](node, scope)
+
+    def eval_bin_op(self, node, scope):
+        return binary_op(node.op, self.eval(node.left, scope), self.eval(node.right, scope))
+
+    def eval_compare(self, node, scope):
+        return compare_op(node.op, self.eval(node.left, scope), self.eval(node.right, scope))
+
+    def eval_bool_op(self, node, scope):
+        left = self.eval(node.left, scope)
+        if node.op == '&&':
+            return left and self.eval(node.right, scope)
+        else:
+            return left or self.eval(node.right, scope)
+
+    def eval_unary_op(self, node, scope):
+        return unary_op(node.op, self.eval(node.operand, scope))
+
+    def eval_literal(self, node, scope):
+        return node.value
+
+    def eval_name(self, node, scope):
+        return scope.lookup(node.id)
@@ -0,0 +1,273 @@
+# Constant folding for the AST built by Golang_1130.py
+#
+# fold_constants() returns a copy of a program in which expressions on literals are computed,
+# names of constants are replaced by their values and the arms of if, for and switch
+# statements that can't run are left out.  The original program is not changed, unchanged
+# subtrees are shared with it.
+#
+# Nothing that can fail is folded: an operation that raises (division by zero, type errors)
+# is left for the run time to report, and a constant is only propagated if its declaration
+# succeeds.  The int64 overflow check stays with the declarations, which see the folded
+# value.  Undefined names are left for the run time as well.  Dead code with statements that
+# fail to compile (redeclared names, assignments to constants) is kept as it is, the
+# backends report those errors when and if the statement runs.
+
+from operator import is_not
+
+from go_ast import *
+from go_eval import GoError, SymbolTable, declare_value, binary_op, compare_op, unary_op
+
+
+def same(new, old):
+    """old if the tuple new holds the same items"""
+    if len(new) == len(old) and not any(map(is_not, new, old)):
+        return old
+    return new
+
+
+def declares(statements):
+    return any(type(stmt) in (VarDecl, ShortVarDecl) for stmt in statements)
+
+
+class ConstantFolder(SymbolTable):
+    def __init__(self, positions=None):
+        SymbolTable.__init__(self)
+        self.positions = positions  # where the nodes of an interned program are (go_ast.Interner)
+        self.values = {}  # symbol of a constant -> its value
+        self.errors = 0  # statements the compilers leave out
+
+        self.statements = {
+            VarDecl: self.fold_var_decl,
+            ShortVarDecl: self.fold_short_var_decl,
+            Assign: self.fold_assign,
+            AugAssign: self.fold_assign,
+            IncDec: self.fold_inc_dec,
+            Print: self.fold_print,
+            If: self.fold_if,
+            Switch: self.fold_switch,
+            For: self.fold_for,
+            Break: self.fold_jump,
+            Continue: self.fold_jump,
+        }
+        self.expressions = {
+            BinOp: self.fold_bin_op,
+            Compare: self.fold_compare,
+            BoolOp: self.fold_bool_op,
+            UnaryOp: self.fold_unary_op,
+            Literal: self.fold_literal,
+            Name: self.fold_name,
+        }
+
+    def fold(self, program):
+        self.enter_scope()
+        global_block = self.fold_block(program.globals, new_scope=False)
+        main_block = self.fold_block(program.body)
+        return self.rebuild(program, program.imports, global_block, main_block)
+
+    def where(self, node):
+        """lineno and lexpos for a new node made of node"""
+        lineno, lexpos = position(node, self.positions)
+        return {'lineno': lineno, 'lexpos': lexpos}
+
+    def rebuild(self, node, *fields):
+        """node with the given fields, node itself if they are the same"""
+        if all(new is getattr(node, name) for name, new in zip(node._fields, fields)):
+            return node
+        return type(node)(*fields, **self.where(node))
+
+    # statements, each one becomes a tuple of statements
+
+    def fold_block(self, statements, new_scope=True):
+        if new_scope:
+            self.enter_scope()
+        folded = []
+        for stmt in statements:
+            try:
+                folded.extend(self.statements[type(stmt)](stmt))
+            except GoError:
+                # left out by the compilers, kept as it is for them to report
+                self.errors += 1
+                folded.append(stmt)
+        if new_scope:
+            self.leave_scope()
+        return same(tuple(folded), statements)
+
+    def fold_arm(self, statements):
+        """folded statements and whether they can be left out without losing an error"""
+        errors = self.errors
+        folded = self.fold_block(statements)
+        return folded, self.errors == errors
+
+    def block(self, statements, node):
+        # statements of an arm of node that always runs, kept in a block of their own if they declare names
+        if declares(statements):
+            return If(Literal(True, **self.where(node)), statements, (), **self.where(node)),
+        return statements
+
+    def fold_single(self, stmt):
+        return self.statements[type(stmt)](stmt)[0]
+
+    def fold_var_decl(self, node):
+        if node.value is None and node.type is None:
+            self.declare(node.name, None, node.const)  # undefined in the rest of the block
+            raise GoError(f"Error: missing type or value for {node.name}")
+        value = None if node.value is None else self.fold_expr(node.value)
+        symbol = self.declare(node.name, node.type, node.const)
+        if node.const and (value is None or type(value) == Literal):
+            try:
+                self.values[symbol] = declare_value(node.name, node.type, None if value is None else value.value)
+            except GoError:  # reported when it is declared, the constant is undefined
+                pass
+        return self.rebuild(node, node.name, node.type, value, node.const),
+
+    def fold_short_var_decl(self, node):
+        value = self.fold_expr(node.value)
+        self.declare(node.name)
+        return self.rebuild(node, node.name, value),
+
+    def fold_assign(self, node):
+        self.resolve_assign(node.name)
+        if type(node) == Assign:
+            return self.rebuild(node, node.name, self.fold_expr(node.value)),
+        return self.rebuild(node, node.name, node.op, self.fold_expr(node.value)),
+
+    def fold_inc_dec(self, node):
+        self.resolve_assign(node.name)
+        return node,
+
+    def fold_print(self, node):
+        return self.rebuild(node, same(tuple(self.fold_expr(arg) for arg in node.args), node.args)),
+
+    def fold_if(self, node):
+        cond = self.fold_expr(node.cond)
+        body, body_clean = self.fold_arm(node.body)
+        orelse, orelse_clean = self.fold_arm(node.orelse)
+
+        if type(cond) == Literal:
+            if cond.value and not orelse and declares(body):
+                pass  # already a block of its own
+            elif cond.value and orelse_clean:
+                return self.block(body, node)
+            elif not cond.value and body_clean:
+                return self.block(orelse, node)
+        return self.rebuild(node, cond, body, orelse),
+
+    def fold_switch(self, node):
+        tag = None if node.tag is None else self.fold_expr(node.tag)
+        cases = []
+        clean = True
+        for case in node.cases:
+            values = None if case.values is None else tuple(self.fold_expr(value) for value in case.values)
+            body, case_clean = self.fold_arm(case.body)
+            clean = clean and case_clean
+            cases.append(self.rebuild(case, values and same(values, case.values), body))
+        switch = self.rebuild(node, tag, same(tuple(cases), node.cases))
+
+        body = self.select_case(switch) if clean else None
+        if body is None or switch.tag is None and len(switch.cases) == 1 and switch.cases[0].values is None:
+            return switch,
+        if not body:
+            return ()
+        # break still has to leave the switch, the case runs as the only arm of one
+        return Switch(None, (Case(None, body, **self.where(node)), ), **self.where(node)),
+
+    def select_case(self, node):
+        """body of the case a switch runs, () if it runs none, None if that is only known at run time"""
+        if node.tag is not None and type(node.tag) != Literal:
+            return None
+        default = ()
+        for case in node.cases:
+            if case.values is None:
+                default = case.body
+                continue
+            for value in case.values:
+                if type(value) != Literal:
+                    return None
+                if node.tag is None:
+                    if value.value:
+                        return case.body
+                    break  # a switch on conditions only looks at the first one
+                if type(value.value) != type(node.tag.value):
+                    return None  # a type error at run time
+                if value.value == node.tag.value:
+                    return case.body
+        return default
+
+    def fold_for(self, node):
+        self.enter_scope()
+        try:
+            init = None if node.init is None else self.fold_single(node.init)
+            cond = None if node.cond is None else self.fold_expr(node.cond)
+            body, clean = self.fold_arm(node.body)
+            post = None if node.post is None else self.fold_single(node.post)
+        finally:
+            self.leave_scope()
+
+        if type(cond) == Literal:
+            if cond.value:
+                cond = None
+            elif init is None and clean:
+                return ()
+        return self.rebuild(node, init, cond, post, body),
+
+    def fold_jump(self, node):
+        return node,
+
+    # expressions
+
+    def fold_expr(self, node):
+        return self.expressions[type(node)](node)
+
+    def fold_bin_op(self, node):
+        left = self.fold_expr(node.left)
+        right = self.fold_expr(node.right)
+        if type(left) == Literal and type(right) == Literal:
+            try:
+                return Literal(binary_op(node.op, left.value, right.value), **self.where(node))
+            except GoError:
+                pass
+        return self.rebuild(node, node.op, left, right)
+
+    def fold_compare(self, node):
+        left = self.fold_expr(node.left)
+        right = self.fold_expr(node.right)
+        if type(left) == Literal and type(right) == Literal:
+            try:
+                return Literal(compare_op(node.op, left.value, right.value), **self.where(node))
+            except GoError:
+                pass
+        return self.rebuild(node, node.op, left, right)
+
+    def fold_bool_op(self, node):
+        left = self.fold_expr(node.left)
+        right = self.fold_expr(node.right)
+        if type(left) == Literal:
+            # the result is the left operand if it decides, otherwise the right one
+            if bool(left.value) == (node.op == '||'):
+                return left
+            return right
+        return self.rebuild(node, node.op, left, right)
+
+    def fold_unary_op(self, node):
+        operand = self.fold_expr(node.operand)
+        if type(operand) == Literal:
+            try:
+                return Literal(unary_op(node.op, operand.value), **self.where(node))
+            except GoError:
+                pass
+        return self.rebuild(node, node.op, operand)
+
+    def fold_literal(self, node):
+        return node
+
+    def fold_name(self, node):
+        symbol = self.lookup(node.id)
+        if symbol in self.values:
+            return Literal(self.values[symbol], **self.where(node))
+        return node
+
+
+def fold_constants(program, positions=None):
+    """program with its constant expressions computed and its dead code left out, positions are those
+    of the nodes of an interned program, the new nodes have positions of their own"""
+    return ConstantFolder(positions).fold(program)
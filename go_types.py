@@ -0,0 +1,152 @@
+# Static types for the AST built by Golang_1130.py
+#
+# check_types() walks a program once before it is compiled and finds the type ('int', 'bool'
+# or 'string') every expression has whenever its evaluation succeeds, with None where that
+# is not known before running, e.g. for operands of different types.  The checks of the
+# run time stay where they are needed to report errors, a backend only leaves out the ones
+# the static types prove to pass.
+#
+# The types are kept in a table indexed by the nodes instead of on the nodes themselves,
+# because interned nodes are shared by several programs.
+
+from go_ast import *
+from go_eval import GoError, SymbolTable, type_names
+
+
+class TypeChecker(SymbolTable):
+    def __init__(self):
+        SymbolTable.__init__(self)
+        self.types = {}  # expression node -> type
+
+        self.statements = {
+            VarDecl: self.check_var_decl,
+            ShortVarDecl: self.check_short_var_decl,
+            Assign: self.check_expr_statement,
+            AugAssign: self.check_expr_statement,
+            IncDec: self.check_inc_dec,
+            Print: self.check_print,
+            If: self.check_if,
+            Switch: self.check_switch,
+            For: self.check_for,
+            Break: self.check_jump,
+            Continue: self.check_jump,
+        }
+        self.expressions = {
+            BinOp: self.type_bin_op,
+            Compare: self.type_compare,
+            BoolOp: self.type_bool_op,
+            UnaryOp: self.type_unary_op,
+            Literal: self.type_literal,
+            Name: self.type_name,
+        }
+
+    def check(self, program):
+        self.enter_scope()
+        self.check_block(program.globals, new_scope=False)
+        self.check_block(program.body)
+        return self.types
+
+    # statements, a declaration that fails to compile (a redeclared name) declares nothing here either
+
+    def check_block(self, statements, new_scope=True):
+        if new_scope:
+            self.enter_scope()
+        for stmt in statements:
+            try:
+                self.statements[type(stmt)](stmt)
+            except GoError:
+                pass
+        if new_scope:
+            self.leave_scope()
+
+    def check_var_decl(self, node):
+        typ = None if node.value is None else self.type_of(node.value)
+        self.declare(node.name, node.type or typ, node.const)
+
+    def check_short_var_decl(self, node):
+        self.declare(node.name, self.type_of(node.value))
+
+    def check_expr_statement(self, node):
+        self.resolve_assign(node.name)
+        self.type_of(node.value)
+
+    def check_inc_dec(self, node):
+        self.resolve_assign(node.name)
+
+    def check_print(self, node):
+        for arg in node.args:
+            self.type_of(arg)
+
+    def check_if(self, node):
+        self.type_of(node.cond)
+        self.check_block(node.body)
+        self.check_block(node.orelse)
+
+    def check_switch(self, node):
+        if node.tag is not None:
+            self.type_of(node.tag)
+        for case in node.cases:
+            for value in case.values or ():
+                self.type_of(value)
+            self.check_block(case.body)
+
+    def check_for(self, node):
+        self.enter_scope()
+        try:
+            if node.init is not None:
+                self.statements[type(node.init)](node.init)
+            if node.cond is not None:
+                self.type_of(node.cond)
+            self.check_block(node.body)
+            if node.post is not None:
+                self.statements[type(node.post)](node.post)
+        finally:
+            self.leave_scope()
+
+    def check_jump(self, node):
+        pass
+
+    # expressions
+
+    def type_of(self, node):
+        typ = self.expressions[type(node)](node)
+        # a shared node could be met again in another scope, it keeps a type only if it is the same
+        if self.types.setdefault(node, typ) != typ:
+            self.types[node] = typ = None
+        return typ
+
+    def type_bin_op(self, node):
+        left = self.type_of(node.left)
+        right = self.type_of(node.right)
+        if left != right or left == 'bool' or left == 'string' and node.op != '+':
+            return None
+        return left
+
+    def type_compare(self, node):
+        self.type_of(node.left)
+        self.type_of(node.right)
+        return 'bool'
+
+    def type_bool_op(self, node):
+        # && and || don't check their operands, the result is one of them
+        left = self.type_of(node.left)
+        right = self.type_of(node.right)
+        return left if left == right else None
+
+    def type_unary_op(self, node):
+        operand = self.type_of(node.operand)
+        if node.op == '-':
+            return 'int' if operand == 'int' else None
+        return 'bool' if operand == 'bool' else None
+
+    def type_literal(self, node):
+        return type_names[type(node.value)]
+
+    def type_name(self, node):
+        symbol = self.lookup(node.id)
+        return None if symbol is None else symbol.type
+
+
+def check_types(program):
+    """static type of every expression node in program that the compilers can reach"""
+    return TypeChecker().check(program)
@@ -0,0 +1,564 @@
+# Bytecode compiler and stack VM for the AST built by Golang_1130.py
+#
+# compile_program() turns a Program into a Code object: a flat array of (opcode, argument)
+# pairs, a constant pool and one slot per declared variable.  Names are resolved to slots
+# once at compile time, so the VM never looks a variable up by name.  The VM is a single
+# dispatch loop over the opcodes with inline fast paths for int arithmetic.
+#
+# Errors that are known at compile time (undefined or redeclared names, assignments to
+# constants) are compiled to a RAISE where the evaluator in go_eval would find them, so they
+# are reported when and as often as the statement runs.  An error skips the rest of the
+# statement, exactly like in go_eval, and is reported with the line of the statement.
+
+import time
+from array import array
+
+from go_ast import *
+from go_diagnostics import Diagnostic, RUNTIME
+from go_eval import GoError, SymbolTable, BudgetExceeded, LoopBudget, format_value, declare_value, binary_op, unary_op, \
+    check_assign, constant_cases
+from go_types import check_types
+
+# opcodes
+LOAD_CONST = 0
+LOAD_LOCAL = 1
+STORE_LOCAL = 2
+STORE_CHECKED = 3  # = assignment, the new value must have the type of the old one
+CHECK_VALUE = 4  # type and overflow check of a declared value, argument is an index in type_codes or -1
+BINARY_ADD = 5
+BINARY_SUB = 6
+BINARY_MUL = 7
+BINARY_DIV = 8
+BINARY_MOD = 9
+COMPARE_LT = 10
+COMPARE_LE = 11
+COMPARE_GT = 12
+COMPARE_GE = 13
+COMPARE_EQ = 14
+COMPARE_NE = 15
+UNARY_NEG = 16
+UNARY_NOT = 17
+INPLACE_ADD = 18
+INPLACE_SUB = 19
+INPLACE_OP = 20  # the other op= operators, argument is an index in inplace_ops
+INC = 21
+DEC = 22
+PRINT = 23
+JUMP = 24
+POP_JUMP_IF_FALSE = 25
+POP_JUMP_IF_TRUE = 26
+JUMP_IF_FALSE_OR_POP = 27
+JUMP_IF_TRUE_OR_POP = 28
+HALT = 29
+LOOP_ENTER = 30  # the loop ops take the index of the loop in Code.loops
+LOOP_ITER = 31  # takes an iteration from the budget
+LOOP_EXIT = 32
+SWITCH_TABLE = 33  # jumps to the case of the value on the stack, argument is an index in Code.tables
+RAISE = 34  # error found at compile time, argument is the index of its message in Code.consts
+
+opnames = {value: name for name, value in list(globals().items()) if name.isupper() and type(value) == int}
+
+binary_opcodes = {'+': BINARY_ADD, '-': BINARY_SUB, '*': BINARY_MUL, '/': BINARY_DIV, '%': BINARY_MOD}
+compare_opcodes = {'<': COMPARE_LT, '<=': COMPARE_LE, '>': COMPARE_GT, '>=': COMPARE_GE, '==': COMPARE_EQ,
+                   '!=': COMPARE_NE}
+binary_ops = {code: op for op, code in binary_opcodes.items()}
+compare_ops = {code: op for op, code in compare_opcodes.items()}
+inplace_ops = ('*=', '/=', '%=')
+type_codes = ('int', 'bool', 'string')
+
+
+class Code:
+    # ops: (opcode, argument) pairs, names: variable name of each slot,
+    # handlers: (start, end, target, slot, lexpos) of every statement, innermost first,
+    # loops: (lineno, lexpos) of each loop,
+    # tables: (type of the case values, value -> target, default target) of the switches on constants
+    __slots__ = ('ops', 'consts', 'names', 'handlers', 'loops', 'tables')
+
+    def __init__(self, ops, consts, names, handlers, loops, tables):
+        self.ops = ops
+        self.consts = consts
+        self.names = names
+        self.handlers = handlers
+        self.loops = loops
+        self.tables = tables
+
+
+class Compiler(SymbolTable):
+    def __init__(self, positions=None):
+        SymbolTable.__init__(self)
+        self.positions = positions  # id(node) -> (lineno, lexpos) for an interned program, see go_ast.position()
+        self.ops = []
+        self.consts = []
+        self.const_index = {}
+        self.handlers = []
+        self.loops = []
+        self.tables = []
+        self.jumps = []  # (break jumps, continue jumps) of the enclosing loops and switches, switches have None
+        self.types = {}  # static types of the expressions, from go_types
+
+        self.statements = {
+            VarDecl: self.compile_var_decl,
+            ShortVarDecl: self.compile_short_var_decl,
+            Assign: self.compile_assign,
+            AugAssign: self.compile_aug_assign,
+            IncDec: self.compile_inc_dec,
+            Print: self.compile_print,
+            If: self.compile_if,
+            Switch: self.compile_switch,
+            For: self.compile_for,
+            Break: self.compile_break,
+            Continue: self.compile_continue,
+        }
+
+    def compile(self, program):
+        self.types = check_types(program)
+        self.enter_scope()
+        self.compile_block(program.globals, new_scope=False)
+        self.compile_block(program.body)
+        self.emit(HALT)
+        return Code(array('i', self.ops), tuple(self.consts), tuple(s.name for s in self.symbols), tuple(self.handlers),
+                    tuple(self.loops), tuple(self.tables))
+
+    # helpers
+
+    def emit(self, op, arg=0):
+        self.ops += (op, arg)
+        return len(self.ops) - 1  # position of the argument, for patching jumps
+
+    def patch(self, pos, target=None):
+        self.ops[pos] = len(self.ops) if target is None else target
+
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self.const_index[key]
+
+    def raise_error(self, error):
+        self.emit(RAISE, self.const(str(error)))
+
+    # statements
+
+    def compile_block(self, statements, new_scope=True):
+        if new_scope:
+            self.enter_scope()
+        for stmt in statements:
+            self.compile_statement(stmt)
+        if new_scope:
+            self.leave_scope()
+
+    def compile_statement(self, stmt):
+        lexpos = position(stmt, self.positions)[1]
+        start = len(self.ops)
+        handlers = len(self.handlers)
+        try:
+            slot = self.statements[type(stmt)](stmt)
+        except GoError as e:
+            # compiled to a RAISE, the statement fails where it starts
+            del self.ops[start:]
+            del self.handlers[handlers:]
+            self.raise_error(e)
+            slot = None
+        # a failing declaration leaves its variable undefined, a failing loop header leaves through LOOP_EXIT
+        end = len(self.ops) - 2 if type(stmt) == For else len(self.ops)
+        self.handlers.append((start, end, end, -1 if slot is None else slot, lexpos))
+
+    def compile_var_decl(self, node):
+        self.check_redeclared(node.name)
+        if node.value is None:
+            if node.type is None:
+                self.declare(node.name, None, node.const)
+                raise GoError(f"Error: missing type or value for {node.name}")
+            self.emit(LOAD_CONST, self.const(declare_value(node.name, node.type, None)))
+        else:
+            self.compile_value(node.type, node.value)
+
+        slot = self.declare(node.name, node.type, node.const).slot
+        self.emit(STORE_LOCAL, slot)
+        return slot
+
+    def compile_short_var_decl(self, node):
+        self.check_redeclared(node.name)
+        self.compile_value(None, node.value)
+        slot = self.declare(node.name).slot
+        self.emit(STORE_LOCAL, slot)
+        return slot
+
+    def compile_value(self, typ, node):
+        # only ints need the overflow check when the type is known
+        self.compile_expr(node)
+        static = self.types.get(node)
+        if static is None or static == 'int' or typ not in (None, static):
+            self.emit(CHECK_VALUE, -1 if typ is None else type_codes.index(typ))
+
+    def compile_assign(self, node):
+        slot = self.resolve_assign(node.name).slot
+        self.compile_expr(node.value)
+        self.emit(STORE_CHECKED, slot)
+
+    def compile_aug_assign(self, node):
+        slot = self.resolve_assign(node.name).slot
+        self.emit(LOAD_LOCAL, slot)
+        self.compile_expr(node.value)
+        if node.op == '+=':
+            self.emit(INPLACE_ADD)
+        elif node.op == '-=':
+            self.emit(INPLACE_SUB)
+        else:
+            self.emit(INPLACE_OP, inplace_ops.index(node.op))
+        self.emit(STORE_LOCAL, slot)
+
+    def compile_inc_dec(self, node):
+        self.emit(INC if node.op == '++' else DEC, self.resolve_assign(node.name).slot)
+
+    def compile_print(self, node):
+        for arg in node.args:
+            self.compile_expr(arg)
+        self.emit(PRINT, len(node.args))
+
+    def compile_if(self, node):
+        self.compile_expr(node.cond)
+        else_jump = self.emit(POP_JUMP_IF_FALSE)
+        self.compile_block(node.body)
+        if node.orelse:
+            end_jump = self.emit(JUMP)
+            self.patch(else_jump)
+            self.compile_block(node.orelse)
+            self.patch(end_jump)
+        else:
+            self.patch(else_jump)
+
+    def compile_switch(self, node):
+        case_jumps = []
+        default = None
+
+        if node.tag is not None:
+            # the tag is kept in a hidden slot while the cases are compared with it
+            tag = self.temp('switch').slot
+            self.compile_expr(node.tag)
+            self.emit(STORE_LOCAL, tag)
+
+        # constant case values are looked up in a table, a tag of another type is compared case by case
+        table = constant_cases(node)
+        if table is not None:
+            table_index = len(self.tables)
+            self.tables.append(None)  # filled in when the targets are known
+            self.emit(LOAD_LOCAL, tag)
+            self.emit(SWITCH_TABLE, table_index)
+
+        for index, case in enumerate(node.cases):
+            if case.values is None:
+                default = case
+                continue
+            jumps = []
+            for value in case.values:
+                if node.tag is not None:
+                    self.emit(LOAD_LOCAL, tag)
+                    self.compile_expr(value)
+                    self.emit(COMPARE_EQ)
+                else:
+                    self.compile_expr(value)
+                jumps.append(self.emit(POP_JUMP_IF_TRUE))
+            case_jumps.append((index, case, jumps))
+
+        default_jump = self.emit(JUMP)
+        self.jumps.append(([], None))
+        starts = {}
+        for index, case, jumps in case_jumps:
+            for jump in jumps:
+                self.patch(jump)
+            starts[index] = len(self.ops)
+            self.compile_block(case.body)
+            self.jumps[-1][0].append(self.emit(JUMP))
+
+        self.patch(default_jump)
+        if table is not None:
+            label_type, indexes = table
+            targets = {value: starts[index] for value, index in indexes.items()}
+            self.tables[table_index] = (label_type, targets, len(self.ops))
+        if default is not None:
+            self.compile_block(default.body)
+
+        for jump in self.jumps.pop()[0]:
+            self.patch(jump)
+
+    def compile_for(self, node):
+        # an error in init, cond or post stops the whole loop
+        loop = len(self.loops)
+        self.loops.append(position(node, self.positions))
+        self.emit(LOOP_ENTER, loop)
+        self.enter_scope()
+        try:
+            if node.init is not None:
+                self.compile_clause(node.init)
+
+            top = len(self.ops)
+            exit_jump = None
+            if node.cond is not None:
+                self.compile_expr(node.cond)
+                exit_jump = self.emit(POP_JUMP_IF_FALSE)
+            self.emit(LOOP_ITER, loop)
+
+            self.jumps.append(([], []))
+            self.compile_block(node.body)
+            breaks, continues = self.jumps.pop()
+
+            for jump in continues:
+                self.patch(jump)
+            if node.post is not None:
+                self.compile_clause(node.post)
+            self.emit(JUMP, top)
+
+            if exit_jump is not None:
+                self.patch(exit_jump)
+            for jump in breaks:
+                self.patch(jump)
+        finally:
+            self.leave_scope()
+        self.emit(LOOP_EXIT, loop)
+
+    def compile_clause(self, stmt):
+        # init or post of a loop, an error in it stops the loop
+        try:
+            self.statements[type(stmt)](stmt)
+        except GoError as e:
+            self.raise_error(e)
+
+    def compile_break(self, node):
+        if self.jumps:
+            self.jumps[-1][0].append(self.emit(JUMP))
+
+    def compile_continue(self, node):
+        # continue belongs to the innermost loop, switches in between are skipped
+        for breaks, continues in reversed(self.jumps):
+            if continues is not None:
+                continues.append(self.emit(JUMP))
+                return
+
+    # expressions
+
+    def compile_expr(self, node):
+        t = type(node)
+        if t == Literal:
+            self.emit(LOAD_CONST, self.const(node.value))
+        elif t == Name:
+            try:
+                self.emit(LOAD_LOCAL, self.resolve(node.id).slot)
+            except GoError as e:
+                self.raise_error(e)
+        elif t == BinOp:
+            self.compile_expr(node.left)
+            self.compile_expr(node.right)
+            self.emit(binary_opcodes[node.op])
+        elif t == Compare:
+            self.compile_expr(node.left)
+            self.compile_expr(node.right)
+            self.emit(compare_opcodes[node.op])
+        elif t == BoolOp:
+            self.compile_expr(node.left)
+            jump = self.emit(JUMP_IF_FALSE_OR_POP if node.op == '&&' else JUMP_IF_TRUE_OR_POP)
+            self.compile_expr(node.right)
+            self.patch(jump)
+        elif t == UnaryOp:
+            self.compile_expr(node.operand)
+            self.emit(UNARY_NEG if node.op == '-' else UNARY_NOT)
+        else:
+            raise GoError(f"Error: cannot compile {node}")
+
+
+def compile_program(program, positions=None):
+    return Compiler(positions).compile(program)
+
+
+def disassemble(code):
+    lines = []
+    for pc in range(0, len(code.ops), 2):
+        op, arg = code.ops[pc], code.ops[pc + 1]
+        if op == LOAD_CONST or op == RAISE:
+            detail = repr(code.consts[arg])
+        elif op in (LOAD_LOCAL, STORE_LOCAL, STORE_CHECKED, INC, DEC):
+            detail = code.names[arg]
+        else:
+            detail = arg
+        lines.append(f"{pc:5} {opnames[op]:<22}{detail}")
+    return '\n'.join(lines)
+
+
+class VM:
+    def __init__(self):
+        self.print_list = []
+        self.diagnostics = []
+
+    def run(self, code, budget=None):
+        self.print_list = []
+        self.diagnostics = []
+        budget = LoopBudget() if budget is None else budget
+        budget.start()
+        try:
+            self.execute(code, budget)
+        except BudgetExceeded as e:
+            self.diagnostics.append(e.diagnostic())
+
+    def execute(self, code, budget):
+        loops = code.loops
+        tables = code.tables
+        loop_stats = [None] * len(loops)
+        loop_start = [0.0] * len(loops)
+        loop_granted = [0] * len(loops)
+        loop_left = [0] * len(loops)
+
+        ops = code.ops.tolist()
+        consts = code.consts
+        slots = [None] * len(code.names)
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+
+        while True:
+            try:
+                while True:
+                    op = ops[pc]
+                    arg = ops[pc + 1]
+                    pc += 2
+
+                    if op == LOAD_LOCAL:
+                        value = slots[arg]
+                        if value is None:
+                            raise GoError(f"Error: Undefined identifier '{code.names[arg]}'")
+                        push(value)
+                    elif op == LOAD_CONST:
+                        push(consts[arg])
+                    elif op == STORE_LOCAL:
+                        slots[arg] = pop()
+                    elif op == POP_JUMP_IF_FALSE:
+                        if not pop():
+                            pc = arg
+                    elif op == JUMP:
+                        pc = arg
+                    elif op == LOOP_ITER:
+                        if not loop_left[arg]:
+                            loop_left[arg] = budget.grant(*loops[arg])
+                            loop_granted[arg] += loop_left[arg]
+                        loop_left[arg] -= 1
+                    elif op == INC or op == DEC:
+                        value = slots[arg]
+                        if type(value) != int:
+                            if value is None:
+                                raise GoError(f"Error: Undefined identifier '{code.names[arg]}'")
+                            raise GoError(f"Error: cannot add non-int type {type(value)}")
+                        slots[arg] = value + 1 if op == INC else value - 1
+                    elif op <= COMPARE_NE and op >= COMPARE_LT:
+                        right = pop()
+                        left = stack[-1]
+                        if type(left) != type(right):
+                            raise GoError(f"TypeError: type mismatch {left} and {right}")
+                        if op == COMPARE_LT:
+                            stack[-1] = left < right
+                        elif op == COMPARE_LE:
+                            stack[-1] = left <= right
+                        elif op == COMPARE_GT:
+                            stack[-1] = left > right
+                        elif op == COMPARE_GE:
+                            stack[-1] = left >= right
+                        elif op == COMPARE_EQ:
+                            stack[-1] = left == right
+                        else:
+                            stack[-1] = left != right
+                    elif op <= BINARY_MOD and op >= BINARY_ADD:
+                        right = pop()
+                        left = stack[-1]
+                        if type(left) == int and type(right) == int and (right or op <= BINARY_MUL):
+                            if op == BINARY_ADD:
+                                stack[-1] = left + right
+                            elif op == BINARY_SUB:
+                                stack[-1] = left - right
+                            elif op == BINARY_MUL:
+                                stack[-1] = left * right
+                            elif op == BINARY_DIV:
+                                stack[-1] = left // right
+                            else:
+                                stack[-1] = left % right
+                        else:  # type errors and division by zero
+                            stack[-1] = binary_op(binary_ops[op], left, right)
+                    elif op == INPLACE_ADD or op == INPLACE_SUB:
+                        right = pop()
+                        left = stack[-1]
+                        if type(left) == int and type(right) == int:
+                            stack[-1] = left + right if op == INPLACE_ADD else left - right
+                        else:
+                            check_assign(left, right, '+=' if op == INPLACE_ADD else '-=')
+                            stack[-1] = binary_op('+' if op == INPLACE_ADD else '-', left, right)
+                    elif op == INPLACE_OP:
+                        right = pop()
+                        check_assign(stack[-1], right, inplace_ops[arg])
+                        stack[-1] = binary_op(inplace_ops[arg][0], stack[-1], right)
+                    elif op == STORE_CHECKED:
+                        value = pop()
+                        old = slots[arg]
+                        if old is None:
+                            raise GoError(f"Error: Undefined identifier '{code.names[arg]}'")
+                        check_assign(old, value)
+                        slots[arg] = value
+                    elif op == CHECK_VALUE:
+                        stack[-1] = declare_value('', None if arg < 0 else type_codes[arg], stack[-1])
+                    elif op == POP_JUMP_IF_TRUE:
+                        if pop():
+                            pc = arg
+                    elif op == JUMP_IF_FALSE_OR_POP:
+                        if not stack[-1]:
+                            pc = arg
+                        else:
+                            pop()
+                    elif op == JUMP_IF_TRUE_OR_POP:
+                        if stack[-1]:
+                            pc = arg
+                        else:
+                            pop()
+                    elif op == UNARY_NEG or op == UNARY_NOT:
+                        stack[-1] = unary_op('-' if op == UNARY_NEG else '!', stack[-1])
+                    elif op == PRINT:
+                        values = stack[len(stack) - arg:]
+                        del stack[len(stack) - arg:]
+                        self.print_list.append(' '.join(format_value(value) for value in values))
+                    elif op == SWITCH_TABLE:
+                        label_type, targets, default = tables[arg]
+                        value = pop()
+                        if type(value) == label_type:
+                            pc = targets.get(value, default)
+                    elif op == LOOP_ENTER:
+                        loop_stats[arg] = budget.enter(loops[arg][0])
+                        loop_start[arg] = time.perf_counter()
+                        loop_granted[arg] = loop_left[arg] = 0
+                    elif op == LOOP_EXIT:
+                        left = loop_left[arg]
+                        budget.leave(loop_stats[arg], loop_granted[arg] - left, left, loop_start[arg])
+                        loop_stats[arg] = None
+                    elif op == RAISE:
+                        raise GoError(consts[arg])
+                    elif op == HALT:
+                        return
+                    else:
+                        raise RuntimeError(f"bad opcode {op} at {pc - 2}")
+
+            except GoError as e:
+                # skip the rest of the innermost statement
+                failed = pc - 2
+                for start, end, target, slot, lexpos in code.handlers:
+                    if start <= failed < end:
+                        pc = target
+                        if slot >= 0:
+                            slots[slot] = None
+                        break
+                else:
+                    raise RuntimeError(f"no statement at {failed}") from e
+                self.diagnostics.append(Diagnostic(lexpos, RUNTIME, str(e)))
+                del stack[:]
+            except BudgetExceeded:
+                # the loops that are running end here
+                for loop, stats in enumerate(loop_stats):
+                    if stats is not None:
+                        left = loop_left[loop]
+                        budget.leave(stats, loop_granted[loop] - left, left, loop_start[loop])
+                raise
@@ -0,0 +1,51 @@
+# lex_keywords.py
+#
+# Rules that can be handled by the first character fast path of token()
+
+import ply.lex as lex
+
+reserved = {
+    'if': 'IF',
+    'else': 'ELSE',
+    'while': 'WHILE',
+    }
+
+tokens = [
+    "ID",
+    "NUMBER",
+    "STRING",
+    "LE",
+    "LT",
+    "INC",
+    "PLUSEQ",
+    ] + list(reserved.values())
+
+literals = ["+", "{", "}", "="]
+
+t_LE = r'<='
+t_LT = r'<'
+t_INC = r'\+\+'
+t_PLUSEQ = r'\+='
+t_STRING = r'"[^"]*"'
+t_ignore = " \t"
+t_ignore_COMMENT = r'\#.*'
+
+def t_ID(t):
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value, 'ID')
+    return t
+
+def t_NUMBER(t):
+    r'\d+'
+    t.value = int(t.value)
+    return t
+
+def t_newline(t):
+    r'\n+'
+    t.lexer.lineno += len(t.value)
+
+def t_error(t):
+    print("Illegal character '%s'" % t.value[0])
+    t.lexer.skip(1)
+
+lexer = lex.lex()
@@ -0,0 +1,12 @@
+# lex_linestarts.py
+#
+# The rules of lex_keywords, with lineno kept by the lexer from the line
+# index made by input() instead of a rule that counts newlines
+
+import ply.lex as lex
+from lex_keywords import *
+
+del t_newline
+t_ignore_newline = r'\n+'
+
+lexer = lex.lex(linestarts=True)
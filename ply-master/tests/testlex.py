@@ -396,6 +396,267 @@ class LexRunTests(unittest.TestCase):
                                     "(NUMBER,'10',1,32)\n"
                                     ))    
 
+    def test_lex_stream(self):
+        import calclex
+        data = "x = 3 + 42 * (s - t)\n\n  \u00e9 = 1234\n" * 200
+        lexer = calclex.lexer.clone()
+        lexer.input(data)
+        expected = [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+
+        for f in [StringIO.StringIO(data), StringIO.BytesIO(data.encode('utf-8'))]:
+            lexer = calclex.lexer.clone()
+            lexer.lineno = 1
+            lexer.lexbufsize = 64
+            lexer.lexlookahead = 16
+            lexer.input(f)
+            result = [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+            self.assertEqual(result, expected)
+
+    def test_lex_stream_window(self):
+        import lex_keywords
+        # Tokens longer than the window, lexpos is a position in the whole input
+        data = ('if x <= 10 { x += "a b" }\n' * 50 + 'x = "' + 'a' * 70000 + '"\n' + 'y' * 5000 + ' $ z\n' +
+                'else { y++ }\n' * 50)
+        results = []
+        for f in [data, StringIO.StringIO(data), StringIO.BytesIO(data.encode('utf-8'))]:
+            lexer = lex_keywords.lexer.clone()
+            lexer.lineno = 1
+            lexer.lexbufsize = 64
+            lexer.lexlookahead = 70002
+            lexer.input(f)
+            results.append([(t.type, len(str(t.value)), t.lineno, t.lexpos, lexer.lexpos) for t in lexer])
+            self.assertEqual(lexer.lexpos, len(data) + 1)
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], results[0])
+        self.assertIn(('STRING', 70002, 51, data.index('"a' + 'a' * 100), data.index('"\ny') + 1), results[0])
+        self.assertIn(('ID', 5000, 52, data.index('y' * 5000), data.index(' $')), results[0])
+        self.assertEqual(sys.stdout.getvalue(), "Illegal character '$'\n" * 3)
+
+        # A match at the end of the window grows it, however long the token is
+        lexer = lex_keywords.lexer.clone()
+        lexer.lexbufsize = 64
+        lexer.lexlookahead = 16
+        lexer.input(StringIO.StringIO(data))
+        result = [(t.type, len(str(t.value)), t.lexpos) for t in lexer]
+        self.assertIn(('ID', 5000, data.index('y' * 5000)), result)
+        self.assertIn(('ID', 1, data.index(' z') + 1), result)
+
+    def test_lex_stream_error(self):
+        import lex_keywords
+        # Text that doesn't match is reported without reading more than lexlookahead past it
+        data = 'x = "' + 'a b ' * 20000 + '\n' + 'if x <= 10 { x += "a b" }\n' * 50
+        lexer = lex_keywords.lexer.clone()
+        lexer.lexbufsize = 64
+        lexer.lexlookahead = 16
+        lexer.input(StringIO.StringIO(data))
+        result = []
+        for tok in lexer:
+            self.assertLess(len(lexer.lexdata), 200)
+            result.append(tok.type)
+        self.assertEqual(result[:3], ['ID', '=', 'ID'])
+        self.assertEqual(sys.stdout.getvalue(), "Illegal character '\"'\n")
+        with self.assertRaises(ValueError):
+            lexer.column(0)
+
+        # Windows without a token in them are skipped in a loop
+        lexer.input(StringIO.StringIO(' ' * 200000 + 'x'))
+        self.assertEqual([(t.type, t.lexpos) for t in lexer], [('ID', 200000)])
+
+        # The window stays small while the tokens fit in it
+        lexer = lex_keywords.lexer.clone()
+        lexer.lexbufsize = 64
+        lexer.lexlookahead = 16
+        lexer.input(StringIO.StringIO('if x <= 10 { x += "a b" }\n' * 200))
+        for tok in lexer:
+            self.assertLess(len(lexer.lexdata), 200)
+
+    def test_lex_token_slots(self):
+        import calclex
+        import copy
+        lexer = calclex.lexer.clone()
+        lexer.input("x = 3")
+        tok = lexer.token()
+        self.assertEqual((tok.type, tok.value, tok.lineno, tok.lexpos), ('NAME', 'x', 1, 0))
+        self.assertFalse(hasattr(tok, 'lexer'))
+        tok.endlexpos = 1
+        other = copy.copy(tok)
+        self.assertEqual((other.type, other.endlexpos), ('NAME', 1))
+        self.assertEqual(repr(lexer.token()), "LexToken(EQUALS,'=',1,2)")
+
+    def test_lex_columnar(self):
+        import lex_keywords
+        data = 'if x <= 10 { x += "a b" } # comment\nelse {\n while y < 2 x++ + z = $ }\n'
+        lexer = lex_keywords.lexer.clone()
+        lexer.input(data)
+        expected = [(t.type, t.lineno, t.lexpos) for t in lexer]
+
+        lexer = lex_keywords.lexer.clone()
+        lexer.lineno = 1
+        columns = lexer.tokenize_columnar(data)
+        self.assertEqual(len(columns), len(expected))
+        self.assertEqual([(columns.type(i), columns.lineno[i], columns.lexpos[i]) for i in range(len(columns))],
+                         expected)
+        self.assertEqual([columns.value(i) for i in range(4)], ['if', 'x', '<=', '10'])
+        self.assertEqual(columns.typenames[columns.types[3]], 'NUMBER')
+        self.assertEqual(columns.typenames[:3], sorted(lexer.lextokens_all)[:3])
+        self.assertEqual(sys.stdout.getvalue(), "Illegal character '$'\nIllegal character '$'\n")
+
+    def test_lex_relex(self):
+        import lex_keywords
+        old = 'if x <= 10 { x += "a b" }\nelse {\n while y < 2 x++ + z = 1 }\n'
+        edits = [old.replace('10', '1234'), old.replace('x++', 'x+++'), old.replace('{\n while', '{\n\n\n while'),
+                 old.replace('y < 2', 'y'), 'else' + old, old + 'z', old[:-5], old.replace('a b', 'a b\n')]
+        for new in edits:
+            lexer = lex_keywords.lexer.clone()
+            lexer.input(old)
+            tokens = list(lexer)
+            lexer.input(new)
+            lexer.lineno = 1
+            expected = [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+
+            lexer = lex_keywords.lexer.clone()
+            result = tokens[:]
+            newtokens, first, oldstop, newstop, lines = lexer.relex(result, old, new)
+            self.assertEqual([(t.type, t.value, t.lineno, t.lexpos) for t in newtokens], expected)
+            self.assertEqual(newtokens[:first], tokens[:first])
+            self.assertEqual(newtokens[newstop:], tokens[oldstop:])
+
+        # Only the tokens around the edit are made again
+        lexer = lex_keywords.lexer.clone()
+        lexer.input(old)
+        tokens = list(lexer)
+        edited = old.replace('10', '1234')
+        tokens, first, oldstop, newstop, lines = lexer.relex(tokens, old, edited)
+        self.assertEqual((first, oldstop, newstop, lines), (2, 4, 4, 0))
+        old, edited = edited, edited.replace('else', '\n\nelse')
+        tokens, first, oldstop, newstop, lines = lexer.relex(tokens, old, edited)
+        self.assertEqual((first, oldstop, newstop, lines), (7, 9, 9, 2))
+        self.assertEqual((tokens[newstop].type, tokens[newstop].lineno, tokens[newstop].lexpos), ('ELSE', 4, 30))
+
+    def test_lex_clone_keywords(self):
+        class KeywordLexer:
+            tokens = ('ID', 'IF', 'WHILE')
+            reserved = {'if': 'IF'}
+            t_ignore = ' '
+
+            def t_ID(self, t):
+                r'[a-z]+'
+                t.type = self.reserved.get(t.value, 'ID')
+                return t
+
+            def t_error(self, t):
+                t.lexer.skip(1)
+
+        lexer = ply.lex.lex(object=KeywordLexer())
+        self.assertEqual(lexer.lexkeywords, {'reserved': KeywordLexer.reserved})
+
+        # clone() looks the keyword tables up on the new object, the rules are not analyzed again
+        other = KeywordLexer()
+        other.reserved = {'while': 'WHILE'}
+        keyword_rule = ply.lex._keyword_rule
+        ply.lex._keyword_rule = None
+        try:
+            same = lexer.clone(KeywordLexer())
+            clone = lexer.clone(other)
+        finally:
+            ply.lex._keyword_rule = keyword_rule
+        self.assertIs(same.lexstatefirst, lexer.lexstatefirst)
+        self.assertIs(clone.lexfirst['w'][0][0][2], other.reserved)
+        for lex, types in ((lexer, ['IF', 'ID']), (same, ['IF', 'ID']), (clone, ['ID', 'WHILE'])):
+            lex.input('if while')
+            self.assertEqual([t.type for t in lex], types)
+
+    def test_lex_first_table(self):
+        import lex_keywords
+        lexer = lex_keywords.lexer.clone()
+        self.assertNotIn('1', lexer.lexfirst)
+        self.assertNotIn('\n', lexer.lexfirst)
+        self.assertEqual(lexer.lexfirst['{'], ((), True))
+        self.assertEqual([rule[:2] for rule in lexer.lexfirst['<'][0]], [('<=', 'LE'), ('<', 'LT')])
+        self.assertIs(lexer.lexfirst['w'][0][0][2], lex_keywords.reserved)
+
+        data = 'if x <= 10 { x += "a b" } # comment\nelse {\n while y < 2 x++ + z = $ }\n'
+        lexer.input(data)
+        result = [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+        lexer = lex_keywords.lexer.clone()
+        lexer.lexfirst = {}
+        lexer.input(data)
+        self.assertEqual(result, [(t.type, t.value, t.lineno, t.lexpos) for t in lexer])
+        self.assertEqual([t[0] for t in result],
+                         ['IF', 'ID', 'LE', 'NUMBER', '{', 'ID', 'PLUSEQ', 'STRING', '}', 'ELSE', '{',
+                          'WHILE', 'ID', 'LT', 'NUMBER', 'ID', 'INC', '+', 'ID', '=', '}'])
+
+    def test_lex_line_index(self):
+        import lex_keywords
+        data = 'if x\n\n  y = 1\nz'
+        index = ply.lex.LineIndex(data)
+        self.assertIsNone(index.starts)
+        lexer = lex_keywords.lexer.clone()
+        lexer.lineno = 1
+        lexer.input(data)
+        for tok in lexer:
+            self.assertEqual(index.line(tok.lexpos), tok.lineno)
+            self.assertEqual(index.column(tok.lexpos), tok.lexpos - data.rfind('\n', 0, tok.lexpos))
+        self.assertEqual(list(index.starts), [0, 5, 6, 14])
+        self.assertEqual(index.position(len(data)), (4, 2))
+        self.assertEqual(ply.lex.LineIndex(data.encode('ascii'), lineno=10).position(8), (12, 3))
+
+    def test_lex_linestarts(self):
+        import lex_keywords
+        import lex_linestarts
+        data = 'if x <= 10 { x += "a\nb" } # comment\n\nelse {\n while y < 2 $ x++ }\n' * 20
+        index = ply.lex.LineIndex(data)
+        lexer = lex_linestarts.lexer.clone()
+        lexer.input(data)
+        result = [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+        self.assertEqual([t[2] for t in result], [index.line(t[3]) for t in result])
+        self.assertEqual(lexer.lineno, data.count('\n') + 1)
+        self.assertEqual(list(lexer.lexlines.starts), list(index.starts))
+        self.assertEqual(lexer.column(result[-1][3]), index.column(result[-1][3]))
+
+        # Same lines as a rule that counts them (its strings don't count theirs)
+        plain = data.replace('a\nb', 'a b')
+        lexer = lex_keywords.lexer.clone()
+        lexer.lineno = 1
+        lexer.input(plain)
+        expected = [t.lineno for t in lexer]
+        lexer = lex_linestarts.lexer.clone()
+        lexer.input(plain)
+        self.assertEqual([t.lineno for t in lexer], expected)
+
+        # lineno is counted from where it was set, for file objects, columnar tokens and relex()
+        lexer = lex_linestarts.lexer.clone()
+        lexer.input(data)
+        lexer.lineno = 10
+        self.assertEqual([t.lineno - 9 for t in lexer], [t[2] for t in result])
+        lexer = lex_linestarts.lexer.clone()
+        lexer.lexbufsize = 64
+        lexer.lexlookahead = 16
+        lexer.input(StringIO.StringIO(data))
+        self.assertEqual([(t.type, t.value, t.lineno, t.lexpos) for t in lexer], result)
+        self.assertEqual(lexer.column(result[-1][3]), index.column(result[-1][3]))
+        lexer = lex_linestarts.lexer.clone()
+        columns = lexer.tokenize_columnar(data)
+        self.assertEqual(list(columns.lineno), [t[2] for t in result])
+
+        lexer = lex_linestarts.lexer.clone()
+        lexer.input(data)
+        tokens = list(lexer)
+        new = data.replace('while', '\n\nwhile', 1)
+        newtokens, first, oldstop, newstop, lines = lexer.relex(tokens, data, new)
+        self.assertEqual(lines, 2)
+        lexer.input(new)
+        lexer.lineno = 1
+        self.assertEqual([(t.type, t.lineno, t.lexpos) for t in newtokens],
+                         [(t.type, t.lineno, t.lexpos) for t in lexer])
+
+        # Without linestarts, the lines are found the first time a column is asked for
+        lexer = lex_keywords.lexer.clone()
+        lexer.input(data)
+        self.assertIsNone(lexer.lexlines)
+        self.assertEqual(lexer.column(data.index('else')), 1)
+        self.assertEqual(set(sys.stdout.getvalue().splitlines()), {"Illegal character '$'"})
+
 
 
 unittest.main()
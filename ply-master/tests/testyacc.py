@@ -11,6 +11,9 @@ import os
 import warnings
 import re
 import platform
+import pickle
+import shutil
+import tempfile
 
 sys.tracebacklimit = 0
 
@@ -223,6 +226,43 @@ class YaccErrorWarningTests(unittest.TestCase):
                                     "c=21\n"
             ))
 
+    def test_yacc_error8(self):
+        run_import("yacc_error8")
+        result = sys.stdout.getvalue()
+        self.assertTrue(check_expected(result,
+                                    "Syntax error at '+'\n"
+                                    "Group [1, None, None, 2]\n"
+                                    "Group [3, 4]\n"
+            ))
+
+    def test_yacc_error_compact(self):
+        # The parse() loop has to report and recover from the same errors on the
+        # dense tables
+        parse = ply.yacc.LRParser.parse
+        compact = []
+        def compact_parse(parser, *args, **kwargs):
+            parser.set_compact_tables()
+            compact.append(parser)
+            return parse(parser, *args, **kwargs)
+
+        for n in range(1, 9):
+            module = "yacc_error%d" % n
+            results = []
+            for method in (parse, compact_parse):
+                sys.stdout = StringIO.StringIO()
+                sys.stderr = StringIO.StringIO()
+                ply.yacc.LRParser.parse = method
+                try:
+                    run_import(module)
+                except ply.yacc.YaccError:
+                    pass
+                finally:
+                    ply.yacc.LRParser.parse = parse
+                    sys.modules.pop(module, None)
+                results.append((sys.stdout.getvalue(), sys.stderr.getvalue()))
+            self.assertEqual(results[1], results[0], module)
+        self.assertEqual(len(compact), 4)  # yacc_error1-4 have no parser to run
+
     def test_yacc_inf(self):
         self.assertRaises(ply.yacc.YaccError,run_import,"yacc_inf")
         result = sys.stderr.getvalue()
@@ -400,4 +440,219 @@ class YaccErrorWarningTests(unittest.TestCase):
                                     "Precedence rule 'left' defined for unknown symbol '/'\n"
                                     ))
 
+# Tests related to saving and reloading of the parsing tables
+class YaccTableTests(unittest.TestCase):
+    def setUp(self):
+        sys.stderr = StringIO.StringIO()
+        sys.stdout = StringIO.StringIO()
+        self.tmpdir = tempfile.mkdtemp()
+        self.picklefile = os.path.join(self.tmpdir, "parsetab.p")
+        import yacc_tables
+        self.module = yacc_tables
+
+    def tearDown(self):
+        sys.stderr = sys.__stderr__
+        sys.stdout = sys.__stdout__
+        shutil.rmtree(self.tmpdir)
+        del sys.modules["yacc_tables"]
+
+    def parse(self, parser, data):
+        import calclex
+        return parser.parse(data, lexer=calclex.lexer.clone())
+
+    def test_yacc_picklefile(self):
+        parser = ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.assertTrue(os.path.exists(self.picklefile))
+        self.assertIsInstance(parser.productions[1], ply.yacc.Production)
+
+        sys.stderr = StringIO.StringIO()
+        parser = ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.assertIsInstance(parser.productions[1], ply.yacc.MiniProduction)
+        self.assertEqual(self.parse(parser, "2+3*-4"), -10)
+        self.assertEqual(sys.stderr.getvalue(), "")
+
+    def test_yacc_picklefile_invalidate(self):
+        ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.module.p_expression_number.__doc__ = 'expression : NUMBER\n | NAME'
+        parser = ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.assertIsInstance(parser.productions[1], ply.yacc.Production)
+        self.assertEqual(self.parse(parser, "x"), "x")
+
+        parser = ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.assertIsInstance(parser.productions[1], ply.yacc.MiniProduction)
+        self.assertEqual(self.parse(parser, "x"), "x")
+
+    def test_yacc_picklefile_version(self):
+        with open(self.picklefile, "wb") as f:
+            pickle.dump("0.0", f)
+        parser = ply.yacc.yacc(module=self.module, picklefile=self.picklefile)
+        self.assertIsInstance(parser.productions[1], ply.yacc.Production)
+        self.assertIn("yacc table file version is out of date", sys.stderr.getvalue())
+
+    def test_yacc_tabmodule(self):
+        ply.yacc.yacc(module=self.module, tabmodule="yacc_tables_tab", outputdir=self.tmpdir)
+        sys.path.insert(0, self.tmpdir)
+        try:
+            import yacc_tables_tab
+        finally:
+            sys.path.remove(self.tmpdir)
+            sys.modules.pop("yacc_tables_tab", None)
+
+        # The check only compares the rule docstrings, it gets the signature yacc() did
+        pinfo = ply.yacc.ParserReflect(vars(self.module))
+        pinfo.get_all()
+        self.assertEqual(ply.yacc.grammar_signature(vars(self.module)), pinfo.signature())
+
+        parser = yacc_tables_tab.parser(self.module, check=True)
+        self.assertEqual(self.parse(parser, "2+3*-4"), -10)
+        self.assertEqual(self.parse(parser, "(2+3)*4"), 20)
+
+        # Parsers share the tables, but each one is bound to its own functions
+        other = yacc_tables_tab.parser({**vars(self.module), 'p_expression_number': lambda t: t.__setitem__(0, 1)})
+        self.assertIs(other.action, parser.action)
+        self.assertEqual(self.parse(other, "2+3"), 2)
+        self.assertEqual(self.parse(parser, "2+3"), 5)
+
+        self.module.p_expression_number.__doc__ = 'expression : NUMBER\n | NAME'
+        self.assertRaises(ply.yacc.VersionError, yacc_tables_tab.parser, self.module, check=True)
+
+    def test_yacc_compact(self):
+        parser = ply.yacc.yacc(module=self.module)
+        compact = ply.yacc.yacc(module=self.module)
+        compact.set_compact_tables()
+        for data in ["2+3*-4", "(2+3)*4", "((1))", "(2+)*3+(4 5)", "2+", "2 3", ""]:
+            sys.stdout = StringIO.StringIO()
+            expected = self.parse(parser, data)
+            expected_out = sys.stdout.getvalue()
+            sys.stdout = StringIO.StringIO()
+            self.assertEqual(self.parse(compact, data), expected)
+            self.assertEqual(sys.stdout.getvalue(), expected_out)
+
+        sys.stdout = StringIO.StringIO()
+        self.assertEqual(self.parse(compact, "(2+)*3+(4 5)"), 0)
+        self.assertEqual(sys.stdout.getvalue(),
+                         "Syntax error at ')'\n"
+                         "Syntax error at '5'\n")
+
+        # Debugging runs on the dense tables as well, and logs the same steps
+        import calclex
+        logs = []
+        for p in (parser, compact):
+            log = StringIO.StringIO()
+            p.parse("2+(3 4)", lexer=calclex.lexer.clone(), debug=ply.yacc.PlyLogger(log))
+            logs.append(re.sub('0x[0-9a-f]+', '', log.getvalue()))  # the error symbol's repr
+        self.assertIn('Action : Reduce rule [expression -> NUMBER] with [2] and goto state', logs[0])
+        self.assertEqual(logs[1], logs[0])
+
+        # States with the same actions share their row
+        termindex, actions, goto, prodgoto, defaulted = compact.compact_tables
+        self.assertLess(len({id(row) for row in actions}), len(actions))
+        self.assertLess(len({id(row) for row in goto}), len(goto))
+
+    def test_yacc_compact_nodefault(self):
+        parser = ply.yacc.yacc(module=self.module)
+        parser.set_compact_tables()
+        parser.disable_defaulted_states()
+        self.assertFalse(any(parser.compact_tables[4]))
+        self.assertEqual(self.parse(parser, "2+3*-4"), -10)
+
+    def test_yacc_clone(self):
+        parser = ply.yacc.yacc(module=self.module)
+        parser.set_compact_tables()
+
+        # Clones share the tables, but can be bound to other rule functions
+        other = parser.clone({**vars(self.module), 'p_expression_number': lambda t: t.__setitem__(0, 1)})
+        self.assertIs(other.action, parser.action)
+        self.assertIs(other.compact_tables, parser.compact_tables)
+        self.assertEqual(self.parse(other, "2+3"), 2)
+        self.assertEqual(self.parse(parser, "2+3"), 5)
+        self.assertEqual(self.parse(parser.clone(), "2*3"), 6)
+
+    def test_yacc_positions(self):
+        import calclex
+        spans = []
+
+        def p_expression_group(t):
+            'expression : LPAREN expression RPAREN'
+            spans.append((t.lexpos(0), t.lexpos(2), t.lineno(2), t.position(2)))
+            t[0] = t[2]
+
+        def p_expression_group_error(t):
+            'expression : LPAREN error RPAREN'
+            spans.append((t.lexpos(0), t.lexpos(2), t.lineno(2), t.position(2)))
+            t[0] = 0
+
+        rules = {**vars(self.module), 'p_expression_group': p_expression_group,
+                 'p_expression_group_error': p_expression_group_error}
+        parser = ply.yacc.yacc(module=self.module)
+        data = "1+(2*\n (3-\n4))+(5 6)"
+        for compact in (False, True):
+            if compact:
+                parser.set_compact_tables()
+            # positions=True gives nonterminals the positions tracking=True gives them
+            results = {}
+            for mode in ('tracking', 'positions'):
+                del spans[:]
+                lexer = calclex.lexer.clone()
+                lexer.lineno = 1
+                sys.stdout = StringIO.StringIO()
+                result = parser.clone(rules).parse(data, lexer=lexer, **{mode: True})
+                results[mode] = (result, list(spans), sys.stdout.getvalue())
+            self.assertEqual(results['positions'], results['tracking'])
+            self.assertEqual(results['positions'][1], [(7, 8, 2, (2, 3)), (2, 3, 1, (1, 4)), (15, 16, 3, (3, 6))])
+
+    def test_yacc_profile(self):
+        import calclex
+        parser = ply.yacc.yacc(module=self.module)
+        data = "1+2*3+(4-1)*5"
+        lexer = calclex.lexer.clone()
+        lexer.input(data)
+        log = parser.parseincremental(list(lexer))
+        for compact in (False, True):
+            if compact:
+                parser.set_compact_tables()
+            result = parser.parse(data, lexer=calclex.lexer.clone(), profile=True)
+            profile = parser.profile
+            self.assertEqual(result, 22)
+            self.assertEqual((profile.reductions, profile.shifts, profile.fetches), (log.reduced, log.shifted, 14))
+            self.assertEqual((profile.errors, profile.errsyms, profile.discarded, profile.popped), (0, 0, 0, 0))
+            rules = {rule: calls for rule, calls, seconds in profile.rules()}
+            self.assertEqual(rules, {'expression -> NUMBER': 6, 'expression -> expression PLUS expression': 2,
+                                     'expression -> expression TIMES expression': 2,
+                                     'expression -> expression MINUS expression': 1,
+                                     'expression -> LPAREN expression RPAREN': 1, 'statement -> expression': 1})
+            self.assertTrue(all(seconds > 0 for rule, calls, seconds in profile.rules()))
+
+            # Error recovery, and a profile that adds up several parses
+            self.assertIsNone(parser.parse("1 2 3 + +", lexer=calclex.lexer.clone()))
+            self.assertIsNone(parser.profile)
+            self.assertIsNone(parser.parse("1 2 3 + +", lexer=calclex.lexer.clone(), profile=profile))
+            self.assertIs(parser.profile, profile)
+            self.assertEqual((profile.reductions, profile.shifts, profile.fetches), (14, 16, 20))
+            self.assertEqual((profile.errors, profile.errsyms, profile.discarded, profile.popped), (1, 2, 2, 3))
+        self.assertEqual(sys.stdout.getvalue(), "Syntax error at '2'\n" * 4)
+
+    def test_yacc_incremental(self):
+        import calclex
+        parser = ply.yacc.yacc(module=self.module)
+        lexer = calclex.lexer.clone()
+        old = "1+2*3+(4-1)*5+6*7"
+        lexer.input(old)
+        log = parser.parseincremental(list(lexer))
+        self.assertEqual(log.result, 64)
+        self.assertEqual(log.shifted, len(log.tokens))
+        self.assertEqual(log.reused, 0)
+
+        for new in ["1+2*3+(40-1)*5+6*7", "1+2*3+(40-1)*5+6*7*2", "9+2*3+(40-1)*5+6*7*2", "9+2*3+(40-1)+6*7*2"]:
+            tokens, first, oldstop, newstop, lines = lexer.relex(log.tokens, old, new)
+            log = parser.parseincremental(tokens, log, (first, oldstop, newstop))
+            self.assertEqual(log.result, self.parse(parser, new))
+            self.assertLess(log.shifted, len(tokens))
+            old = new
+        self.assertGreater(log.reused, 0)
+
+        # Syntax errors are left to parse()
+        tokens, first, oldstop, newstop, lines = lexer.relex(log.tokens, old, "1+2*")
+        self.assertIsNone(parser.parseincremental(tokens, log, (first, oldstop, newstop)))
+
 unittest.main()
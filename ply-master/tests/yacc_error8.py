@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# yacc_error8.py
+#
+# Error recovery with a rule that reduces the error symbol without consuming
+# a token.  An error on the token after it must not loop.
+# -----------------------------------------------------------------------------
+import ply.yacc as yacc
+
+from calclex import tokens
+
+def p_statements(t):
+    'statements : statements statement'
+    pass
+
+def p_statements_1(t):
+    'statements : statement'
+    pass
+
+def p_statement_group(t):
+    'statement : LPAREN items RPAREN'
+    print("Group %s" % t[2])
+
+def p_statement_assign(t):
+    'statement : NAME items EQUALS'
+    print("Assign %s" % t[2])
+
+def p_items(t):
+    'items : items item'
+    t[0] = t[1] + [t[2]]
+
+def p_items_empty(t):
+    'items : '
+    t[0] = []
+
+def p_item_number(t):
+    'item : NUMBER'
+    t[0] = t[1]
+
+def p_item_error(t):
+    'item : error'
+    t[0] = None
+
+def p_error(t):
+    print("Syntax error at '%s'" % t.value)
+
+parser = yacc.yacc()
+import calclex
+calclex.lexer.lineno=1
+
+parser.parse("""
+(1 + = 2)
+(3 4)
+""")
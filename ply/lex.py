@@ -39,6 +39,16 @@ import types
 import copy
 import os
 import inspect
+import codecs
+import ast
+import textwrap
+import bisect
+from array import array
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -54,10 +64,75 @@ class LexError(Exception):
         self.text = s
 
 # Token class.  This class is used to represent the tokens produced.
+# The usual attributes are slots.  Token rules can still add attributes
+# of their own, the instance dictionary is only created when they do.
 class LexToken(object):
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer', '__dict__')
+
     def __repr__(self):
         return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
 
+# Columnar token class.  This class holds the tokens produced by
+# Lexer.tokenize_columnar() as parallel arrays instead of one object per
+# token.  types holds small integer ids, typenames maps them back to token
+# type names.  Token values are not stored, value(i) slices them from lexdata.
+class TokenColumns(object):
+    def __init__(self, lexdata, typenames, types, lexpos, length, lineno):
+        self.lexdata = lexdata
+        self.typenames = typenames
+        self.types = types
+        self.lexpos = lexpos
+        self.length = length
+        self.lineno = lineno
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, i):
+        return self.typenames[self.types[i]]
+
+    def value(self, i):
+        start = self.lexpos[i]
+        return self.lexdata[start:start + self.length[i]]
+
+    def __repr__(self):
+        return f'<TokenColumns: {len(self)} tokens>'
+
+# Line start index.  This class converts positions in a string into line
+# and column numbers (both counted from 1, lineno is the number of the first
+# line).  The offsets of the line starts are only collected the first time a
+# position is asked for, so an index that is never used costs nothing.
+# Text read later (from a file object) is added with scan().
+class LineIndex(object):
+    def __init__(self, data, lineno=1):
+        self.data = data
+        self.lineno = lineno
+        self.starts = None
+
+    def build(self):
+        self.starts = array('q', [0])
+        self.scan(self.data)
+
+    def scan(self, data, start=0, offset=0):
+        # Adds the lines starting in data[start:], data[0] is at position offset
+        newline = _newline if isinstance(data, str) else _newline_bytes
+        self.starts.extend(m.end() + offset for m in newline.finditer(data, start))
+
+    def line(self, lexpos):
+        return self.position(lexpos)[0]
+
+    def column(self, lexpos):
+        return self.position(lexpos)[1]
+
+    def position(self, lexpos):
+        if self.starts is None:
+            self.build()
+        n = bisect.bisect_right(self.starts, lexpos) - 1
+        return n + self.lineno, lexpos - self.starts[n] + 1
+
+_newline = re.compile('\n')
+_newline_bytes = re.compile(b'\n')
+
 # This object is a stand-in for a logging object created by the
 # logging module.
 
@@ -83,12 +158,22 @@ class PlyLogger(object):
 # The following Lexer class implements the lexer runtime.   There are only
 # a few public methods and attributes:
 #
-#    input()          -  Store a new string in the lexer
+#    input()          -  Store a new string (or file object) in the lexer
 #    token()          -  Get the next token
 #    clone()          -  Clone the lexer
 #
 #    lineno           -  Current line number
 #    lexpos           -  Current position in the input string
+#    column()         -  Column of a position in the input
+#
+# With lexlinestarts set (lex(linestarts=True)), input() makes a LineIndex
+# of the text and the lexer keeps lineno itself: it is moved to the line of
+# each token before the token is made, rules don't have to count newlines.
+#
+# When reading from a file object, lexdata only holds a window of the input
+# that starts at position lexoffset.  lexpos and the lexpos of the returned
+# tokens are always positions in the whole input, lexdata[lexpos - lexoffset]
+# is the next character.
 # -----------------------------------------------------------------------------
 
 class Lexer:
@@ -111,6 +196,16 @@ class Lexer:
         self.lexdata = None           # Actual input data (as a string)
         self.lexpos = 0               # Current position in input text
         self.lexlen = 0               # Length of the input text
+        self.lexoffset = 0            # Position of lexdata[0] in the input
+        self.lexstream = None         # File object lexdata is read from (if any)
+        self.lexdecoder = None        # Incremental decoder for binary file objects
+        self.lexencoding = 'utf-8'    # Encoding of binary file objects
+        self.lexbufsize = 65536       # Characters read from a file object at once
+        self.lexlookahead = 4096      # Longest token that can be read from a file object
+        self.lexlimit = 0             # Position in lexdata where the window gets refilled
+        self.lexstatefirst = {}       # Dictionary mapping lexer states to first character tables
+        self.lexfirst = {}            # First character table (see _form_first_table)
+        self.lexkeywords = {}         # Keyword tables of the first character tables by attribute name
         self.lexerrorf = None         # Error rule (if any)
         self.lexeoff = None           # EOF rule (if any)
         self.lextokens = None         # List of valid tokens
@@ -118,6 +213,10 @@ class Lexer:
         self.lexliterals = ''         # Literal characters that can be passed through
         self.lexmodule = None         # Module
         self.lineno = 1               # Current line number
+        self.lexlinestarts = False    # Keep lineno with a LineIndex made by input()
+        self.lexlines = None          # LineIndex of the input (if any)
+        self.lexlinenum = 0           # Line of the LineIndex lineno was last moved to
+        self.lexnextline = sys.maxsize  # Position in lexdata where that line ends
 
     def clone(self, object=None):
         c = copy.copy(self)
@@ -144,15 +243,87 @@ class Lexer:
             for key, ef in self.lexstateerrorf.items():
                 c.lexstateerrorf[key] = getattr(object, ef.__name__)
             c.lexmodule = object
+
+            # Keyword tables can belong to the object as well
+            c.lexkeywords = {}
+            newkeywords = {}
+            for name, keywords in self.lexkeywords.items():
+                c.lexkeywords[name] = getattr(object, name, None)
+                if c.lexkeywords[name] is not keywords:
+                    newkeywords[id(keywords)] = c.lexkeywords[name]
+            if not all(isinstance(keywords, dict) for keywords in newkeywords.values()):
+                # Not a keyword table, the rules are called through the master regex
+                c.lexstatefirst = {}
+            elif newkeywords:
+                c.lexstatefirst = {}
+                for key, table in self.lexstatefirst.items():
+                    newtable = {}
+                    for ch, (rules, literal) in table.items():
+                        newrules = tuple((matcher, toktype, newkeywords.get(id(keywords), keywords))
+                                         for matcher, toktype, keywords in rules)
+                        newtable[ch] = (newrules, literal)
+                    c.lexstatefirst[key] = newtable
+
+            # Use the rebound tables for the current state
+            c.begin(c.lexstate)
         return c
 
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
     def input(self, s):
-        self.lexdata = s
         self.lexpos = 0
-        self.lexlen = len(s)
+        self.lexoffset = 0
+        self.lexlines = None
+        self.lexnextline = sys.maxsize
+        if self.lexlinestarts:
+            # The lines of a file object are added by fill()
+            self.lexlines = LineIndex('' if hasattr(s, 'read') else s)
+            self.lexlines.build()
+            self.lexlinenum = 0
+            self.lexnextline = 0
+        if hasattr(s, 'read'):
+            # File object or mmap. The text is decoded and read in chunks as needed
+            self.lexstream = s
+            self.lexdecoder = None
+            self.lexdata = ''
+            self.fill()
+        else:
+            self.lexstream = None
+            self.lexdata = s
+            self.lexlen = len(s)
+
+    # ------------------------------------------------------------
+    # fill() - Drops the text before lexpos and reads more text from
+    #          the input file object.  With grow, at least the
+    #          buffer size is read, however much text is left
+    # ------------------------------------------------------------
+    def fill(self, grow=False):
+        data = self.lexdata[self.lexpos - self.lexoffset:]
+        self.lexoffset = self.lexpos
+        start = len(data)
+
+        bufsize = max(self.lexbufsize, 2 * self.lexlookahead)
+        if grow:
+            bufsize += len(data)
+        while self.lexstream is not None and len(data) < bufsize:
+            chunk = self.lexstream.read(bufsize)
+            eof = not chunk
+            if not isinstance(chunk, str):
+                if self.lexdecoder is None:
+                    self.lexdecoder = codecs.getincrementaldecoder(self.lexencoding)()
+                chunk = self.lexdecoder.decode(chunk, eof)
+            data += chunk
+            if eof:
+                # Everything has been read. From now on, this is a plain string
+                self.lexstream = None
+
+        self.lexdata = data
+        self.lexlen = len(data)
+        self.lexlimit = self.lexlen - self.lexlookahead
+        if self.lexlinestarts:
+            self.lexlines.scan(data, start, self.lexoffset)
+            self.lexnextline = 0        # lexdata moved, find the line again
 
     # ------------------------------------------------------------
     # begin() - Changes the lexing state
@@ -162,6 +333,7 @@ class Lexer:
             raise ValueError(f'Undefined state {state!r}')
         self.lexre = self.lexstatere[state]
         self.lexretext = self.lexstateretext[state]
+        self.lexfirst = self.lexstatefirst.get(state, {})
         self.lexignore = self.lexstateignore.get(state, '')
         self.lexerrorf = self.lexstateerrorf.get(state, None)
         self.lexeoff = self.lexstateeoff.get(state, None)
@@ -192,116 +364,424 @@ class Lexer:
     def skip(self, n):
         self.lexpos += n
 
+    # ------------------------------------------------------------
+    # column() - Column of a position in the input (counted from 1)
+    # ------------------------------------------------------------
+    def column(self, lexpos):
+        if self.lexlines is None:
+            # Without lexlinestarts, the lines are only found when asked for.  That needs
+            # the whole input, a file object only leaves a window of it in lexdata
+            if self.lexoffset or self.lexstream is not None:
+                raise ValueError('column() of a file object needs lex(linestarts=True)')
+            self.lexlines = LineIndex(self.lexdata)
+        return self.lexlines.column(lexpos)
+
+    # ------------------------------------------------------------
+    # _next_line() - Moves lineno to the line of lexpos (in lexdata)
+    #
+    # Returns the position in lexdata where this line ends.  Only
+    # used with lexlinestarts, token() calls it when a token starts
+    # past the end of the line lineno was last moved to.
+    # ------------------------------------------------------------
+    def _next_line(self, lexpos):
+        starts = self.lexlines.starts
+        n = bisect.bisect_right(starts, lexpos + self.lexoffset) - 1
+        self.lineno += n - self.lexlinenum
+        self.lexlinenum = n
+        if n + 1 < len(starts):
+            self.lexnextline = starts[n + 1] - self.lexoffset
+        else:
+            self.lexnextline = sys.maxsize
+        return self.lexnextline
+
     # ------------------------------------------------------------
     # token() - Return the next token from the Lexer
     #
     # Note: This function has been carefully implemented to be as fast
     # as possible.  Don't make changes unless you really know what
     # you are doing
+    #
+    # When reading a file object, the window is refilled when fewer
+    # than lexlookahead characters are left in it.  A match that
+    # reaches the end of the window is tried again once the window has
+    # grown, until the token ends inside it or everything has been
+    # read.  Text that doesn't match is not read further: a token only
+    # has to match if it is at most lexlookahead characters long.
     # ------------------------------------------------------------
     def token(self):
-        # Make local copies of frequently referenced attributes
-        lexpos    = self.lexpos
-        lexlen    = self.lexlen
-        lexignore = self.lexignore
-        lexdata   = self.lexdata
+        grow = False
+        while True:
+            # Make local copies of frequently referenced attributes
+            lexoffset = self.lexoffset
+            lexpos    = self.lexpos - lexoffset   # Position in lexdata
+            lexlen    = self.lexlen
+            lexignore = self.lexignore
+            lexdata   = self.lexdata
+            lexfirst  = self.lexfirst
+            lexnextline = self.lexnextline
+
+            # When reading a file object, stop early to refill the window
+            lexstream = self.lexstream
+            lexlimit  = lexlen if lexstream is None else self.lexlimit
+
+            while lexpos < lexlimit:
+                # This code provides some short-circuit code for whitespace, tabs, and other ignored characters
+                if lexdata[lexpos] in lexignore:
+                    lexpos += 1
+                    continue
 
-        while lexpos < lexlen:
-            # This code provides some short-circuit code for whitespace, tabs, and other ignored characters
-            if lexdata[lexpos] in lexignore:
-                lexpos += 1
-                continue
+                # A token starts on a new line (only with lexlinestarts)
+                if lexpos >= lexnextline:
+                    lexnextline = self._next_line(lexpos)
+
+                # Fast path for rules that can be matched without the master regex,
+                # chosen by the first character (see _form_first_table)
+                first = lexfirst.get(lexdata[lexpos])
+                if first is not None:
+                    rules, literal = first
+                    for matcher, toktype, keywords in rules:
+                        if matcher.__class__ is str:
+                            if not lexdata.startswith(matcher, lexpos):
+                                continue
+                            value = matcher
+                        else:
+                            m = matcher(lexdata, lexpos)
+                            if not m:
+                                continue
+                            if m.end() == lexlen and lexstream is not None:
+                                # The token may go on after the window
+                                grow = True
+                                lexlimit = lexpos
+                                break
+                            value = m.group()
+
+                        if not toktype:
+                            # Ignored token
+                            lexpos += len(value)
+                            break
+
+                        tok = LexToken()
+                        tok.value = value
+                        tok.lineno = self.lineno
+                        tok.lexpos = lexpos + lexoffset
+                        tok.type = keywords.get(value, toktype) if keywords else toktype
+                        self.lexpos = tok.lexpos + len(value)
+                        return tok
+                    else:
+                        if literal:
+                            tok = LexToken()
+                            tok.value = tok.type = lexdata[lexpos]
+                            tok.lineno = self.lineno
+                            tok.lexpos = lexpos + lexoffset
+                            self.lexpos = tok.lexpos + 1
+                            return tok
+                        first = None
+
+                    if first is not None:
+                        continue
 
-            # Look for a regular expression match
-            for lexre, lexindexfunc in self.lexre:
-                m = lexre.match(lexdata, lexpos)
-                if not m:
-                    continue
+                # Look for a regular expression match
+                for lexre, lexindexfunc in self.lexre:
+                    m = lexre.match(lexdata, lexpos)
+                    if not m:
+                        continue
+                    if m.end() == lexlen and lexstream is not None:
+                        # The token may go on after the window
+                        grow = True
+                        lexlimit = lexpos
+                        break
 
-                # Create a token for return
+                    # Create a token for return
+                    tok = LexToken()
+                    tok.value = m.group()
+                    tok.lineno = self.lineno
+                    tok.lexpos = lexpos + lexoffset
+
+                    i = m.lastindex
+                    func, tok.type = lexindexfunc[i]
+
+                    if not func:
+                        # If no token type was set, it's an ignored token
+                        if tok.type:
+                            self.lexpos = m.end() + lexoffset
+                            return tok
+                        else:
+                            lexpos = m.end()
+                            break
+
+                    lexpos = m.end()
+
+                    # If token is processed by a function, call it
+
+                    tok.lexer = self      # Set additional attributes useful in token rules
+                    self.lexmatch = m
+                    self.lexpos = lexpos + lexoffset
+                    newtok = func(tok)
+                    del tok.lexer
+                    del self.lexmatch
+
+                    # Every function must return a token, if nothing, we just move to next token
+                    if not newtok:
+                        lexpos    = self.lexpos - lexoffset  # This is here in case user has updated lexpos.
+                        lexignore = self.lexignore      # This is here in case there was a state change
+                        break
+                    return newtok
+                else:
+                    # No match, see if in literals
+                    if lexdata[lexpos] in self.lexliterals:
+                        tok = LexToken()
+                        tok.value = lexdata[lexpos]
+                        tok.lineno = self.lineno
+                        tok.type = tok.value
+                        tok.lexpos = lexpos + lexoffset
+                        self.lexpos = tok.lexpos + 1
+                        return tok
+
+                    # No match. Call t_error() if defined.
+                    if self.lexerrorf:
+                        tok = LexToken()
+                        tok.value = self.lexdata[lexpos:]
+                        tok.lineno = self.lineno
+                        tok.type = 'error'
+                        tok.lexer = self
+                        tok.lexpos = lexpos + lexoffset
+                        self.lexpos = tok.lexpos
+                        newtok = self.lexerrorf(tok)
+                        if tok.lexpos == self.lexpos:
+                            # Error method didn't change text position at all. This is an error.
+                            raise LexError(f"Scanning error. Illegal character {lexdata[lexpos]!r}",
+                                           lexdata[lexpos:])
+                        lexpos = self.lexpos - lexoffset
+                        if not newtok:
+                            continue
+                        return newtok
+
+                    self.lexpos = lexpos + lexoffset
+                    raise LexError(f"Illegal character {lexdata[lexpos]!r} at index {lexpos + lexoffset}",
+                                   lexdata[lexpos:])
+
+            if lexpos >= lexnextline:
+                self._next_line(lexpos)
+
+            if lexstream is not None:
+                self.lexpos = lexpos + lexoffset
+                self.fill(grow)
+                grow = False
+                continue
+
+            if self.lexeoff:
                 tok = LexToken()
-                tok.value = m.group()
+                tok.type = 'eof'
+                tok.value = ''
                 tok.lineno = self.lineno
-                tok.lexpos = lexpos
+                tok.lexpos = lexpos + lexoffset
+                tok.lexer = self
+                self.lexpos = tok.lexpos
+                newtok = self.lexeoff(tok)
+                return newtok
 
-                i = m.lastindex
-                func, tok.type = lexindexfunc[i]
+            self.lexpos = lexpos + lexoffset + 1
+            if self.lexdata is None:
+                raise RuntimeError('No input string given with input()')
+            return None
 
-                if not func:
-                    # If no token type was set, it's an ignored token
-                    if tok.type:
-                        self.lexpos = m.end()
-                        return tok
-                    else:
-                        lexpos = m.end()
-                        break
+    # ------------------------------------------------------------
+    # tokenize_columnar() - Tokenize a whole string into a TokenColumns
+    #
+    # This gives the same tokens as token(), but only records their
+    # type, lexpos, length and lineno in arrays.  No token object is
+    # created unless a rule function has to be called.
+    # ------------------------------------------------------------
+    def tokenize_columnar(self, data):
+        if hasattr(data, 'read'):
+            data = data.read()           # Values are sliced from lexdata, so it must all be there
+        self.input(data)
+        lexdata = self.lexdata
+        lexlen = self.lexlen
+        lexpos = 0
+        lexnextline = self.lexnextline
+
+        # Type ids are stable for a given set of tokens and literals
+        typenames = sorted(getattr(self, 'lextokens_all', ()))
+        typeids = {name: n for n, name in enumerate(typenames)}
+        types = array('i')
+        positions = array('q')
+        lengths = array('i')
+        linenos = array('i')
 
-                lexpos = m.end()
+        while lexpos < lexlen:
+            if lexdata[lexpos] in self.lexignore:
+                lexpos += 1
+                continue
 
-                # If token is processed by a function, call it
+            # Fast path (see token())
+            if lexpos >= lexnextline:
+                lexnextline = self._next_line(lexpos)
+            lineno = self.lineno
+            first = self.lexfirst.get(lexdata[lexpos])
+            if first is not None:
+                rules, literal = first
+                for matcher, toktype, keywords in rules:
+                    if matcher.__class__ is str:
+                        if not lexdata.startswith(matcher, lexpos):
+                            continue
+                        end = lexpos + len(matcher)
+                    else:
+                        m = matcher(lexdata, lexpos)
+                        if not m:
+                            continue
+                        end = m.end()
+                    if keywords:
+                        toktype = keywords.get(lexdata[lexpos:end], toktype)
+                    break
+                else:
+                    if literal:
+                        toktype = lexdata[lexpos]
+                        end = lexpos + 1
+                    else:
+                        first = None
 
-                tok.lexer = self      # Set additional attributes useful in token rules
-                self.lexmatch = m
-                self.lexpos = lexpos
-                newtok = func(tok)
-                del tok.lexer
-                del self.lexmatch
+            if first is None:
+                for lexre, lexindexfunc in self.lexre:
+                    m = lexre.match(lexdata, lexpos)
+                    if not m:
+                        continue
 
-                # Every function must return a token, if nothing, we just move to next token
-                if not newtok:
-                    lexpos    = self.lexpos         # This is here in case user has updated lexpos.
-                    lexignore = self.lexignore      # This is here in case there was a state change
+                    func, toktype = lexindexfunc[m.lastindex]
+                    end = m.end()
+                    if func:
+                        tok = LexToken()
+                        tok.value = m.group()
+                        tok.lineno = lineno
+                        tok.lexpos = lexpos
+                        tok.type = toktype
+                        tok.lexer = self
+                        self.lexmatch = m
+                        self.lexpos = end
+                        newtok = func(tok)
+                        del tok.lexer
+                        del self.lexmatch
+                        end = self.lexpos             # In case the rule updated lexpos
+                        if newtok:
+                            toktype = newtok.type
+                            lineno = newtok.lineno
+                        else:
+                            toktype = None
                     break
-                return newtok
-            else:
-                # No match, see if in literals
-                if lexdata[lexpos] in self.lexliterals:
-                    tok = LexToken()
-                    tok.value = lexdata[lexpos]
-                    tok.lineno = self.lineno
-                    tok.type = tok.value
-                    tok.lexpos = lexpos
-                    self.lexpos = lexpos + 1
-                    return tok
+                else:
+                    # No match, see if in literals
+                    if lexdata[lexpos] in self.lexliterals:
+                        toktype = lexdata[lexpos]
+                        end = lexpos + 1
+
+                    # No match. Call t_error() if defined.
+                    elif self.lexerrorf:
+                        tok = LexToken()
+                        tok.value = lexdata[lexpos:]
+                        tok.lineno = lineno
+                        tok.type = 'error'
+                        tok.lexer = self
+                        tok.lexpos = lexpos
+                        self.lexpos = lexpos
+                        newtok = self.lexerrorf(tok)
+                        if lexpos == self.lexpos:
+                            raise LexError(f"Scanning error. Illegal character {lexdata[lexpos]!r}",
+                                           lexdata[lexpos:])
+                        end = self.lexpos
+                        toktype = newtok.type if newtok else None
 
-                # No match. Call t_error() if defined.
-                if self.lexerrorf:
-                    tok = LexToken()
-                    tok.value = self.lexdata[lexpos:]
-                    tok.lineno = self.lineno
-                    tok.type = 'error'
-                    tok.lexer = self
-                    tok.lexpos = lexpos
-                    self.lexpos = lexpos
-                    newtok = self.lexerrorf(tok)
-                    if lexpos == self.lexpos:
-                        # Error method didn't change text position at all. This is an error.
-                        raise LexError(f"Scanning error. Illegal character {lexdata[lexpos]!r}",
+                    else:
+                        self.lexpos = lexpos
+                        raise LexError(f"Illegal character {lexdata[lexpos]!r} at index {lexpos}",
                                        lexdata[lexpos:])
-                    lexpos = self.lexpos
-                    if not newtok:
-                        continue
-                    return newtok
 
-                self.lexpos = lexpos
-                raise LexError(f"Illegal character {lexdata[lexpos]!r} at index {lexpos}",
-                               lexdata[lexpos:])
-
-        if self.lexeoff:
-            tok = LexToken()
-            tok.type = 'eof'
-            tok.value = ''
-            tok.lineno = self.lineno
-            tok.lexpos = lexpos
-            tok.lexer = self
-            self.lexpos = lexpos
-            newtok = self.lexeoff(tok)
-            return newtok
-
-        self.lexpos = lexpos + 1
-        if self.lexdata is None:
-            raise RuntimeError('No input string given with input()')
-        return None
+            # Ignored and discarded tokens are not recorded
+            if toktype:
+                typeid = typeids.get(toktype)
+                if typeid is None:
+                    typeid = typeids[toktype] = len(typenames)
+                    typenames.append(toktype)
+                types.append(typeid)
+                positions.append(lexpos)
+                lengths.append(end - lexpos)
+                linenos.append(lineno)
+            lexpos = end
+
+        if lexpos >= lexnextline:
+            self._next_line(lexpos)
+        self.lexpos = lexpos
+        return TokenColumns(lexdata, typenames, types, positions, lengths, linenos)
+
+    # ------------------------------------------------------------
+    # relex() - Tokenize an edited version of the input again
+    #
+    # tokens is the list of tokens of olddata.  Only the text around
+    # the part that differs from newdata is tokenized, as soon as a
+    # new token is the same as an old one at the same place after the
+    # edit, the rest of the old tokens is taken over.  Returns
+    # (newtokens, first, oldstop, newstop, lines): newtokens[:first]
+    # are the tokens[:first] and newtokens[newstop:] are the
+    # tokens[oldstop:], these are moved to their new lexpos and lineno
+    # in place (lines is how much their lineno changed).  Afterwards,
+    # lexpos is at the end of the input and lineno is where the
+    # tokenizing stopped.
+    #
+    # This assumes that a rule only looks at the text of its token
+    # and at the character after it.  Lexers with states are always
+    # tokenized from the start.
+    # ------------------------------------------------------------
+    def relex(self, tokens, olddata, newdata, lineno=1):
+        prefix, suffix = _common_ends(olddata, newdata)
+        delta = len(newdata) - len(olddata)
+        newend = len(newdata) - suffix
+
+        # Start one token before the token with the first change, so that
+        # tokens that grow into the changed text are found
+        first = 0
+        resync = len(self.lexstatere) == 1
+        if resync:
+            first = max(bisect.bisect_left(tokens, prefix, key=_lexpos) - 2, 0)
+
+        self.begin('INITIAL')
+        self.input(newdata)
+        if first:
+            self.lexpos = tokens[first].lexpos
+            if self.lexlinestarts:
+                self._next_line(self.lexpos)
+            self.lineno = tokens[first].lineno
+        else:
+            self.lineno = lineno
+
+        newtokens = tokens[:first]
+        j = first
+        while True:
+            tok = self.token()
+            if not tok:
+                return newtokens, first, len(tokens), len(newtokens), 0
+
+            if resync and tok.lexpos >= newend:
+                # Past the edit, look for the same token in the old list
+                oldpos = tok.lexpos - delta
+                while j < len(tokens) and tokens[j].lexpos < oldpos:
+                    j += 1
+                if j == len(tokens):
+                    break
+                old = tokens[j]
+                if old.lexpos == oldpos and old.type == tok.type and old.value == tok.value:
+                    newstop = len(newtokens)
+                    lines = tok.lineno - old.lineno
+                    for old in tokens[j:]:
+                        old.lexpos += delta
+                        old.lineno += lines
+                    newtokens.extend(tokens[j:])
+                    self.lexpos = self.lexlen
+                    return newtokens, first, j, newstop, lines
+            newtokens.append(tok)
+
+        # The old tokens ran out, the rest is new
+        newtokens.append(tok)
+        newtokens.extend(self)
+        return newtokens, first, len(tokens), len(newtokens), 0
 
     # Iterator interface
     def __iter__(self):
@@ -320,6 +800,32 @@ class Lexer:
 # and build a Lexer object from it.
 # -----------------------------------------------------------------------------
 
+# -----------------------------------------------------------------------------
+# _common_ends(a, b)
+#
+# Returns the lengths of the common prefix and the common suffix of two
+# strings.  The suffix does not overlap the prefix in the shorter string.
+# -----------------------------------------------------------------------------
+def _common_ends(a, b, chunk=4096):
+    n = min(len(a), len(b))
+    prefix = 0
+    while prefix < n and a[prefix:prefix + chunk] == b[prefix:prefix + chunk]:
+        prefix += chunk
+    prefix = min(prefix, n)
+    while prefix < n and a[prefix] == b[prefix]:
+        prefix += 1
+
+    n -= prefix
+    suffix = 0
+    while suffix + chunk <= n and a[len(a) - suffix - chunk:len(a) - suffix] == b[len(b) - suffix - chunk:len(b) - suffix]:
+        suffix += chunk
+    while suffix < n and a[len(a) - suffix - 1] == b[len(b) - suffix - 1]:
+        suffix += 1
+    return prefix, suffix
+
+def _lexpos(tok):
+    return tok.lexpos
+
 # -----------------------------------------------------------------------------
 # _get_regex(func)
 #
@@ -377,6 +883,198 @@ def _form_master_re(relist, reflags, ldict, toknames):
         rlist, rre, rnames = _form_master_re(relist[m:], reflags, ldict, toknames)
         return (llist+rlist), (lre+rre), (lnames+rnames)
 
+# -----------------------------------------------------------------------------
+# def _form_first_table(lexre, lexrenames, reflags, literals, ldict, attrs)
+#
+# This function builds the table used by the fast path of Lexer.token().  It
+# maps an ASCII character to a tuple (rules, literal).  rules lists, in master
+# regex order, every rule that can match text starting with the character as
+# (matcher, tokentype, keywords) where matcher is a fixed string or the match
+# method of the rule's own regex.  literal is True if the character is a literal.
+# Trying these rules in turn gives the same token as the master regex would.
+#
+# Only rules without a function and rules of the form
+#
+#     def t_ID(t):
+#         r'[a-zA-Z_][a-zA-Z0-9_]*'
+#         t.type = reserved.get(t.value, 'ID')
+#         return t
+#
+# can be handled inline.  A character that can start any other rule gets no
+# entry and is always matched with the master regex.  Keyword dictionaries
+# that are attributes of the rule's object (self.reserved) are added to
+# attrs by name, so clone() can look them up on a new object.
+# -----------------------------------------------------------------------------
+
+_ascii = frozenset(chr(c) for c in range(128))
+
+_categories = {
+    sre_parse.CATEGORY_DIGIT: r'\d',
+    sre_parse.CATEGORY_NOT_DIGIT: r'\D',
+    sre_parse.CATEGORY_SPACE: r'\s',
+    sre_parse.CATEGORY_NOT_SPACE: r'\S',
+    sre_parse.CATEGORY_WORD: r'\w',
+    sre_parse.CATEGORY_NOT_WORD: r'\W',
+}
+
+_repeats = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}
+
+def _first_chars(pattern, reflags):
+    '''Returns (chars, nullable) for a parsed regex. chars is the set of ASCII
+    characters a match can start with, or None if that isn't known'''
+    first = set()
+    for op, av in pattern:
+        if op is sre_parse.LITERAL:
+            chars, nullable = {chr(av)}, False
+        elif op is sre_parse.NOT_LITERAL:
+            chars, nullable = _ascii - {chr(av)}, False
+        elif op is sre_parse.ANY:
+            chars, nullable = _ascii, False
+        elif op is sre_parse.IN:
+            chars, nullable = _in_chars(av, reflags), False
+        elif op is sre_parse.BRANCH:
+            chars, nullable = set(), False
+            for item in av[1]:
+                c, n = _first_chars(item, reflags)
+                if c is None:
+                    return None, True
+                chars |= c
+                nullable = nullable or n
+        elif op is sre_parse.SUBPATTERN:
+            if av[1] & re.IGNORECASE:
+                return None, True
+            chars, nullable = _first_chars(av[-1], reflags)
+        elif op in _repeats:
+            chars, nullable = _first_chars(av[2], reflags)
+            nullable = nullable or av[0] == 0
+        else:
+            # Anchors, assertions, back references, ...
+            return None, True
+
+        if chars is None:
+            return None, True
+        first |= chars
+        if not nullable:
+            return first, False
+    return first, True
+
+def _in_chars(items, reflags):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE:
+            chars.update(c for c in _ascii if av[0] <= ord(c) <= av[1])
+        elif op is sre_parse.CATEGORY and av in _categories:
+            cre = re.compile(_categories[av], reflags)
+            chars.update(c for c in _ascii if cre.match(c))
+        else:
+            return None
+    return _ascii - chars if negate else chars
+
+def _keyword_rule(func):
+    '''If func is a rule that only looks up the token type in a keyword
+    dictionary, returns (keywords, default type, name of the attribute of
+    the rule's object holding keywords or None)'''
+    try:
+        node = ast.parse(textwrap.dedent(inspect.getsource(func))).body[0]
+    except (OSError, TypeError, SyntaxError, IndexError):
+        return None
+    if not isinstance(node, ast.FunctionDef):
+        return None
+
+    body = node.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+        body = body[1:]
+    args = [a.arg for a in node.args.args]
+    if len(body) != 2 or not 1 <= len(args) <= 2:
+        return None
+    t = args[-1]
+
+    # t.type = <keywords>.get(t.value, 'NAME')
+    assign, ret = body
+    if not (isinstance(assign, ast.Assign) and len(assign.targets) == 1 and
+            ast.dump(assign.targets[0]) == ast.dump(ast.Attribute(ast.Name(t, ast.Load()), 'type', ast.Store()))):
+        return None
+    call = assign.value
+    if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr == 'get' and
+            len(call.args) == 2 and not call.keywords and
+            ast.dump(call.args[0]) == ast.dump(ast.Attribute(ast.Name(t, ast.Load()), 'value', ast.Load())) and
+            isinstance(call.args[1], ast.Constant) and isinstance(call.args[1].value, str)):
+        return None
+
+    # return t
+    if not (isinstance(ret, ast.Return) and isinstance(ret.value, ast.Name) and ret.value.id == t):
+        return None
+
+    table = call.func.value
+    attr = None
+    if isinstance(table, ast.Name) and len(args) == 1:
+        if table.id in func.__code__.co_freevars:
+            keywords = func.__closure__[func.__code__.co_freevars.index(table.id)].cell_contents
+        else:
+            keywords = func.__globals__.get(table.id)
+    elif (isinstance(table, ast.Attribute) and isinstance(table.value, ast.Name) and
+          table.value.id == args[0] and len(args) == 2 and hasattr(func, '__self__')):
+        attr = table.attr
+        keywords = getattr(func.__self__, attr, None)
+    else:
+        return None
+
+    if not isinstance(keywords, dict):
+        return None
+    return keywords, call.args[1].value, attr
+
+def _form_first_table(lexre, lexrenames, reflags, literals, ldict, attrs):
+    if reflags & re.IGNORECASE or not isinstance(literals, str):
+        return {}
+
+    rules = []          # (first chars, entry), entry is None for rules needing the master regex
+    for (cre, findex), names in zip(lexre, lexrenames):
+        if not isinstance(cre.pattern, str):
+            return {}
+        for i, name in enumerate(names):
+            if not name:
+                continue
+            func, toktype = findex[i]
+            handle = ldict.get(name)
+            regex = _get_regex(handle) if func else handle
+            try:
+                parsed = sre_parse.parse(regex, reflags)
+            except Exception:
+                return {}
+            chars, nullable = _first_chars(parsed, reflags)
+            if chars is None or nullable:
+                return {}
+
+            entry = None
+            if not func:
+                if all(op is sre_parse.LITERAL for op, av in parsed):
+                    entry = (''.join(chr(av) for op, av in parsed), toktype, None)
+                else:
+                    entry = (re.compile(regex, reflags).match, toktype, None)
+            else:
+                keywords = _keyword_rule(handle)
+                if keywords:
+                    entry = (re.compile(regex, reflags).match, keywords[1], keywords[0])
+                    if keywords[2]:
+                        attrs[keywords[2]] = keywords[0]
+            if entry and any(op in (sre_parse.GROUPREF, getattr(sre_parse, 'GROUPREF_EXISTS', None))
+                             for op, av in parsed):
+                entry = None
+            rules.append((chars, entry))
+
+    table = {}
+    for c in sorted(_ascii):
+        entries = [entry for chars, entry in rules if c in chars]
+        if None in entries or (not entries and c not in literals):
+            continue
+        table[c] = (tuple(entries), c in literals)
+    return table
+
 # -----------------------------------------------------------------------------
 # def _statetoken(s,names)
 #
@@ -715,13 +1413,14 @@ class LexerReflect(object):
 # Build all of the regular expression rules from definitions in the supplied module
 # -----------------------------------------------------------------------------
 def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None, linestarts=False):
 
     global lexer
 
     ldict = None
     stateinfo  = {'INITIAL': 'inclusive'}
     lexobj = Lexer()
+    lexobj.lexlinestarts = linestarts
     global token, input
 
     if errorlog is None:
@@ -813,8 +1512,14 @@ def lex(*, module=None, object=None, debug=False,
             lexobj.lexstateretext[state].extend(lexobj.lexstateretext['INITIAL'])
             lexobj.lexstaterenames[state].extend(lexobj.lexstaterenames['INITIAL'])
 
+    # Build the first character tables for the fast path of token()
+    for state in lexobj.lexstatere:
+        lexobj.lexstatefirst[state] = _form_first_table(lexobj.lexstatere[state], lexobj.lexstaterenames[state],
+                                                        reflags, lexobj.lexliterals, ldict, lexobj.lexkeywords)
+
     lexobj.lexstateinfo = stateinfo
     lexobj.lexre = lexobj.lexstatere['INITIAL']
+    lexobj.lexfirst = lexobj.lexstatefirst['INITIAL']
     lexobj.lexretext = lexobj.lexstateretext['INITIAL']
     lexobj.lexreflags = reflags
 
@@ -63,8 +63,16 @@
 
 import re
 import types
+import copy
 import sys
+import os
 import inspect
+import hashlib
+import pickle
+import time
+from array import array
+
+from . import __version__
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -76,10 +84,12 @@ yaccdebug   = False            # Debugging mode.  If set, yacc generates a
                                # a 'parser.out' file in the current directory
 
 debug_file  = 'parser.out'     # Default name of the debugging file
+__tabversion__ = '2026.10'     # Version of the cached table file format
 error_count = 3                # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40               # Size limit of results when running in debug mode.
 
 MAXINT = sys.maxsize
+ERROR_ACTION = -0x7fffffff     # Action of a token the action table has no entry for
 
 # This object is a stand-in for a logging object created by the
 # logging module.   PLY will use this by default to create things
@@ -152,8 +162,13 @@ def format_stack_entry(r):
 #        .endlineno  = Ending line number (optional, set automatically)
 #        .lexpos     = Starting lex position
 #        .endlexpos  = Ending lex position (optional, set automatically)
+#
+# These attributes are slots, other attributes go to the instance dictionary,
+# which is only created when needed.
 
 class YaccSymbol:
+    __slots__ = ('type', 'value', 'lineno', 'endlineno', 'lexpos', 'endlexpos', '__dict__')
+
     def __str__(self):
         return self.type
 
@@ -168,6 +183,12 @@ class YaccSymbol:
 # a tuple of (startline,endline) representing the range of lines
 # for a symbol.  The lexspan() method returns a tuple (lexpos,endlexpos)
 # representing the range of positional information for a symbol.
+#
+# When parsing with positions=True, positions holds the starting lex position
+# of every symbol on the parser stack, symbol n of the production is found at
+# base + n and start is the position of the symbol being reduced.  lexpos()
+# then works for nonterminals too, and position() and lineno() convert it to
+# a line (and column) with a LineIndex over the input.
 
 class YaccProduction:
     def __init__(self, s, stack=None):
@@ -175,6 +196,10 @@ class YaccProduction:
         self.stack = stack
         self.lexer = None
         self.parser = None
+        self.positions = None
+        self.base = 0
+        self.start = 0
+        self.lines = None
 
     def __getitem__(self, n):
         if isinstance(n, slice):
@@ -194,7 +219,10 @@ class YaccProduction:
         return len(self.slice)
 
     def lineno(self, n):
-        return getattr(self.slice[n], 'lineno', 0)
+        lineno = getattr(self.slice[n], 'lineno', None)
+        if lineno is None:
+            return self.position(n)[0] if self.positions is not None else 0
+        return lineno
 
     def set_lineno(self, n, lineno):
         self.slice[n].lineno = lineno
@@ -205,8 +233,16 @@ class YaccProduction:
         return startline, endline
 
     def lexpos(self, n):
+        if self.positions is not None and n >= 0:
+            return self.positions[self.base + n] if n else self.start
         return getattr(self.slice[n], 'lexpos', 0)
 
+    def position(self, n):
+        if self.lines is None:
+            from .lex import LineIndex
+            self.lines = LineIndex(self.lexer.lexdata)
+        return self.lines.position(self.lexpos(n))
+
     def set_lexpos(self, n, lexpos):
         self.slice[n].lexpos = lexpos
 
@@ -218,6 +254,111 @@ class YaccProduction:
     def error(self):
         raise SyntaxError
 
+# This class holds what parseincremental() remembers of a parse, so that the
+# next parse of an edited token list can start from it.
+#
+#        .tokens   = The list of tokens that was parsed
+#        .result   = Value of the start symbol
+#        .stacks   = Parser stack at the time each token became the lookahead
+#                    (None where the token was inside a reused subtree)
+#        .spans    = Reductions starting at each token, as a list of
+#                    (symbol, number of tokens, state below the symbol)
+#        .shifted  = Number of tokens shifted
+#        .reduced  = Number of grammar rules called
+#        .reused   = Number of subtrees taken over from the previous parse
+#        .moved    = Symbols of the reused subtrees after the changed tokens
+#
+# Stacks are linked tuples (state, symbol, first token, rest of the stack),
+# so that keeping one for every token costs nothing.
+
+class ParseLog:
+    def __init__(self, tokens, stacks, spans):
+        self.tokens = tokens
+        self.stacks = stacks
+        self.spans = spans
+        self.result = None
+        self.shifted = 0
+        self.reduced = 0
+        self.reused = 0
+        self.moved = []
+
+    def __repr__(self):
+        return (f'<ParseLog tokens={len(self.tokens)} shifted={self.shifted} '
+                f'reduced={self.reduced} reused={self.reused}>')
+
+# This class holds what parse(profile=True) measured of a parse.
+#
+#        .calls      = Number of times each production was reduced (by number)
+#        .times      = Seconds spent in the rule function of each production
+#        .shifts     = Number of symbols shifted (error symbols included)
+#        .fetches    = Number of tokens taken from the lexer
+#        .errors     = Number of syntax errors reported (p_error calls)
+#        .errsyms    = Number of error symbols made during recovery
+#        .discarded  = Number of tokens thrown away during recovery
+#        .popped     = Number of stack entries popped during recovery
+#        .seconds    = Wall time of the parse
+#
+# A profile can be passed to parse() again to add up several parses.
+
+class ParseProfile:
+    def __init__(self, productions):
+        self.productions = productions
+        self.calls = [0] * len(productions)
+        self.times = [0.0] * len(productions)
+        self.shifts = 0
+        self.fetches = 0
+        self.errors = 0
+        self.errsyms = 0
+        self.discarded = 0
+        self.popped = 0
+        self.seconds = 0.0
+
+    @property
+    def reductions(self):
+        return sum(self.calls)
+
+    # Rule function wrappers that count and time the calls of each production
+    def bind(self, productions):
+        calls = self.calls
+        times = self.times
+        clock = time.perf_counter
+
+        def timed(n, func):
+            def call(p):
+                start = clock()
+                try:
+                    func(p)
+                finally:
+                    times[n] += clock() - start
+                    calls[n] += 1
+            return call
+
+        bound = []
+        for n, p in enumerate(productions):
+            m = MiniProduction(p.str, p.name, p.len, p.func, p.file, p.line)
+            m.callable = p.callable and timed(n, p.callable)
+            bound.append(m)
+        return bound
+
+    # (production, calls, seconds) of the reduced productions, most time first
+    def rules(self):
+        rules = [(p.str, calls, seconds)
+                 for p, calls, seconds in zip(self.productions, self.calls, self.times) if calls]
+        rules.sort(key=lambda rule: rule[2], reverse=True)
+        return rules
+
+    def __str__(self):
+        lines = [f'{self.seconds:.6f}s  {self.reductions} reductions  {self.shifts} shifts  '
+                 f'{self.fetches} fetches  {self.errors} errors  {self.errsyms} error symbols  '
+                 f'{self.discarded} discarded  {self.popped} popped']
+        for rule, calls, seconds in self.rules():
+            lines.append(f'{seconds:12.6f}s {calls:9d}  {rule}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (f'<ParseProfile reductions={self.reductions} shifts={self.shifts} '
+                f'fetches={self.fetches} errors={self.errors} seconds={self.seconds:.6f}>')
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -230,8 +371,12 @@ class LRParser:
         self.action = lrtab.lr_action
         self.goto = lrtab.lr_goto
         self.errorfunc = errorf
+        self.compact_tables = None
         self.set_defaulted_states()
         self.errorok = True
+        self.positions = None
+        self.lines = None
+        self.profile = None
 
     def errok(self):
         self.errorok = True
@@ -243,6 +388,27 @@ class LRParser:
         sym.type = '$end'
         self.symstack.append(sym)
         self.statestack.append(0)
+        if self.positions is not None:
+            del self.positions[:]
+            self.positions.append(0)
+
+    # Clone the parser.  The copy shares the (read-only) tables with the original, so it
+    # is cheap to create one per thread or per object.  If module is given, the grammar
+    # rule functions and p_error are rebound to the ones of module (an instance, class
+    # or dictionary), just like Lexer.clone() does for token rules.
+    def clone(self, module=None):
+        c = copy.copy(self)
+        if module is not None:
+            if isinstance(module, dict):
+                pdict = module
+            else:
+                pdict = {k: getattr(module, k) for k in dir(module)}
+            c.productions = [MiniProduction(p.str, p.name, p.len, p.func, p.file, p.line)
+                             for p in self.productions]
+            for p in c.productions:
+                p.bind(pdict)
+            c.errorfunc = pdict.get('p_error')
+        return c
 
     # Defaulted state support.
     # This method identifies parser states where there is only one possible reduction action.
@@ -258,9 +424,55 @@ class LRParser:
             rules = list(actions.values())
             if len(rules) == 1 and rules[0] < 0:
                 self.defaulted_states[state] = rules[0]
+        if self.compact_tables:
+            self.set_compact_tables()
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
+        if self.compact_tables:
+            self.set_compact_tables()
+
+    # Compact table support.
+    # This method converts the action and goto tables into dense rows of integers
+    # (one array per state) indexed by small symbol numbers instead of symbol names.
+    # Once set, parse() uses them, which needs a single dictionary lookup per token
+    # and none per reduction.  Missing action entries are stored as ERROR_ACTION and
+    # missing goto entries as -1.  States with the same actions (or gotos) share
+    # their row.
+    #
+    # The dictionary tables are kept: parseincremental() and the table files use
+    # them.  For the Go grammar of this repository (270 states, 57 terminals) the
+    # dictionaries take about 125 KB and the dense tables another 95 KB.
+    def set_compact_tables(self):
+        terminals = set()
+        nonterminals = set()
+        for state in self.action:
+            terminals.update(self.action[state])
+            nonterminals.update(self.goto.get(state, ()))
+
+        termindex = {name: n for n, name in enumerate(sorted(terminals))}
+        ntindex = {name: n for n, name in enumerate(sorted(nonterminals))}
+
+        actions = []
+        goto = []
+        rows = {}
+        for state in range(len(self.action)):
+            row = array('i', [ERROR_ACTION]) * (len(termindex) + 1)
+            for name, value in self.action[state].items():
+                row[termindex[name]] = value
+            actions.append(rows.setdefault(('action', row.tobytes()), row))
+
+            row = array('i', [-1]) * len(ntindex)
+            for name, value in self.goto.get(state, {}).items():
+                row[ntindex[name]] = value
+            goto.append(rows.setdefault(('goto', row.tobytes()), row))
+
+        prodgoto = array('i', [ntindex.get(p.name, -1) for p in self.productions])
+        defaulted = array('i', [self.defaulted_states.get(state, 0) for state in range(len(self.action))])
+        self.compact_tables = (termindex, actions, goto, prodgoto, defaulted)
+
+    def disable_compact_tables(self):
+        self.compact_tables = None
 
     # parse().
     #
@@ -268,25 +480,54 @@ class LRParser:
     # Two options are provided.  The debug flag turns on debugging so that you can
     # see the various rule reductions and parsing steps.  tracking turns on position
     # tracking.  In this mode, symbols will record the starting/ending line number and
-    # character index.
+    # character index.  positions is a cheaper alternative: only the starting character
+    # index of each symbol is kept, in an array alongside the stack (self.positions), and
+    # p.lexpos(n), p.lineno(n) and p.position(n) look it up.  Line numbers and columns
+    # are only worked out, from a LineIndex over the input (self.lines), when asked for.
+    # profile counts the reductions of each production and the time spent in its rule
+    # function, along with shifts, token fetches and error recovery, in a ParseProfile
+    # that is left in self.profile (give a ParseProfile to add to it).
+    #
+    # The same loop runs on the dictionary tables and, once set_compact_tables() has
+    # been called, on the dense ones.  They only differ in how an action, a goto and a
+    # defaulted state are looked up.
 
-    def parse(self, input=None, lexer=None, debug=False, tracking=False):
+    def parse(self, input=None, lexer=None, debug=False, tracking=False, positions=False, profile=False):
         # If debugging has been specified as a flag, turn it into a logging object
         if isinstance(debug, int) and debug:
             debug = PlyLogger(sys.stderr)
 
         lookahead = None                         # Current lookahead symbol
         lookaheadstack = []                      # Stack of lookahead symbols
-        actions = self.action                    # Local reference to action table (to avoid lookup on self.)
-        goto    = self.goto                      # Local reference to goto table (to avoid lookup on self.)
         prod    = self.productions               # Local reference to production list (to avoid lookup on self.)
-        defaulted_states = self.defaulted_states # Local reference to defaulted states
         pslice  = YaccProduction(None)           # Production object passed to grammar rules
         errorcount = 0                           # Used during error recovery
 
+        # Local references to the tables (to avoid lookup on self.).  The dense tables are
+        # indexed by symbol numbers, the dictionaries by symbol names.
+        compact = self.compact_tables
+        if compact:
+            termindex, actions, goto, prodgoto, defaulted_states = compact
+            unknown = len(termindex)             # Column for token types not in the grammar
+        else:
+            actions = self.action
+            goto    = self.goto
+            prodgoto = [p.name for p in prod]    # Goto column of each production
+            defaulted_states = self.defaulted_states
+
         if debug:
             debug.info('PLY: PARSE DEBUG START')
 
+        # The rule functions are called through wrappers that time them
+        if profile:
+            if not isinstance(profile, ParseProfile):
+                profile = ParseProfile(prod)
+            self.profile = profile
+            prod = profile.bind(prod)
+            started = time.perf_counter()
+        else:
+            self.profile = None
+
         # If no lexer was given, we will try to use the lex module
         if not lexer:
             from . import lex
@@ -308,6 +549,17 @@ class LRParser:
         symstack = self.symstack = []       # Stack of grammar symbols
         pslice.stack = symstack             # Put in the production
         errtoken   = None                   # Err token
+        errsync    = None                   # Token the last error symbol was made for
+        errdepth   = 0                      # and the depth of the stack when it was made
+
+        # Starting lex position of every symbol on the stack
+        if positions:
+            from .lex import LineIndex
+            posstack = self.positions = pslice.positions = array('q', [0])
+            self.lines = pslice.lines = LineIndex(lexer.lexdata)
+        else:
+            posstack = self.positions = pslice.positions = None
+            self.lines = None
 
         # The start state is assumed to be (0,$end)
 
@@ -324,10 +576,16 @@ class LRParser:
             if debug:
                 debug.debug('State  : %s', state)
 
-            if state not in defaulted_states:
+            if compact:
+                t = defaulted_states[state]
+            else:
+                t = defaulted_states.get(state, 0)
+            if not t:
                 if not lookahead:
                     if not lookaheadstack:
                         lookahead = get_token()     # Get the next token
+                        if profile:
+                            profile.fetches += 1
                     else:
                         lookahead = lookaheadstack.pop()
                     if not lookahead:
@@ -335,39 +593,44 @@ class LRParser:
                         lookahead.type = '$end'
 
                 # Check the action table
-                ltype = lookahead.type
-                t = actions[state].get(ltype)
-            else:
-                t = defaulted_states[state]
-                if debug:
-                    debug.debug('Defaulted state %s: Reduce using %d', state, -t)
+                if compact:
+                    t = actions[state][termindex.get(lookahead.type, unknown)]
+                else:
+                    t = actions[state].get(lookahead.type, ERROR_ACTION)
+            elif debug:
+                debug.debug('Defaulted state %s: Reduce using %d', state, -t)
 
             if debug:
                 debug.debug('Stack  : %s',
                             ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())
 
-            if t is not None:
-                if t > 0:
-                    # shift a symbol on the stack
-                    statestack.append(t)
-                    state = t
-
-                    if debug:
-                        debug.debug('Action : Shift and goto state %s', t)
-
-                    symstack.append(lookahead)
-                    lookahead = None
+            if t > 0:
+                # shift a symbol on the stack
+                statestack.append(t)
+                state = t
 
-                    # Decrease error count on successful shift
-                    if errorcount:
-                        errorcount -= 1
-                    continue
+                if debug:
+                    debug.debug('Action : Shift and goto state %s', t)
+                if profile:
+                    profile.shifts += 1
+
+                symstack.append(lookahead)
+                if positions:
+                    posstack.append(lookahead.lexpos)
+                lookahead = None
+
+                # Decrease error count on successful shift
+                if errorcount:
+                    errorcount -= 1
+                continue
 
+            if t != ERROR_ACTION:
                 if t < 0:
                     # reduce a symbol on the stack, emit a production
                     p = prod[-t]
                     pname = p.name
                     plen  = p.len
+                    pgoto = prodgoto[-t]
 
                     # Get production function
                     sym = YaccSymbol()
@@ -378,10 +641,10 @@ class LRParser:
                         if plen:
                             debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str,
                                        '['+','.join([format_stack_entry(_v.value) for _v in symstack[-plen:]])+']',
-                                       goto[statestack[-1-plen]][pname])
+                                       goto[statestack[-1-plen]][pgoto])
                         else:
                             debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str, [],
-                                       goto[statestack[-1]][pname])
+                                       goto[statestack[-1]][pgoto])
 
                     if plen:
                         targ = symstack[-plen-1:]
@@ -395,6 +658,10 @@ class LRParser:
                             sym.endlineno = getattr(t1, 'endlineno', t1.lineno)
                             sym.endlexpos = getattr(t1, 'endlexpos', t1.lexpos)
 
+                        if positions:
+                            pslice.base = len(posstack) - plen - 1
+                            pslice.start = start = posstack[-plen]
+
                         # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
                         # The code enclosed in this section is duplicated
                         # below as a performance optimization.  Make sure
@@ -408,16 +675,22 @@ class LRParser:
                             self.state = state
                             p.callable(pslice)
                             del statestack[-plen:]
+                            if positions:
+                                del posstack[-plen:]
+                                posstack.append(start)
                             if debug:
                                 debug.info('Result : %s', format_result(pslice[0]))
                             symstack.append(sym)
-                            state = goto[statestack[-1]][pname]
+                            state = goto[statestack[-1]][pgoto]
                             statestack.append(state)
                         except SyntaxError:
                             # If an error was set. Enter error recovery state
                             lookaheadstack.append(lookahead)    # Save the current lookahead token
                             symstack.extend(targ[1:-1])         # Put the production slice back on the stack
                             statestack.pop()                    # Pop back one state (before the reduce)
+                            if positions:
+                                posstack.pop()
+                                sym.lexpos = start
                             state = statestack[-1]
                             sym.type = 'error'
                             sym.value = 'error'
@@ -433,6 +706,10 @@ class LRParser:
                             sym.lineno = lexer.lineno
                             sym.lexpos = lexer.lexpos
 
+                        if positions:
+                            start = getattr(lookahead, 'lexpos', lexer.lexpos) if lookahead else lexer.lexpos
+                            pslice.start = start
+
                         targ = [sym]
 
                         # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
@@ -449,12 +726,14 @@ class LRParser:
                             if debug:
                                 debug.info('Result : %s', format_result(pslice[0]))
                             symstack.append(sym)
-                            state = goto[statestack[-1]][pname]
+                            state = goto[statestack[-1]][pgoto]
                             statestack.append(state)
                         except SyntaxError:
                             # If an error was set. Enter error recovery state
                             lookaheadstack.append(lookahead)    # Save the current lookahead token
                             statestack.pop()                    # Pop back one state (before the reduce)
+                            if positions:
+                                sym.lexpos = start
                             state = statestack[-1]
                             sym.type = 'error'
                             sym.value = 'error'
@@ -464,121 +743,270 @@ class LRParser:
 
                         continue
 
-                if t == 0:
-                    n = symstack[-1]
-                    result = getattr(n, 'value', None)
+                # t == 0: accept
+                n = symstack[-1]
+                result = getattr(n, 'value', None)
 
-                    if debug:
-                        debug.info('Done   : Returning %s', format_result(result))
-                        debug.info('PLY: PARSE DEBUG END')
+                if debug:
+                    debug.info('Done   : Returning %s', format_result(result))
+                    debug.info('PLY: PARSE DEBUG END')
+                if profile:
+                    profile.seconds += time.perf_counter() - started
 
-                    return result
+                return result
 
-            if t is None:
+            if debug:
+                debug.error('Error  : %s',
+                            ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())
 
-                if debug:
-                    debug.error('Error  : %s',
-                                ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())
-
-                # We have some kind of parsing error here.  To handle
-                # this, we are going to push the current token onto
-                # the tokenstack and replace it with an 'error' token.
-                # If there are any synchronization rules, they may
-                # catch it.
-                #
-                # In addition to pushing the error token, we call call
-                # the user defined p_error() function if this is the
-                # first syntax error.  This function is only called if
-                # errorcount == 0.
-                if errorcount == 0 or self.errorok:
-                    errorcount = error_count
-                    self.errorok = False
-                    errtoken = lookahead
-                    if errtoken.type == '$end':
-                        errtoken = None               # End of file!
-                    if self.errorfunc:
-                        if errtoken and not hasattr(errtoken, 'lexer'):
-                            errtoken.lexer = lexer
-                        self.state = state
-                        tok = self.errorfunc(errtoken)
-                        if self.errorok:
-                            # User must have done some kind of panic
-                            # mode recovery on their own.  The
-                            # returned token is the next lookahead
-                            lookahead = tok
-                            errtoken = None
-                            continue
-                    else:
-                        if errtoken:
-                            if hasattr(errtoken, 'lineno'):
-                                lineno = lookahead.lineno
-                            else:
-                                lineno = 0
-                            if lineno:
-                                sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, errtoken.type))
-                            else:
-                                sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
+            # We have some kind of parsing error here.  To handle
+            # this, we are going to push the current token onto
+            # the tokenstack and replace it with an 'error' token.
+            # If there are any synchronization rules, they may
+            # catch it.
+            #
+            # In addition to pushing the error token, we call call
+            # the user defined p_error() function if this is the
+            # first syntax error.  This function is only called if
+            # errorcount == 0.
+            if errorcount == 0 or self.errorok:
+                errorcount = error_count
+                self.errorok = False
+                if profile:
+                    profile.errors += 1
+                errtoken = lookahead
+                if errtoken.type == '$end':
+                    errtoken = None               # End of file!
+                if self.errorfunc:
+                    if errtoken and not hasattr(errtoken, 'lexer'):
+                        errtoken.lexer = lexer
+                    self.state = state
+                    tok = self.errorfunc(errtoken)
+                    if self.errorok:
+                        # User must have done some kind of panic
+                        # mode recovery on their own.  The
+                        # returned token is the next lookahead
+                        lookahead = tok
+                        errtoken = None
+                        continue
+                else:
+                    if errtoken:
+                        if hasattr(errtoken, 'lineno'):
+                            lineno = lookahead.lineno
                         else:
-                            sys.stderr.write('yacc: Parse error in input. EOF\n')
-                            return
+                            lineno = 0
+                        if lineno:
+                            sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, errtoken.type))
+                        else:
+                            sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
+                    else:
+                        sys.stderr.write('yacc: Parse error in input. EOF\n')
+                        if profile:
+                            profile.seconds += time.perf_counter() - started
+                        return
 
-                else:
-                    errorcount = error_count
+            else:
+                errorcount = error_count
+
+            # case 1:  the statestack only has 1 entry on it.  If we're in this state, the
+            # entire parse has been rolled back and we're completely hosed.   The token is
+            # discarded and we just keep going.
+
+            if len(statestack) <= 1 and lookahead.type != '$end':
+                if profile:
+                    profile.discarded += 1
+                lookahead = None
+                errtoken = None
+                state = 0
+                # Nuke the pushback stack
+                del lookaheadstack[:]
+                continue
 
-                # case 1:  the statestack only has 1 entry on it.  If we're in this state, the
-                # entire parse has been rolled back and we're completely hosed.   The token is
-                # discarded and we just keep going.
+            # case 2: the statestack has a couple of entries on it, but we're
+            # at the end of the file. nuke the top entry and generate an error token
 
-                if len(statestack) <= 1 and lookahead.type != '$end':
+            # Start nuking entries on the stack
+            if lookahead.type == '$end':
+                # Whoa. We're really hosed here. Bail out
+                if profile:
+                    profile.seconds += time.perf_counter() - started
+                return
+
+            if lookahead.type != 'error':
+                sym = symstack[-1]
+                if sym.type == 'error' or (lookahead is errsync and len(statestack) >= errdepth):
+                    # Hmmm. Error is on top of stack, or the rules reducing
+                    # the error symbol made for this token got no further
+                    # (another one would loop).  We'll just nuke input
+                    # symbol and continue
+                    if tracking and sym.type == 'error':
+                        sym.endlineno = getattr(lookahead, 'lineno', sym.lineno)
+                        sym.endlexpos = getattr(lookahead, 'lexpos', sym.lexpos)
+                    if profile:
+                        profile.discarded += 1
                     lookahead = None
-                    errtoken = None
-                    state = 0
-                    # Nuke the pushback stack
-                    del lookaheadstack[:]
                     continue
 
-                # case 2: the statestack has a couple of entries on it, but we're
-                # at the end of the file. nuke the top entry and generate an error token
+                # Create the error symbol for the first time and make it the new lookahead symbol
+                t = YaccSymbol()
+                t.type = 'error'
+
+                if hasattr(lookahead, 'lineno'):
+                    t.lineno = t.endlineno = lookahead.lineno
+                if hasattr(lookahead, 'lexpos'):
+                    t.lexpos = t.endlexpos = lookahead.lexpos
+                t.value = errsync = lookahead
+                errdepth = len(statestack)
+                if profile:
+                    profile.errsyms += 1
+                lookaheadstack.append(lookahead)
+                lookahead = t
+            else:
+                if profile:
+                    profile.popped += 1
+                sym = symstack.pop()
+                if tracking:
+                    lookahead.lineno = sym.lineno
+                    lookahead.lexpos = sym.lexpos
+                if positions:
+                    lookahead.lexpos = posstack.pop()
+                statestack.pop()
+                state = statestack[-1]
 
-                # Start nuking entries on the stack
-                if lookahead.type == '$end':
-                    # Whoa. We're really hosed here. Bail out
-                    return
+            continue
 
-                if lookahead.type != 'error':
-                    sym = symstack[-1]
-                    if sym.type == 'error':
-                        # Hmmm. Error is on top of stack, we'll just nuke input
-                        # symbol and continue
-                        if tracking:
-                            sym.endlineno = getattr(lookahead, 'lineno', sym.lineno)
-                            sym.endlexpos = getattr(lookahead, 'lexpos', sym.lexpos)
-                        lookahead = None
-                        continue
+    # parseincremental().
+    #
+    # Parses a list of tokens and returns a ParseLog with the result, or None on a
+    # syntax error (use parse() to recover from and report errors).  Given the log
+    # of the previous parse and changes = (first, oldstop, newstop) as returned by
+    # Lexer.relex(), the parse resumes from the last stack the previous parse had
+    # when it read a token up to tokens[first].  A subtree of the previous parse is
+    # pushed as a whole whenever its tokens and the token after it are unchanged
+    # and the parser is in the state the subtree was started from.  The values of
+    # reused subtrees are not built again, so grammar rules must not have side
+    # effects that later rules depend on.  Error recovery, tracking and debugging
+    # are not supported.
+
+    def parseincremental(self, tokens, log=None, changes=None):
+        actions = self.action
+        goto = self.goto
+        prod = self.productions
+        defaulted_states = self.defaulted_states
+        pslice = YaccProduction(None)
+        pslice.parser = self
+
+        ntokens = len(tokens)
+        stacks = [None] * (ntokens + 1)
+        spans = [None] * (ntokens + 1)
+        new = ParseLog(tokens, stacks, spans)
+
+        end = YaccSymbol()
+        end.type = '$end'
+        stack = (0, end, 0, None)
+        k = 0
+
+        # Old reductions can be reused before first (if they end before it) and from newstop on
+        first = shift = 0
+        newstop = ntokens + 1
+        oldspans = ()
+        if log is not None and changes is not None:
+            first, oldstop, newstop = changes
+            oldspans = log.spans
+            shift = oldstop - newstop
+
+            k = min(first, len(log.stacks) - 1)
+            while k and log.stacks[k] is None:
+                k -= 1
+            if log.stacks[k] is not None:
+                stack = log.stacks[k]
+                stacks[:k] = log.stacks[:k]
+                spans[:k] = log.spans[:k]
+
+                # Reductions done after tokens[k] was read are done again
+                node = stack
+                while node is not None:
+                    start = node[2]
+                    if start < k and spans[start] is not None:
+                        spans[start] = [span for span in spans[start] if start + span[1] < k]
+                    node = node[3]
+            else:
+                k = 0
 
-                    # Create the error symbol for the first time and make it the new lookahead symbol
-                    t = YaccSymbol()
-                    t.type = 'error'
-
-                    if hasattr(lookahead, 'lineno'):
-                        t.lineno = t.endlineno = lookahead.lineno
-                    if hasattr(lookahead, 'lexpos'):
-                        t.lexpos = t.endlexpos = lookahead.lexpos
-                    t.value = lookahead
-                    lookaheadstack.append(lookahead)
-                    lookahead = t
+        lookahead = None
+        while True:
+            state = stack[0]
+
+            # Push the longest subtree of the previous parse started from this state
+            if k < first or k >= newstop:
+                oldk = k if k < first else k + shift
+                old = oldspans[oldk] or ()
+                for i in range(len(old) - 1, -1, -1):
+                    sym, length, left = old[i]
+                    if left == state and length and (k >= newstop or k + length < first):
+                        spans[k] = [span for span in old[:i + 1] if span[2] == left]
+                        spans[k + 1:k + length] = oldspans[oldk + 1:oldk + length]
+                        stack = (goto[state][sym.type], sym, k, stack)
+                        if k >= newstop:
+                            new.moved.append(sym)
+                        k += length
+                        lookahead = None
+                        new.reused += 1
+                        break
                 else:
-                    sym = symstack.pop()
-                    if tracking:
-                        lookahead.lineno = sym.lineno
-                        lookahead.lexpos = sym.lexpos
-                    statestack.pop()
-                    state = statestack[-1]
+                    old = None
+                if old is not None:
+                    continue
 
+            t = defaulted_states.get(state)
+            if t is None:
+                if lookahead is None:
+                    stacks[k] = stack
+                    lookahead = tokens[k] if k < ntokens else end
+                t = actions[state].get(lookahead.type)
+                if t is None:
+                    return None
+
+            if t > 0:
+                # shift a token
+                stack = (t, lookahead, k, stack)
+                k += 1
+                lookahead = None
+                new.shifted += 1
+                continue
+
+            if t < 0:
+                # reduce a symbol on the stack
+                p = prod[-t]
+                sym = YaccSymbol()
+                sym.type = p.name
+                sym.value = None
+
+                targ = [sym] * (p.len + 1)
+                below = stack
+                start = k
+                for i in range(p.len, 0, -1):
+                    targ[i] = below[1]
+                    start = below[2]
+                    below = below[3]
+
+                pslice.slice = targ
+                try:
+                    p.callable(pslice)
+                except SyntaxError:
+                    return None
+                new.reduced += 1
+
+                left = below[0]
+                if spans[start] is None:
+                    spans[start] = []
+                spans[start].append((sym, k - start, left))
+                stack = (goto[left][p.name], sym, start, below)
                 continue
 
-            # If we'r here, something really bad happened
-            raise RuntimeError('yacc: internal parser error!!!\n')
+            # accept
+            new.result = stack[1].value
+            return new
 
 # -----------------------------------------------------------------------------
 #                          === Grammar Representation ===
@@ -682,6 +1110,35 @@ class Production(object):
         if self.func:
             self.callable = pdict[self.func]
 
+# -----------------------------------------------------------------------------
+# class MiniProduction:
+#
+# This class is a stripped-down production used when the parsing tables are
+# loaded from a cache file instead of being generated from the grammar.  It only
+# holds the information that the LR parsing engine needs at runtime.
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
 # -----------------------------------------------------------------------------
 # class LRItem
 #
@@ -1300,6 +1757,138 @@ def traverse(x, N, stack, F, X, R, FP):
 class LALRError(YaccError):
     pass
 
+# Exception raised when a cached table file was written by an incompatible version
+class VersionError(YaccError):
+    pass
+
+# -----------------------------------------------------------------------------
+# table_signature()
+#
+# Returns the key under which the parsing tables of a grammar are cached.  It is
+# a hash of the grammar signature (start symbol, precedence, tokens and the
+# docstrings of all p_ functions) together with the PLY version, so that any
+# change to the grammar or to PLY itself invalidates a previously cached table.
+# -----------------------------------------------------------------------------
+
+def table_signature(signature):
+    return hashlib.sha256(('%s:%s' % (__version__, signature)).encode('utf-8')).hexdigest()
+
+# -----------------------------------------------------------------------------
+# grammar_signature()
+#
+# Returns the same grammar signature as ParserReflect.signature() straight from
+# the dictionary of a module, without the validation and the lookups of the
+# source modules of get_all().  It is meant to check that tables built ahead of
+# time still match the grammar every time a program starts.  Rules defined on
+# the same line of different modules may be taken in another order, which only
+# makes the tables look out of date.
+# -----------------------------------------------------------------------------
+
+def grammar_signature(pdict):
+    parts = []
+    start = pdict.get('start')
+    if isinstance(start, str) and start:
+        parts.append(start)
+    prec = pdict.get('precedence')
+    if prec:
+        try:
+            parts.append(''.join([''.join(p) for p in prec]))
+        except TypeError:
+            return None
+    tokens = pdict.get('tokens')
+    if tokens:
+        try:
+            parts.append(' '.join(sorted(tokens)))
+        except TypeError:
+            return None
+    p_functions = []
+    for name, item in pdict.items():
+        if name.startswith('p_') and name != 'p_error' and isinstance(item, (types.FunctionType, types.MethodType)):
+            p_functions.append((item.__code__.co_firstlineno, item.__module__ or '', name, item.__doc__))
+    p_functions.sort(key=lambda p_function: (p_function[0], p_function[1], p_function[2], p_function[3] or ''))
+    parts.extend(doc for line, module, name, doc in p_functions if doc)
+    return ''.join(parts)
+
+# -----------------------------------------------------------------------------
+#                          == LoadedLRTable ==
+#
+# This class holds LR parsing tables that were read back from a cache file.  It
+# provides the same lr_productions, lr_action and lr_goto attributes as LRTable,
+# so it can be handed directly to LRParser.
+# -----------------------------------------------------------------------------
+
+class LoadedLRTable:
+    def __init__(self):
+        self.lr_action = None
+        self.lr_goto = None
+        self.lr_productions = None
+
+    # Read the tables from a file written by LRTable.write_pickle().  Returns the
+    # signature that was stored with the tables.
+    def read_pickle(self, filename):
+        with open(filename, 'rb') as in_f:
+            tabversion = pickle.load(in_f)
+            if tabversion != __tabversion__:
+                raise VersionError('yacc table file version is out of date')
+            signature = pickle.load(in_f)
+            self.lr_action = pickle.load(in_f)
+            self.lr_goto = pickle.load(in_f)
+            productions = pickle.load(in_f)
+
+        self.lr_productions = [MiniProduction(*p) for p in productions]
+        return signature
+
+    # Read the tables from a module generated by LRTable.write_module().  The
+    # action and goto tables are stored there in compressed sparse row form:
+    # the entries for state s are found at positions ptr[s] through ptr[s+1]-1
+    # of the parallel symbol and value arrays.  Returns the stored signature.
+    def read_module(self, module):
+        if module._tabversion != __tabversion__:
+            raise VersionError('yacc table file version is out of date')
+
+        def expand(symbols, ptr, sym, val):
+            table = {}
+            for state in range(len(ptr) - 1):
+                table[state] = {symbols[sym[i]]: val[i] for i in range(ptr[state], ptr[state+1])}
+            return table
+
+        self.lr_action = expand(module._lr_terminals, module._lr_action_ptr,
+                                module._lr_action_sym, module._lr_action_val)
+        self.lr_goto = expand(module._lr_nonterminals, module._lr_goto_ptr,
+                              module._lr_goto_sym, module._lr_goto_val)
+        self.lr_productions = [MiniProduction(*p) for p in module._lr_productions]
+        return module._lr_signature
+
+    # Bind all production function names to callable objects in pdict
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
+    # Return a parser that uses these tables with the grammar rule functions of
+    # module (a module, an instance or a dictionary).  The functions are looked up
+    # by name, so none of the grammar reflection done by yacc() takes place.  The
+    # tables are shared read-only between all of the parsers made this way.  If
+    # check is set, the docstrings of the rule functions are compared against the
+    # signature of the tables and VersionError is raised if they do not match
+    # (see grammar_signature(), the grammar is not validated again).
+    def parser(self, module, signature=None, check=False):
+        if isinstance(module, dict):
+            pdict = module
+        else:
+            pdict = {k: getattr(module, k) for k in dir(module)}
+
+        if check:
+            if table_signature(grammar_signature(pdict)) != signature:
+                raise VersionError('yacc tables do not match the grammar')
+
+        lr = LoadedLRTable()
+        lr.lr_action = self.lr_action
+        lr.lr_goto = self.lr_goto
+        lr.lr_productions = [MiniProduction(p.str, p.name, p.len, p.func, p.file, p.line)
+                             for p in self.lr_productions]
+        lr.bind_callables(pdict)
+        return LRParser(lr, pdict.get('p_error'))
+
 
 # -----------------------------------------------------------------------------
 #                             == LRTable ==
@@ -1345,6 +1934,96 @@ class LRTable:
         for p in self.lr_productions:
             p.bind(pdict)
 
+    # Write the tables to a file that can be read back by LoadedLRTable.  The
+    # file is written to a temporary name first and then moved into place so
+    # that concurrent readers never observe a partially written cache.
+    def write_pickle(self, filename, signature=''):
+        productions = [(p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line)
+                       for p in self.lr_productions]
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            with open(tmpname, 'wb') as outf:
+                pickle.dump(__tabversion__, outf, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(signature, outf, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self.lr_action, outf, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self.lr_goto, outf, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(productions, outf, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    # Write the tables as a standalone Python module.  Importing the module and
+    # calling its parser() function gives a working parser without having to
+    # run yacc(), which is useful for short-lived processes with big grammars.
+    def write_module(self, modulename, outputdir='', signature=''):
+        basemodulename = modulename.split('.')[-1]
+        filename = os.path.join(outputdir, basemodulename) + '.py'
+
+        terminals = ['$end'] + list(self.grammar.Terminals)
+        nonterminals = list(self.grammar.Nonterminals)
+
+        def compress(table, symbols):
+            index = {name: n for n, name in enumerate(symbols)}
+            ptr, sym, val = [0], [], []
+            for state in range(len(table)):
+                for name, value in sorted(table[state].items(), key=lambda item: index[item[0]]):
+                    sym.append(index[name])
+                    val.append(value)
+                ptr.append(len(sym))
+            return ptr, sym, val
+
+        def intarray(values):
+            lines = []
+            for i in range(0, len(values), 20):
+                lines.append('    ' + ', '.join(str(v) for v in values[i:i+20]) + ',')
+            return "array('i', [\n%s\n])" % '\n'.join(lines)
+
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            with open(tmpname, 'w') as f:
+                f.write('''# %s
+# This file is automatically generated by PLY %s. Don't edit!
+from array import array
+import sys
+
+_tabversion = %r
+_lr_signature = %r
+
+''' % (os.path.basename(filename), __version__, __tabversion__, signature))
+
+                f.write('_lr_terminals = %r\n\n' % (tuple(terminals),))
+                f.write('_lr_nonterminals = %r\n\n' % (tuple(nonterminals),))
+
+                for name, table, symbols in (('action', self.lr_action, terminals),
+                                             ('goto', self.lr_goto, nonterminals)):
+                    ptr, sym, val = compress(table, symbols)
+                    f.write('_lr_%s_ptr = %s\n\n' % (name, intarray(ptr)))
+                    f.write('_lr_%s_sym = %s\n\n' % (name, intarray(sym)))
+                    f.write('_lr_%s_val = %s\n\n' % (name, intarray(val)))
+
+                f.write('_lr_productions = (\n')
+                for p in self.lr_productions:
+                    f.write('    (%r, %r, %d, %r, %r, %d),\n' % (p.str, p.name, p.len, p.func,
+                                                              os.path.basename(p.file) if p.file else None,
+                                                              p.line))
+                f.write(')\n')
+
+                f.write('''
+from ply.yacc import LoadedLRTable
+
+_lr_tables = LoadedLRTable()
+_lr_tables.read_module(sys.modules[__name__])
+
+# Return a parser bound to the grammar rule functions found in module
+def parser(module, check=False):
+    return _lr_tables.parser(module, _lr_signature, check)
+''')
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
     # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
 
     def lr0_closure(self, I):
@@ -2270,7 +2949,8 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, picklefile=None, tabmodule=None,
+         outputdir=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +2983,22 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # If a table cache file was given, try to use it.  The cached tables are only
+    # used if they were built from exactly the same grammar and PLY version.
+    if picklefile:
+        signature = table_signature(pinfo.signature())
+        try:
+            lr = LoadedLRTable()
+            if lr.read_pickle(picklefile) == signature:
+                lr.bind_callables(pinfo.pdict)
+                parser = LRParser(lr, pinfo.error_func)
+                parse = parser.parse
+                return parser
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            errorlog.warning('Unable to use table cache %r. %s', picklefile, e)
+
     if debuglog is None:
         if debug:
             try:
@@ -2474,6 +3170,23 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Save the tables so that the next run can skip table generation
+    if picklefile:
+        try:
+            lr.write_pickle(picklefile, signature)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s", picklefile, e)
+
+    # Write the tables as a standalone module if requested
+    if tabmodule:
+        if outputdir is None:
+            srcfile = pdict.get('__file__')
+            outputdir = os.path.dirname(srcfile) if srcfile else ''
+        try:
+            lr.write_module(tabmodule, outputdir, table_signature(pinfo.signature()))
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s", tabmodule, e)
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
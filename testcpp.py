@@ -0,0 +1,51 @@
+# testcpp.py
+#
+# Tests of the preprocessor in cpp_ply.py
+
+import unittest
+
+import ply.lex as lex
+import cpp_ply
+
+
+class CPPTests(unittest.TestCase):
+    def preprocess(self, source, lexer=None):
+        """output text and errors of the preprocessor on source"""
+        preprocessor = cpp_ply.Preprocessor(lexer or lex.lex(module=cpp_ply))
+        errors = []
+        preprocessor.error = lambda file, line, msg: errors.append((file, line, msg))
+        preprocessor.parse(source, 'test.c')
+        values = []
+        while True:
+            tok = preprocessor.token()
+            if not tok:
+                break
+            values.append(tok.value)
+        return ''.join(values), errors
+
+    def test_line_numbers(self):
+        # lineno comes from the line index of the lexer, the token rules don't count lines
+        source = "int a;\n/* c\nc */\nint b = __LINE__;\n#if 1\nint c = __LINE__;\n#endif\n#elif 1\n"
+        for lexer in (lex.lex(module=cpp_ply), lex.lex(module=cpp_ply, linestarts=True)):
+            output, errors = self.preprocess(source, lexer)
+            self.assertEqual(output.split(), ['int', 'a;', 'int', 'b', '=', '4;', 'int', 'c', '=', '6;'])
+            self.assertEqual(errors, [('test.c', 8, 'Misplaced #elif')])
+
+    def test_lexer_not_changed(self):
+        # the lexer given is cloned to turn linestarts on, one that has it is used as it is
+        lexer = lex.lex(module=cpp_ply)
+        preprocessor = cpp_ply.Preprocessor(lexer)
+        self.assertFalse(lexer.lexlinestarts)
+        self.assertIsNot(preprocessor.lexer, lexer)
+        self.assertTrue(preprocessor.lexer.lexlinestarts)
+        lexer = lex.lex(module=cpp_ply, linestarts=True)
+        self.assertIs(cpp_ply.Preprocessor(lexer).lexer, lexer)
+
+    def test_macros(self):
+        output, errors = self.preprocess('#define ADD(a, b) ((a) + (b))\n"x\\ny"\nint x = ADD(1, 2);\n')
+        self.assertEqual(output.split(), ['"x\\ny"', 'int', 'x', '=', '((1)', '+', '(2));'])
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
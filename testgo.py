@@ -0,0 +1,712 @@
+# testgo.py
+#
+# Tests of the Go front end in Golang_1130.py
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+from Golang_1130 import GoParser, backends, main
+import go_bench
+from go_ast import Node, Interner, position
+from go_cache import ResultCache
+from go_closure import compile_closures
+from go_eval import Evaluator, GoError, LoopBudget, SymbolTable
+from go_fold import fold_constants
+from go_types import check_types
+from go_vm import VM, compile_program, disassemble
+
+
+def program(*lines, globals_=()):
+    """source of a program with the given statements in main"""
+    source = 'package main\n\nimport "fmt"\n\n'
+    source += ''.join(line + '\n' for line in globals_)
+    return source + '\nfunc main() {\n' + ''.join('    ' + line + '\n' for line in lines) + '}\n'
+
+
+def messages(diagnostics):
+    return [d.message for d in diagnostics]
+
+
+def results(runner):
+    """print_list and diagnostics of a backend after a run"""
+    return runner.print_list, [(d.lexpos, d.code, d.message) for d in runner.diagnostics]
+
+
+def nodes(tree, positions=None):
+    """(type, lineno, lexpos) of every node of tree, in preorder"""
+    if isinstance(tree, tuple):
+        for item in tree:
+            yield from nodes(item, positions)
+    elif isinstance(tree, Node):
+        yield (type(tree).__name__, ) + position(tree, positions)
+        for name in tree._fields:
+            yield from nodes(getattr(tree, name), positions)
+
+
+# programs that run, most of them with errors
+programs = {
+    'features': program(
+        'var x int = 3', 'y := 0',
+        'for i := 0; i < 10; i++ {', '    if i % 2 == 0 {', '        y += i', '        continue',
+        '    } else if i == 7 {', '        break', '    } else {', '        fmt.Println("odd", i)', '    }', '}',
+        'fmt.Println(x, y, g, c)',
+        'switch x {', 'case 1, 2:', '    fmt.Println("small")', 'case 3:', '    fmt.Println("three")', '    break',
+        'default:', '    fmt.Println("other")', '}',
+        'k := 0', 'for {', '    k++', '    if k >= 5 {', '        break', '    }', '}',
+        'fmt.Println(k, 7 / 2, 7 % 3, -k, "a" + "b", true && !false)',
+        globals_=('var g int = 10', 'const c string = "hi"')),
+    'failed declaration': program(
+        'a := 1', 'if true {', '    var a string = 5', '    fmt.Println(a)', '    a = "x"', '    a++', '}',
+        'fmt.Println(a)'),
+    'failed constant': program('const c int = "s"', 'c = 3', 'fmt.Println(c)', 'd := c + 1', 'fmt.Println(d)'),
+    'undefined value': program('a := 1', 'if true {', '    var a int = zz', '    fmt.Println(a)', '}',
+                               'fmt.Println(a)'),
+    'redeclared': program('a := 1', 'a := zz', 'var a string', 'fmt.Println(a)'),
+    'runtime errors': program(
+        'x := 1', 'x = x / 0', 'y = 2', 'x = "s"', 's := "a" - "b"', 'fmt.Println(x, 5 % 0)', 'fmt.Println(x)'),
+    'errors in loops': program(
+        'for i := 0; i < 3; i++ {', '    fmt.Println(i, zz)', '    q := i / (i - 1)', '    fmt.Println(q)', '}',
+        'for j := 0; j < 2; k++ {', '    fmt.Println(j)', '}', 'for n := zz; n < 2; n++ {', '    fmt.Println(n)', '}'),
+    'dead code': program('if false {', '    fmt.Println(zz)', '}', 'fmt.Println(false && zz == 1, true || zz == 1)'),
+    'shadowing': program(
+        'x := 1', 'for x := 0; x < 2; x++ {', '    x := x + 10', '    fmt.Println(x)', '}', 'if true {',
+        '    x := "in"', '    fmt.Println(x)', '}', 'fmt.Println(x)'),
+    'switches': program(
+        'four := 4', 'for i := 0; i < 6; i++ {', '    switch i {', '    case 1, 3:', '        fmt.Println("odd", i)',
+        '    case 1, 2:', '        fmt.Println("dup", i)', '    case four:', '        fmt.Println("four")',
+        '    default:', '        fmt.Println("default", i)', '    }', '}',
+        'switch "s" {', 'case 1:', '    fmt.Println("int")', '}',
+        'switch 2 {', 'case 1, 2:', '    fmt.Println("first")', 'case 2:', '    fmt.Println("second")', '}',
+        'switch {', 'case zz > 1:', '    fmt.Println("no")', '}'),
+}
+
+
+class GoTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.go_parser = GoParser()
+
+    def parse(self, source):
+        """Program of source, which must parse without errors"""
+        tree = self.go_parser.parse(source)
+        self.assertEqual(messages(self.go_parser.context.diagnostics), [])
+        return tree
+
+
+class EvalTests(GoTestCase):
+    def run_program(self, source):
+        """print_list and error messages of source"""
+        tree = self.parse(source)
+        evaluator = Evaluator()
+        evaluator.run(tree)
+        return evaluator.print_list, messages(evaluator.diagnostics)
+
+    def test_features(self):
+        self.assertEqual(self.run_program(programs['features']),
+                         (['odd 1', 'odd 3', 'odd 5', '3 12 10 hi', 'three', '5 3 1 -5 ab true'], []))
+        self.assertEqual(self.run_program(programs['shadowing']), (['10', '11', 'in', '1'], []))
+
+    def test_errors(self):
+        # a statement with an error is skipped, the ones after it still run
+        print_list, error_list = self.run_program(programs['runtime errors'])
+        self.assertEqual(print_list, ['1'])
+        self.assertEqual(error_list, ['ZeroDivisionError: division by zero', "Error: Undefined identifier 'y'",
+                                      "TypeError: type mismatch 1(<class 'int'>) and s(<class 'str'>)",
+                                      'Error: Invalid operation - is not defined on string',
+                                      'ZeroDivisionError: division by zero'])
+
+    def test_errors_in_loops(self):
+        # an error in the body skips the statement, one in the clauses of the for leaves the loop
+        print_list, error_list = self.run_program(programs['errors in loops'])
+        self.assertEqual(print_list, ['0', '2', '0'])
+        self.assertEqual(error_list, ["Error: Undefined identifier 'zz'", "Error: Undefined identifier 'zz'",
+                                      'ZeroDivisionError: division by zero', "Error: Undefined identifier 'q'",
+                                      "Error: Undefined identifier 'zz'", "Error: Undefined identifier 'k'",
+                                      "Error: Undefined identifier 'zz'"])
+        self.assertEqual(self.run_program(programs['dead code']), (['false true'], []))
+
+    def test_run_again(self):
+        tree = self.parse(programs['runtime errors'])
+        text = repr(tree)
+        evaluator = Evaluator()
+        evaluator.run(tree)
+        first = results(evaluator)
+        evaluator.run(tree)
+        self.assertEqual(results(evaluator), first)
+        self.assertEqual(repr(tree), text)
+
+    def test_parse_errors(self):
+        self.go_parser.parse(programs['shadowing'].replace('import "fmt"', 'import "os"'))
+        self.assertEqual(self.go_parser.context.diagnostics[0].message, "ImportError: 'fmt' is not imported")
+        self.go_parser.parse(program('x := 1 +', 'fmt.Println(x)'))
+        self.assertTrue(self.go_parser.context.is_error)
+        self.assertTrue(self.go_parser.context.diagnostics[0].message.startswith('SyntaxError'))
+
+
+class VMTests(GoTestCase):
+    def run_both(self, source):
+        """print_list and diagnostics of source with the evaluator and with the VM"""
+        tree = self.parse(source)
+        evaluator = Evaluator()
+        evaluator.run(tree)
+        vm = VM()
+        vm.run(compile_program(tree))
+        return results(evaluator), results(vm)
+
+    def test_like_eval(self):
+        for name, source in programs.items():
+            with self.subTest(name):
+                evaluated, executed = self.run_both(source)
+                self.assertEqual(executed, evaluated)
+
+    def test_compile_errors(self):
+        # errors found at compile time are reported where and as often as the statement runs
+        evaluated, executed = self.run_both(programs['errors in loops'])
+        self.assertEqual(executed, evaluated)
+        result = self.go_parser.check(programs['errors in loops'], 'vm')
+        self.assertEqual(result['print_list'], ['0', '2', '0'])
+        self.assertEqual([(d['line'], d['message']) for d in result['diagnostics']],
+                         [(8, "Error: Undefined identifier 'zz'"),
+                          (8, "Error: Undefined identifier 'zz'"),
+                          (9, 'ZeroDivisionError: division by zero'),
+                          (10, "Error: Undefined identifier 'q'"),
+                          (8, "Error: Undefined identifier 'zz'"),
+                          (12, "Error: Undefined identifier 'k'"),
+                          (15, "Error: Undefined identifier 'zz'")])
+        self.assertEqual(self.run_both(programs['dead code'])[1], (['false true'], []))
+        code = compile_program(self.parse(program('fmt.Println(zz)')))
+        self.assertIn('RAISE                 "Error: Undefined identifier \'zz\'"', disassemble(code))
+
+    def test_run_again(self):
+        code = compile_program(self.parse(programs['features']))
+        vm = VM()
+        vm.run(code)
+        first = results(vm)
+        vm.run(code)
+        self.assertEqual(results(vm), first)
+
+    def test_disassemble(self):
+        text = disassemble(compile_program(self.parse(program('x := 7', 'x += 2', 'fmt.Println(x / 2)'))))
+        self.assertEqual([line.split()[1] for line in text.splitlines()],
+                         ['LOAD_CONST', 'CHECK_VALUE', 'STORE_LOCAL', 'LOAD_LOCAL', 'LOAD_CONST', 'INPLACE_ADD',
+                          'STORE_LOCAL', 'LOAD_LOCAL', 'LOAD_CONST', 'BINARY_DIV', 'PRINT', 'HALT'])
+
+
+    def test_failed_declaration(self):
+        # the name stays declared in its block, but undefined
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(programs['failed declaration'], backend)
+                self.assertEqual(result['print_list'], ['1'])
+                self.assertEqual([(d['line'], d['message']) for d in result['diagnostics']],
+                                 [(9, 'TypeError: non string type assigned to string'),
+                                  (10, "Error: Undefined identifier 'a'"),
+                                  (11, "Error: Undefined identifier 'a'"),
+                                  (12, "Error: Undefined identifier 'a'")])
+
+
+class ClosureTests(GoTestCase):
+    def test_like_vm(self):
+        # both compile the program first, so compile time errors are reported alike
+        for name, source in programs.items():
+            with self.subTest(name):
+                tree = self.parse(source)
+                vm = VM()
+                vm.run(compile_program(tree))
+                closures = compile_closures(tree)
+                closures.run()
+                self.assertEqual(results(closures), results(vm))
+
+    def test_run_again(self):
+        closures = compile_closures(self.parse(programs['errors in loops']))
+        closures.run()
+        first = results(closures)
+        closures.run()
+        self.assertEqual(results(closures), first)
+
+    def test_repeated_errors(self):
+        # every statement of a block reports its own line, however alike they are
+        go_parser = GoParser(interner=Interner())
+        source = program('z := 0', 'fmt.Println(1 / z)', 'fmt.Println(1 / z)', 'if z < "s" {', '}',
+                         'fmt.Println(1 / z)')
+        result = go_parser.check(source, 'closure')
+        self.assertEqual([(d['line'], d['message']) for d in result['diagnostics']],
+                         [(8, 'ZeroDivisionError: division by zero'), (9, 'ZeroDivisionError: division by zero'),
+                          (10, 'TypeError: type mismatch 0 and s'), (12, 'ZeroDivisionError: division by zero')])
+        self.assertEqual(result, self.go_parser.check(source, 'eval'))
+
+
+class SymbolTableTests(unittest.TestCase):
+    def test_scopes(self):
+        table = SymbolTable()
+        table.enter_scope()
+        x = table.declare('x', 'int')
+        c = table.declare('c', 'string', const=True)
+        self.assertRaisesRegex(GoError, 'x redeclared', table.declare, 'x')
+        table.enter_scope()
+        inner = table.declare('x')  # shadows the outer x
+        self.assertIs(table.resolve('x'), inner)
+        self.assertIs(table.resolve('c'), c)
+        self.assertRaisesRegex(GoError, 'cannot assign to constant c', table.resolve_assign, 'c')
+        table.leave_scope()
+        self.assertIs(table.resolve('x'), x)
+        self.assertRaisesRegex(GoError, "Undefined identifier 'y'", table.resolve, 'y')
+        self.assertEqual([symbol.slot for symbol in (x, c, inner)], [0, 1, 2])
+        self.assertEqual(table.temp('switch').slot, 3)
+        self.assertRaises(GoError, table.resolve, ' switch')
+
+    def test_blocks(self):
+        # for headers, bodies, if/else and switch cases open blocks of their own in every backend
+        source = program(
+            'x := 1', 'for x := 2; x < 3; x++ {', '    x := 3', '    fmt.Println(x)', '}', 'switch {',
+            'case x == 1:', '    x := "case"', '    fmt.Println(x)', '}', 'if x == 1 {', '    x := 4',
+            '    fmt.Println(x)', '} else {', '    x := 5', '}', 'x := 6', 'fmt.Println(x)')
+        go_parser = GoParser()
+        for backend in backends:
+            result = go_parser.check(source, backend)
+            self.assertEqual(result['print_list'], ['3', 'case', '4', '1'])
+            self.assertEqual(result['error_list'], ['Error: x redeclared in the scope'])
+
+
+class TypeTests(GoTestCase):
+    def test_types(self):
+        tree = self.parse(program('x := 1', 'var s string', 'b := x > 0',
+                                  'fmt.Println(x + 2, s + "a", x == 1, x + s, -x, !(x > 0), b, s - s, zz)'))
+        types = check_types(tree)
+        self.assertEqual([types.get(arg) for arg in tree.body[-1].args],
+                         ['int', 'string', 'bool', None, 'int', 'bool', 'bool', None, None])
+
+    def test_checks_kept(self):
+        # the checks the types don't prove are still made
+        source = program('x := 1', 'var s string = "a"', 'x = s', 's += 1', 'b := x > 0', 'b++', 'x = x / 0',
+                         'fmt.Println(x + s, 9223372036854775807 + x)', 'fmt.Println(x, s, b)')
+        for backend in backends:
+            result = self.go_parser.check(source, backend)
+            self.assertEqual(result, self.go_parser.check(source, 'eval'))
+        self.assertEqual(result['print_list'], ['1 a true'])
+        self.assertEqual(len(result['error_list']), 5)
+
+
+class FoldTests(GoTestCase):
+    def run_all(self, tree):
+        evaluator = Evaluator()
+        evaluator.run(tree)
+        vm = VM()
+        vm.run(compile_program(tree))
+        closures = compile_closures(tree)
+        closures.run()
+        return [results(runner) for runner in (evaluator, vm, closures)]
+
+    def test_folded_like_unfolded(self):
+        for name, source in programs.items():
+            with self.subTest(name):
+                tree = self.parse(source)
+                text = repr(tree)
+                self.assertEqual(self.run_all(fold_constants(tree)), self.run_all(tree))
+                self.assertEqual(repr(tree), text)  # the original is not changed
+
+    def test_folding(self):
+        source = program('const k int = 6', 'x := k * 7 - 2', 'if k > 10 {', '    fmt.Println("dead")', '}',
+                         'fmt.Println(x, "a" + "b")')
+        folded = fold_constants(self.parse(source))
+        self.assertEqual(repr(folded.body[1]), "ShortVarDecl('x', Literal(30))")  # k * (7 - 2)
+        self.assertEqual(len(folded.body), 3)
+        self.assertEqual(repr(folded.body[2].args), "(Name('x'), Literal('ab'))")
+
+    def test_errors_are_not_folded(self):
+        source = program('x := 1 / 0', 'const c int = "s"', 'y := c', 'if false {', '    z := 1', '    z := 2', '}',
+                         'if false {', '    z := zz', '}', 'fmt.Println(9223372036854775807 + 1)')
+        tree = self.parse(source)
+        folded = fold_constants(tree)
+        self.assertEqual(repr(folded.body[0]), repr(tree.body[0]))
+        self.assertEqual(repr(folded.body[2]), "ShortVarDecl('y', Name('c'))")
+        self.assertEqual(repr(folded.body[3]), repr(tree.body[3]))  # dead, but it doesn't compile
+        self.assertEqual(len(folded.body), len(tree.body) - 1)  # undefined names are errors of the run time
+        self.assertEqual(self.run_all(folded), self.run_all(tree))
+
+
+class BudgetTests(GoTestCase):
+    def test_exhausted(self):
+        source = program('x := 0', 'for {', '    x++', '}', 'fmt.Println(x)')
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(source, backend, budget=LoopBudget(max_iterations=1000, interval=64),
+                                              profile_loops=True)
+                self.assertEqual(result['print_list'], [])
+                self.assertEqual(result['error_list'], ['Error: loop at line 8 exceeded the budget of 1000 iterations'])
+                self.assertEqual([(loop['line'], loop['runs'], loop['iterations']) for loop in result['loops']],
+                                 [(8, 1, 1000)])
+
+    def test_time(self):
+        source = program('x := 0', 'for {', '    x++', '}')
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(source, backend, budget=LoopBudget(max_time=0.01))
+                self.assertEqual(result['error_list'], ['Error: loop at line 8 exceeded the time budget of 0.01s'])
+                self.assertEqual((result['diagnostics'][0]['line'], result['diagnostics'][0]['column']), (8, 5))
+
+    def test_unbounded(self):
+        # without a budget, loops run until they end
+        source = program('x := 0', 'for i := 0; i < 5000; i++ {', '    x++', '}', 'fmt.Println(x)')
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(source, backend)
+                self.assertEqual((result['print_list'], result['error_list']), (['5000'], []))
+
+    def test_profile(self):
+        source = program('for i := 0; i < 3; i++ {', '    for j := 0; j < 4; j++ {', '    }', '}')
+        for backend in backends:
+            # the iterations are granted one at a time, a grant of more would leave none to the inner loop
+            result = self.go_parser.check(source, backend, budget=LoopBudget(max_iterations=15, interval=1),
+                                          profile_loops=True)
+            self.assertEqual(result['error_list'], [])
+            self.assertEqual(sorted((loop['line'], loop['runs'], loop['iterations']) for loop in result['loops']),
+                             [(7, 1, 3), (8, 3, 12)])
+
+
+class SwitchTests(GoTestCase):
+    def test_tables(self):
+        tree = fold_constants(self.parse(programs['switches']))
+        code = compile_program(tree)
+        # the switch with a computed case and the one on conditions are compared case by case, the one
+        # on a constant is folded to its case and the one on a string falls back to comparisons at run time
+        self.assertEqual(len(code.tables), 1)
+        self.assertEqual(disassemble(code).count('SWITCH_TABLE'), 1)
+
+    def test_eval_tables(self):
+        # the evaluator builds the table of a switch once and keeps None for the ones it can't look up
+        tree = fold_constants(self.parse(programs['switches']))
+        evaluator = Evaluator()
+        evaluator.run(tree)
+        self.assertEqual(sum(table is not None for table in evaluator.tables.values()), 1)
+        self.assertEqual(evaluator.print_list, ['default 0', 'odd 1', 'dup 2', 'odd 3', 'four', 'default 5', 'first'])
+
+    def test_duplicate_and_computed_cases(self):
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(programs['switches'], backend)
+                self.assertEqual(result['print_list'],
+                                 ['default 0', 'odd 1', 'dup 2', 'odd 3', 'four', 'default 5', 'first'])
+                self.assertEqual(sorted(result['error_list']),
+                                 ["Error: Undefined identifier 'zz'", 'TypeError: type mismatch s and 1'])
+
+
+class DiagnosticTests(GoTestCase):
+    def test_recovery(self):
+        # every broken statement is reported, with its line and column, and the parse goes on after it
+        source = program('x := 1 +', 'fmt.Println(x)', 'if x > {', '    y := 2 *', '    fmt.Println(y)', '}',
+                         'z := ) 3', 'break', 'fmt.Println(x @ 2)')
+        result = self.go_parser.check(source)
+        self.assertFalse(result['accepted'])
+        self.assertEqual([(d['line'], d['column'], d['code']) for d in result['diagnostics']],
+                         [(7, 13, 'syntax'), (9, 12, 'syntax'), (10, 17, 'syntax'), (13, 10, 'syntax'),
+                          (15, 19, 'illegal-character'), (15, 21, 'syntax'), (14, 5, 'placement')])
+        self.assertEqual(result['error_list'], [d['message'] for d in result['diagnostics']])
+
+    def test_lines(self):
+        # errors of the backends have the line of their statement, budget errors the one of their loop
+        for backend in backends:
+            with self.subTest(backend):
+                result = self.go_parser.check(programs['runtime errors'], backend)
+                self.assertEqual(sorted((d['line'], d['code']) for d in result['diagnostics']),
+                                 [(8, 'runtime'), (9, 'runtime'), (10, 'runtime'), (11, 'runtime'), (12, 'runtime')])
+                result = self.go_parser.check(program('x := 0', 'for {', '    x++', '}'), backend,
+                                              budget=LoopBudget(max_iterations=10))
+                self.assertEqual([(d['line'], d['column'], d['code']) for d in result['diagnostics']],
+                                 [(8, 5, 'budget')])
+
+
+    def test_positions(self):
+        # nodes keep the lexpos of their first token, lines are worked out from it
+        source = programs['runtime errors']
+        tree = self.parse(source)
+        for stmt, text in zip(tree.body, ('x := 1', 'x = x / 0', 'y = 2', 'x = "s"', 's := ', 'fmt.Println(x, 5')):
+            self.assertEqual(stmt.lexpos, source.index(text))
+            self.assertEqual(stmt.lineno, source.count('\n', 0, stmt.lexpos) + 1)
+
+
+class ParserTests(GoTestCase):
+    def test_contexts(self):
+        # the state of a parse is kept by its parser, another parser doesn't see it
+        other = GoParser()
+        other.parse(programs['shadowing'].replace('import "fmt"', 'import "os"'))
+        self.parse(programs['shadowing'])
+        self.assertEqual(messages(other.context.diagnostics), ["ImportError: 'fmt' is not imported"] * 3)
+        self.assertIs(other.parser.action, self.go_parser.parser.action)  # the tables are shared
+
+    def test_threads(self):
+        sources = list(programs.values()) * 5
+        expected = [repr(self.parse(source)) for source in sources]
+        results = [None] * len(sources)
+
+        def work(start):
+            go_parser = GoParser()
+            for n in range(start, len(sources), 4):
+                results[n] = repr(go_parser.parse(sources[n]))
+
+        threads = [threading.Thread(target=work, args=(start, )) for start in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, expected)
+
+
+class BatchTests(GoTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name, source in programs.items():
+            with open(os.path.join(self.directory, name.replace(' ', '_') + '.go'), 'w') as f:
+                f.write(source)
+        with open(os.path.join(self.directory, 'syntax.go'), 'w') as f:
+            f.write(program('x := 1 +'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_main(self, *args):
+        """results printed by main(), one dict per file"""
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(main(list(args)), 0)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_check(self):
+        for backend in backends:
+            result = self.go_parser.check(programs['runtime errors'], backend)
+            self.assertTrue(result['accepted'])
+            self.assertEqual(result['print_list'], ['1'])
+        result = self.go_parser.check(program('x := 1 +'))
+        self.assertFalse(result['accepted'])
+        self.assertTrue(result['error_list'][0].startswith('SyntaxError'))
+
+    def test_workers(self):
+        results = self.run_main('-j', '2', '-b', 'closure', self.directory)
+        self.assertEqual([os.path.basename(result['file']) for result in results],
+                         sorted(os.listdir(self.directory)))
+        for result in results:
+            with open(result['file']) as f:
+                self.assertEqual(result, {'file': result['file'], **self.go_parser.check(f.read(), 'closure')})
+        self.assertEqual(self.run_main('-j', '1', '-b', 'closure', os.path.join(self.directory, '*.go')), results)
+
+    def test_cache(self):
+        cache = os.path.join(self.directory, 'cache')
+        results = self.run_main('-j', '2', '--cache', cache, self.directory)
+        self.assertEqual(len(os.listdir(cache)), len(results))
+        self.assertEqual(self.run_main('-j', '2', '--cache', cache, self.directory), results)
+        # limits are part of the key, so a budgeted check is cached next to the unbounded one
+        limited = self.run_main('-j', '2', '--cache', cache, '--max-iterations', '1000', self.directory)
+        self.assertEqual(limited, results)
+        self.assertEqual(len(os.listdir(cache)), 2 * len(results))
+
+    def test_budget(self):
+        path = os.path.join(self.directory, 'loop.go')
+        with open(path, 'w') as f:
+            f.write(program('for {', '}'))
+        result, = self.run_main('--max-iterations', '100', '--profile-loops', path)
+        self.assertEqual(result['error_list'], ['Error: loop at line 7 exceeded the budget of 100 iterations'])
+        self.assertEqual(result['loops'][0]['iterations'], 100)
+
+    def test_missing_file(self):
+        path = os.path.join(self.directory, 'missing.go')
+        self.assertEqual(self.run_main(path), [{'file': path, 'accepted': False, 'print_list': [],
+                                                'error_list': ['IOError: No such file or directory'],
+                                                'diagnostics': [{'line': None, 'column': None, 'code': 'io',
+                                                                 'message': 'IOError: No such file or directory'}]}])
+
+
+class CacheTests(GoTestCase):
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        go_parser = GoParser(cache=cache)
+        source = programs['runtime errors']
+        first = go_parser.check(source)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        first['print_list'].append('changed by the caller')
+        self.assertEqual(go_parser.check(source), self.go_parser.check(source))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        go_parser.check(source, 'eval')  # the backend is part of the key
+        go_parser.check(source + '\n')
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 3))
+
+    def test_budget(self):
+        # the limits of a budget are part of the key, profiled runs are never cached
+        cache = ResultCache()
+        go_parser = GoParser(cache=cache)
+        source = program('x := 0', 'for {', '    x++', '}')
+        first = go_parser.check(source, budget=LoopBudget(max_iterations=100))
+        self.assertEqual(go_parser.check(source, budget=LoopBudget(max_iterations=100)), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(go_parser.check(source, budget=LoopBudget(max_iterations=200))['error_list'],
+                         ['Error: loop at line 8 exceeded the budget of 200 iterations'])
+        go_parser.check(source, budget=LoopBudget(max_iterations=100), profile_loops=True)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+
+    def test_invalidation(self):
+        # results of another checker (grammar or backend code) are never found
+        cache = ResultCache()
+        key = cache.key(GoParser._signature, 'vm', 'source')
+        self.assertNotEqual(cache.key(GoParser._signature + '0', 'vm', 'source'), key)
+        cache.put(key, None, {'print_list': [], 'error_list': [], 'diagnostics': []})
+        self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get(cache.key('other', 'vm', 'source')))
+
+    def test_lru_and_directory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = ResultCache(maxsize=2, directory=directory)
+            go_parser = GoParser(cache=cache)
+            sources = [program(f'fmt.Println({n})') for n in range(3)]
+            for source in sources:
+                go_parser.check(source)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(len(os.listdir(directory)), 3)
+
+            # a new cache on the same directory finds all of them
+            shared = ResultCache(directory=directory)
+            go_parser = GoParser(cache=shared)
+            for n, source in enumerate(sources):
+                self.assertEqual(go_parser.check(source)['print_list'], [str(n)])
+            self.assertEqual((shared.hits, shared.misses), (3, 0))
+        finally:
+            shutil.rmtree(directory)
+
+
+class ReparseTests(GoTestCase):
+    def assertReparsed(self, go_parser, source):
+        tree = go_parser.reparse(source)
+        full = self.go_parser.parse(source)
+        self.assertEqual(repr(tree), repr(full))
+        self.assertEqual(list(nodes(tree)), list(nodes(full)))
+        self.assertEqual(list(map(repr, go_parser.context.diagnostics)),
+                         list(map(repr, self.go_parser.context.diagnostics)))
+        return tree
+
+    def test_edits(self):
+        go_parser = GoParser()
+        source = programs['features']
+        edits = [
+            ('y := 0', 'y := 100'),  # a token changes
+            ('k := 0\n', 'k := 0\n    fmt.Println("new", k)\n'),  # a statement and a line are added
+            ('    fmt.Println("new", k)\n', ''),  # and removed again
+            ('var g int = 10', 'var g int = 10\n\nvar h int = 2'),  # a global is added
+            ('fmt.Println("three")', 'fmt.Println( "three" , 3 )'),  # white space and an argument
+            ('func main() {\n', 'func main() {\n\n'),  # everything after moves a line
+        ]
+        self.assertReparsed(go_parser, source)
+        for old, new in edits:
+            with self.subTest(new):
+                self.assertIn(old, source)
+                source = source.replace(old, new, 1)
+                self.assertReparsed(go_parser, source)
+
+    def test_reuse(self):
+        go_parser = GoParser()
+        source = programs['features']
+        first = self.assertReparsed(go_parser, source)
+        second = self.assertReparsed(go_parser, source.replace('"a" + "b"', '"a" + "c"'))
+        self.assertIs(second.body[2], first.body[2])  # the for loop before the edit
+
+    def test_syntax_errors(self):
+        go_parser = GoParser()
+        source = programs['shadowing']
+        self.assertReparsed(go_parser, source)
+        self.assertReparsed(go_parser, source.replace('x := x + 10', 'x := x +'))
+        self.assertTrue(go_parser.context.is_error)
+        self.assertReparsed(go_parser, source)
+        self.assertReparsed(go_parser, source.replace('"in"', '"inner"'))
+
+
+class InternTests(GoTestCase):
+    def test_positions(self):
+        source = programs['runtime errors']
+        edited = source.replace('x := 1\n', 'x := 1\n\n\n')
+        go_parser = GoParser(interner=Interner())
+        for text in (source, edited, source):
+            tree = go_parser.parse(text)
+            self.assertEqual(list(nodes(tree, go_parser.context.positions)), list(nodes(self.parse(text))))
+            for backend in backends:
+                self.assertEqual(go_parser.check(text, backend), self.go_parser.check(text, backend))
+
+    def test_sharing(self):
+        interner = Interner()
+        go_parser = GoParser(interner=interner)
+        source = programs['features']
+        first = go_parser.parse(source)
+        misses = interner.misses
+        self.assertIs(go_parser.parse(source), first)
+        second = go_parser.parse('\n\n'.join(source.split('\n', 1)))  # every node moves
+        self.assertEqual(interner.misses, misses)
+        self.assertIs(second, first)
+        edited = go_parser.parse(source.replace('y += i', 'y += 2 * i'))
+        self.assertLess(interner.misses - misses, 20)  # the new nodes and the ones on their path to the root
+        self.assertIs(edited.globals, first.globals)
+        self.assertEqual(repr(edited), repr(self.parse(source.replace('y += i', 'y += 2 * i'))))
+
+    def test_repeated_subtrees(self):
+        # a subtree seen twice in one program gets a node for each place
+        go_parser = GoParser(interner=Interner())
+        tree = go_parser.parse(program('x := 1', 'x++', 'x++'))
+        self.assertIsNot(tree.body[1], tree.body[2])
+        self.assertEqual(repr(tree.body[1]), repr(tree.body[2]))
+        positions = go_parser.context.positions
+        self.assertEqual([position(stmt, positions)[0] for stmt in tree.body], [7, 8, 9])
+
+    def test_runs_alike(self):
+        go_parser = GoParser(interner=Interner())
+        for name, source in programs.items():
+            with self.subTest(name):
+                for backend in backends:
+                    self.assertEqual(go_parser.check(source, backend), self.go_parser.check(source, backend))
+
+    def test_maxsize(self):
+        interner = Interner(maxsize=50)
+        go_parser = GoParser(interner=interner)
+        for source in programs.values():
+            self.assertEqual(repr(go_parser.parse(source)), repr(self.parse(source)))
+            self.assertLessEqual(len(interner), 50)
+
+
+class BenchTests(GoTestCase):
+    def test_corpora(self):
+        # the programs only depend on the corpus, size and seed, and they all check without errors
+        for name in go_bench.corpora:
+            with self.subTest(name):
+                source = go_bench.generate(name, 20)
+                self.assertEqual(go_bench.generate(name, 20), source)
+                self.assertNotEqual(go_bench.generate(name, 20, seed=1), source)
+                for backend in backends:
+                    self.assertEqual(self.go_parser.check(source, backend)['error_list'], [])
+
+    def test_run(self):
+        benchmark = go_bench.Benchmark(repeat=1)
+        rows = list(benchmark.run('switch', 10, phases=('lex', 'check')))
+        self.assertEqual([row['phase'] for row in rows], ['lex', 'check'])
+        self.assertEqual([row['backend'] for row in rows], [None, 'vm'])
+        self.assertEqual(rows[0]['tokens'], rows[1]['tokens'])
+        self.assertGreater(rows[0]['reductions'], rows[0]['tokens'] // 2)
+        self.assertIsNone(rows[0]['reductions_per_second'])
+        self.assertEqual(rows[0]['shifts'], rows[0]['tokens'])  # every token is shifted once
+
+    def test_profile(self):
+        # the profiled parse builds the same tree, and counts what the grammar actions did
+        go_parser = GoParser()
+        source = programs['features']
+        tree = go_parser.parse(source, profile=True)
+        self.assertEqual(repr(tree), repr(self.parse(source)))
+        profile = go_parser.parser.profile
+        self.assertEqual(profile.errors, 0)
+        self.assertEqual(sum(calls for rule, calls, seconds in profile.rules()), profile.reductions)
+        self.assertIn('statement -> for_statement statement', [rule for rule, calls, seconds in profile.rules()])
+        self.go_parser.parse(source)
+        self.assertIsNone(self.go_parser.parser.profile)
+
+
+if __name__ == '__main__':
+    unittest.main()